@@ -3,7 +3,7 @@ import { motion, AnimatePresence } from 'framer-motion';
 import { Send, Bot, User, MessageCircle, Loader } from 'lucide-react';
 import ReactMarkdown from 'react-markdown';
 import remarkGfm from 'remark-gfm';
-import { apiService } from '../services/api';
+import { apiService, createPrefetcher } from '../services/api';
 import toast from 'react-hot-toast';
 import './ChatBot.css';
 
@@ -39,6 +39,7 @@ How can I assist you today?`,
   const [conversationId] = useState(`conv-${Date.now()}`);
   const messagesEndRef = useRef(null);
   const inputRef = useRef(null);
+  const prefetcher = useRef(createPrefetcher('chat'));
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -48,6 +49,17 @@ How can I assist you today?`,
     scrollToBottom();
   }, [messages]);
 
+  useEffect(() => {
+    const pending = prefetcher.current;
+    return () => pending.cancel();
+  }, []);
+
+  // Warm retrieval for the question while it is being typed
+  const updateInputMessage = (text) => {
+    setInputMessage(text);
+    prefetcher.current.schedule(text, { conversation_id: conversationId });
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     
@@ -63,24 +75,52 @@ How can I assist you today?`,
       timestamp: new Date()
     };
 
+    prefetcher.current.cancel();
     setMessages(prev => [...prev, userMessage]);
     setInputMessage('');
     setLoading(true);
 
+    const botMessageId = Date.now() + 1;
+    let started = false;
+
+    const appendToBotMessage = (text) => {
+      if (!started) {
+        started = true;
+        setLoading(false);
+        setMessages(prev => [...prev, {
+          id: botMessageId,
+          type: 'bot',
+          content: text,
+          timestamp: new Date()
+        }]);
+        return;
+      }
+      setMessages(prev => prev.map(message => (
+        message.id === botMessageId
+          ? { ...message, content: message.content + text }
+          : message
+      )));
+    };
+
     try {
-      const response = await apiService.sendChatMessage({
+      // An error event ends the stream; keep the server's reason for the user
+      let streamError = null;
+      await apiService.streamChatMessage({
         message: userMessage.content,
         conversation_id: conversationId
+      }, {
+        onToken: ({ text }) => appendToBotMessage(text),
+        onError: ({ detail }) => {
+          streamError = detail;
+        }
       });
 
-      const botMessage = {
-        id: Date.now() + 1,
-        type: 'bot',
-        content: response.response,
-        timestamp: new Date()
-      };
-
-      setMessages(prev => [...prev, botMessage]);
+      if (streamError) {
+        throw new Error(streamError);
+      }
+      if (!started) {
+        throw new Error('No response received');
+      }
     } catch (error) {
       toast.error(error.message || 'Failed to send message');
       
@@ -116,7 +156,7 @@ How can I assist you today?`,
   ];
 
   const handleQuickQuestion = (question) => {
-    setInputMessage(question);
+    updateInputMessage(question);
     inputRef.current?.focus();
   };
 
@@ -274,7 +314,7 @@ How can I assist you today?`,
                   ref={inputRef}
                   type="text"
                   value={inputMessage}
-                  onChange={(e) => setInputMessage(e.target.value)}
+                  onChange={(e) => updateInputMessage(e.target.value)}
                   placeholder="Type your health question here..."
                   className="chat-input"
                   disabled={loading}
@@ -1,7 +1,7 @@
-import React, { useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { motion } from 'framer-motion';
 import { Search, User, Calendar, FileText, AlertTriangle, CheckCircle, Clock, ArrowRight } from 'lucide-react';
-import { apiService } from '../services/api';
+import { apiService, createPrefetcher } from '../services/api';
 import toast from 'react-hot-toast';
 import './SymptomAnalyzer.css';
 
@@ -14,6 +14,14 @@ const SymptomAnalyzer = () => {
   });
   const [loading, setLoading] = useState(false);
   const [results, setResults] = useState(null);
+  const prefetcher = useRef(createPrefetcher('analyze_symptoms'));
+  // Identifies the latest submission so a late background analysis cannot replace a newer one
+  const submission = useRef(0);
+
+  useEffect(() => {
+    const pending = prefetcher.current;
+    return () => pending.cancel();
+  }, []);
 
   const handleInputChange = (e) => {
     const { name, value } = e.target;
@@ -21,6 +29,10 @@ const SymptomAnalyzer = () => {
       ...prev,
       [name]: value
     }));
+    // Warm retrieval for the symptoms while they are being described
+    if (name === 'symptoms') {
+      prefetcher.current.schedule(value);
+    }
   };
 
   const handleSubmit = async (e) => {
@@ -31,6 +43,8 @@ const SymptomAnalyzer = () => {
       return;
     }
 
+    prefetcher.current.cancel();
+    const current = ++submission.current;
     setLoading(true);
     setResults(null);
 
@@ -42,16 +56,55 @@ const SymptomAnalyzer = () => {
         ...(formData.medical_history && { medical_history: formData.medical_history })
       };
 
-      const response = await apiService.analyzeSymptoms(analysisData);
-      setResults(response);
+      // Show urgency and each possible condition as soon as the server streams them
+      let completed = null;
+      let streamError = null;
+      setResults({ urgency_level: null, analysis_summary: '', possible_conditions: [] });
+      await apiService.streamSymptomAnalysis(analysisData, {
+        onField: ({ name, value }) => setResults(prev => ({ ...prev, [name]: value })),
+        onCondition: ({ condition }) => setResults(prev => ({
+          ...prev,
+          possible_conditions: [...(prev.possible_conditions || []), condition]
+        })),
+        onDone: ({ result }) => {
+          completed = result;
+          setResults(result);
+        },
+        onError: ({ detail }) => {
+          streamError = detail;
+        }
+      });
+
+      if (streamError) {
+        throw new Error(streamError);
+      }
+      if (!completed) {
+        throw new Error('No analysis received');
+      }
       toast.success('Analysis completed successfully!');
+
+      // Emergency answers come back at once; the full analysis follows in the background
+      if (completed.analysis_id && completed.analysis_status === 'pending') {
+        waitForFullAnalysis(completed.analysis_id, current);
+      }
     } catch (error) {
+      setResults(null);
       toast.error(error.message || 'Failed to analyze symptoms');
     } finally {
       setLoading(false);
     }
   };
 
+  const waitForFullAnalysis = async (analysisId, current) => {
+    const analysis = await apiService.waitForSymptomAnalysis(analysisId);
+    if (submission.current !== current) return;
+    if (analysis) {
+      setResults(analysis);
+    } else {
+      setResults(prev => prev && { ...prev, analysis_status: 'unavailable' });
+    }
+  };
+
   const getUrgencyColor = (urgency) => {
     switch (urgency) {
       case 'emergency': return '#ef4444';
@@ -200,14 +253,25 @@ const SymptomAnalyzer = () => {
                 <div className="result-header">
                   <CheckCircle className="result-icon" />
                   <h3>Analysis Summary</h3>
-                  <div 
-                    className="urgency-badge"
-                    style={{ backgroundColor: getUrgencyColor(results.urgency_level) }}
-                  >
-                    {results.urgency_level.toUpperCase()}
-                  </div>
+                  {results.urgency_level && (
+                    <div 
+                      className="urgency-badge"
+                      style={{ backgroundColor: getUrgencyColor(results.urgency_level) }}
+                    >
+                      {results.urgency_level.toUpperCase()}
+                    </div>
+                  )}
                 </div>
-                <p className="result-summary">{results.analysis_summary}</p>
+                <p className="result-summary">{results.analysis_summary || (loading && 'Analyzing your symptoms...')}</p>
+                {results.analysis_status === 'pending' && (
+                  <div className="result-note">
+                    <div className="loading-spinner" />
+                    A full analysis is being prepared and will appear here.
+                  </div>
+                )}
+                {results.analysis_status === 'unavailable' && (
+                  <p className="result-note">The full analysis is not available. Please seek care now.</p>
+                )}
               </div>
 
               {/* Possible Conditions */}
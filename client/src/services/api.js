@@ -2,6 +2,12 @@ import axios from 'axios';
 
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
 
+// Identifies this page load to the server so retrieval prefetched while typing is reused on submit
+const SESSION_ID = `session-${Date.now()}-${Math.random().toString(36).slice(2)}`;
+const PREFETCH_DELAY_MS = 400;
+const ANALYSIS_POLL_INTERVAL_MS = 2000;
+const ANALYSIS_POLL_TIMEOUT_MS = 120000;
+
 const api = axios.create({
   baseURL: API_BASE_URL,
   headers: {
@@ -31,6 +37,101 @@ api.interceptors.response.use(
   }
 );
 
+// Read a Server-Sent Events response and dispatch each event to its handler
+const streamEvents = async (path, options, handlers = {}) => {
+  const response = await fetch(`${API_BASE_URL}${path}`, {
+    ...options,
+    headers: {
+      'Content-Type': 'application/json',
+      Accept: 'text/event-stream',
+      ...(options.headers || {}),
+    },
+  });
+
+  if (!response.ok) {
+    let detail;
+    try {
+      detail = (await response.json()).detail;
+    } catch (e) {
+      detail = undefined;
+    }
+    const error = new Error(detail || 'Streaming request failed');
+    error.status = response.status;
+    error.detail = detail;
+    throw error;
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  const dispatch = (rawEvent) => {
+    let event = 'message';
+    const dataLines = [];
+    rawEvent.split('\n').forEach((line) => {
+      if (line.startsWith('event:')) {
+        event = line.slice(6).trim();
+      } else if (line.startsWith('data:')) {
+        dataLines.push(line.slice(5).trim());
+      }
+    });
+    if (!dataLines.length) return;
+
+    const data = JSON.parse(dataLines.join('\n'));
+    const handlerName = `on${event.charAt(0).toUpperCase()}${event.slice(1)}`;
+    if (handlers[handlerName]) {
+      handlers[handlerName](data);
+    }
+  };
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let separator = buffer.indexOf('\n\n');
+    while (separator !== -1) {
+      dispatch(buffer.slice(0, separator));
+      buffer = buffer.slice(separator + 2);
+      separator = buffer.indexOf('\n\n');
+    }
+  }
+  if (buffer.trim()) {
+    dispatch(buffer);
+  }
+};
+
+// Debounced retrieval prefetch for text the user is still typing.
+// Only the latest text is sent; a newer keystroke aborts an older request still in flight.
+export const createPrefetcher = (endpoint, delay = PREFETCH_DELAY_MS) => {
+  let timer = null;
+  let controller = null;
+
+  const cancel = () => {
+    clearTimeout(timer);
+    timer = null;
+  };
+
+  const schedule = (text, extra = {}) => {
+    cancel();
+    if (!text.trim()) return;
+    timer = setTimeout(() => {
+      if (controller) controller.abort();
+      controller = new AbortController();
+      fetch(`${API_BASE_URL}/prefetch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ session_id: SESSION_ID, endpoint, text, ...extra }),
+        signal: controller.signal,
+      }).catch(() => {
+        // Prefetching is best effort; the submitted request retrieves normally
+      });
+    }, delay);
+  };
+
+  return { schedule, cancel };
+};
+
 export const apiService = {
   // Health check
   checkHealth: async () => {
@@ -45,7 +146,7 @@ export const apiService = {
   // Analyze symptoms
   analyzeSymptoms: async (symptomsData) => {
     try {
-      const response = await api.post('/analyze-symptoms', symptomsData);
+      const response = await api.post('/analyze-symptoms', { ...symptomsData, session_id: SESSION_ID });
       return response.data;
     } catch (error) {
       if (error.response?.status === 400) {
@@ -55,10 +156,49 @@ export const apiService = {
     }
   },
 
+  // Analyze symptoms, receiving urgency and each possible condition as soon as they are generated
+  // handlers: { onSources, onField, onCondition, onDone, onError }
+  streamSymptomAnalysis: async (symptomsData, handlers) => {
+    try {
+      await streamEvents('/analyze-symptoms/stream', {
+        method: 'POST',
+        body: JSON.stringify({ ...symptomsData, session_id: SESSION_ID }),
+      }, handlers);
+    } catch (error) {
+      if (error.detail) {
+        throw new Error(error.detail);
+      }
+      if (error.status === 400) {
+        throw new Error('Invalid symptoms data');
+      }
+      throw new Error('Failed to analyze symptoms. Please try again.');
+    }
+  },
+
+  // Wait for the full analysis the server runs in the background after an immediate emergency answer.
+  // Resolves with the analysis, or null if it expired or is still not ready after the timeout.
+  waitForSymptomAnalysis: async (analysisId, timeoutMs = ANALYSIS_POLL_TIMEOUT_MS) => {
+    const deadline = Date.now() + timeoutMs;
+    while (Date.now() < deadline) {
+      try {
+        const response = await api.get(`/analyze-symptoms/result/${encodeURIComponent(analysisId)}`);
+        if (response.data.status === 'complete') {
+          return response.data.result;
+        }
+      } catch (error) {
+        if (error.response?.status === 404) {
+          return null;
+        }
+      }
+      await new Promise(resolve => setTimeout(resolve, ANALYSIS_POLL_INTERVAL_MS));
+    }
+    return null;
+  },
+
   // Chat with AI
   sendChatMessage: async (messageData) => {
     try {
-      const response = await api.post('/chat', messageData);
+      const response = await api.post('/chat', { ...messageData, session_id: SESSION_ID });
       return response.data;
     } catch (error) {
       if (error.response?.status === 400) {
@@ -68,6 +208,25 @@ export const apiService = {
     }
   },
 
+  // Chat with AI, receiving the answer token by token
+  // handlers: { onSources, onToken, onDone, onError }
+  streamChatMessage: async (messageData, handlers) => {
+    try {
+      await streamEvents('/chat/stream', {
+        method: 'POST',
+        body: JSON.stringify({ ...messageData, session_id: SESSION_ID }),
+      }, handlers);
+    } catch (error) {
+      if (error.detail) {
+        throw new Error(error.detail);
+      }
+      if (error.status === 400) {
+        throw new Error('Invalid message');
+      }
+      throw new Error('Failed to send message. Please try again.');
+    }
+  },
+
   // Get medical information about a condition
   getMedicalInfo: async (condition) => {
     try {
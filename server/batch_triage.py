@@ -0,0 +1,167 @@
+"""Bulk symptom triage over JSONL intake records.
+
+Each input line is a SymptomRequest object; an optional "id" field is echoed
+back. Records are processed in windows: retrieval for a whole window is one
+embedding pass and one index search, then completions run with bounded
+concurrency. Results come out in input order as one JSON object per line,
+and a record that fails validation or analysis gets an "error" entry instead
+of failing the batch. Serves POST /analyze-symptoms/batch and runs from the
+``server`` directory::
+
+    python batch_triage.py intake.jsonl -o results.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from schemas import SymptomRequest
+
+LLM_ENDPOINT = "analyze_symptoms_batch"
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream (e.g. a request body) into text lines"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8", errors="replace")
+    if buffer:
+        yield buffer.decode("utf-8", errors="replace")
+
+
+def _parse(line: str) -> Tuple[Any, Optional[SymptomRequest], Optional[str]]:
+    """(id, request, error) for one input line"""
+    try:
+        data = json.loads(line)
+    except ValueError as e:
+        return None, None, f"Invalid record: {e}"
+    if not isinstance(data, dict):
+        return None, None, "Invalid record: Record must be a JSON object"
+
+    record_id = data.get("id")
+    try:
+        request = SymptomRequest(**data)
+    except Exception as e:
+        return record_id, None, f"Invalid record: {e}"
+    if len(request.symptoms.strip()) < 3:
+        return record_id, None, "Invalid record: Please provide detailed symptoms"
+    return record_id, request, None
+
+
+async def triage_lines(service, lines: AsyncIterator[str], window: int = None, concurrency: int = None) -> AsyncIterator[Dict[str, Any]]:
+    """Analyze JSONL records, yielding one result or error per non-empty line, in order"""
+    window = window or service.config.BATCH_TRIAGE_WINDOW
+    semaphore = asyncio.Semaphore(concurrency or service.config.LLM_ENDPOINT_CONCURRENCY[LLM_ENDPOINT])
+
+    pending: List[Tuple[int, str]] = []
+    index = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        pending.append((index, line))
+        index += 1
+        if len(pending) >= window:
+            async for record in _triage_window(service, pending, semaphore):
+                yield record
+            pending = []
+
+    if pending:
+        async for record in _triage_window(service, pending, semaphore):
+            yield record
+
+
+async def _triage_window(service, lines: List[Tuple[int, str]], semaphore: asyncio.Semaphore) -> AsyncIterator[Dict[str, Any]]:
+    parsed = [(index,) + _parse(line) for index, line in lines]
+
+    valid = [entry for entry in parsed if entry[2] is not None]
+    retrievals = await service.retrieve_batch([service.symptom_query(request.symptoms) for _, _, request, _ in valid], "analyze_symptoms")
+
+    async def analyze(index: int, record_id: Any, request: SymptomRequest, retrieval) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                result = await service.complete_symptom_analysis(
+                    request.symptoms, request.age, request.gender, request.medical_history, retrieval, llm_endpoint=LLM_ENDPOINT
+                )
+                return {"index": index, "id": record_id, "result": result}
+            except ValueError:
+                return {"index": index, "id": record_id, "error": "Analysis returned malformed JSON"}
+            except Exception as e:
+                return {"index": index, "id": record_id, "error": f"Analysis failed: {e}"}
+
+    tasks = {
+        index: asyncio.ensure_future(analyze(index, record_id, request, retrieval))
+        for (index, record_id, request, _), retrieval in zip(valid, retrievals)
+    }
+    try:
+        for index, record_id, _, error in parsed:
+            if error is not None:
+                yield {"index": index, "id": record_id, "error": error}
+            else:
+                yield await tasks[index]
+    finally:
+        # The consumer went away (e.g. the client disconnected): drop unfinished work
+        for task in tasks.values():
+            task.cancel()
+
+
+async def _file_lines(lines: Iterable[str]) -> AsyncIterator[str]:
+    for line in lines:
+        yield line
+
+
+async def _run(service, source, output, window: int, concurrency: int):
+    start = time.perf_counter()
+    records = errors = 0
+    async for record in triage_lines(service, _file_lines(source), window, concurrency):
+        records += 1
+        errors += "error" in record
+        output.write(json.dumps(record) + "\n")
+        if records % 100 == 0:
+            output.flush()
+            print(f"Triaged {records} records ({records / (time.perf_counter() - start):.2f}/sec)", file=sys.stderr)
+    output.flush()
+    print(f"Triaged {records} records with {errors} errors in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+def main():
+    from dotenv import load_dotenv
+    from rag_service import RAGService
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file of SymptomRequest records, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="NDJSON output file, or - for stdout")
+    parser.add_argument("--window", type=int, default=None, help="Records retrieved together")
+    parser.add_argument("--concurrency", type=int, default=None, help="Completions in flight")
+    args = parser.parse_args()
+
+    groq_api_key = os.getenv("GROQ_API_KEY")
+    if not groq_api_key:
+        raise ValueError("GROQ_API_KEY environment variable is required")
+
+    service = RAGService(groq_api_key)
+    service.initialize()
+    if not service.is_ready:
+        print(f"RAG initialization failed ({service.status_error}), triaging without reference context", file=sys.stderr)
+    if args.concurrency:
+        service.llm.endpoint_concurrency[LLM_ENDPOINT] = args.concurrency
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        asyncio.run(_run(service, source, output, args.window, args.concurrency))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Set, Tuple
+
+
+class QueryBatcher:
+    """Micro-batches retrieval queries and runs them on a worker pool.
+
+    Queries submitted within ``max_wait_ms`` of each other (up to
+    ``max_batch_size``) are handed to ``batch_fn`` as a single list so the
+    embedding model and the vector index see one batched call instead of many
+    small ones. ``batch_fn(queries, k, routes)`` runs in a worker thread and
+    must return one result per query, in order; ``routes`` holds the route
+    (e.g. endpoint) each query was submitted with.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[str], int, List[Optional[str]]], List[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_workers: int = 2,
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="retrieval")
+
+        self._pending: List[Tuple[str, int, Optional[str], asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # The event loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.batches_run = 0
+        self.queries_run = 0
+        self.queries_skipped = 0
+
+    async def submit(self, query: str, k: int, route: Optional[str] = None) -> Any:
+        """Queue a query and wait for its slice of the batched result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((query, k, route, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, int, Optional[str], asyncio.Future]]):
+        # Callers that gave up before the batch ran (e.g. superseded prefetches) are not searched
+        live = [entry for entry in batch if not entry[3].done()]
+        self.queries_skipped += len(batch) - len(live)
+        batch = live
+        if not batch:
+            return
+
+        queries = [query for query, _, _, _ in batch]
+        k = max(k for _, k, _, _ in batch)
+        routes = [route for _, _, route, _ in batch]
+
+        try:
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(self.executor, self.batch_fn, queries, k, routes)
+        except Exception as e:
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches_run += 1
+        self.queries_run += len(batch)
+        for (_, _, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def get_stats(self) -> dict:
+        """Get batching statistics"""
+        return {
+            "batches_run": self.batches_run,
+            "queries_run": self.queries_run,
+            "avg_batch_size": self.queries_run / self.batches_run if self.batches_run else 0.0,
+            "pending": len(self._pending),
+            "running": len(self._tasks),
+            "skipped": self.queries_skipped,
+        }
+
+    async def shutdown(self):
+        """Run queued queries, wait for running batches, then stop the worker pool"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.executor.shutdown(wait=False)
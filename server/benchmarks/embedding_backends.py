@@ -0,0 +1,119 @@
+"""Encode latency, throughput and retrieval recall of each embedding backend.
+
+Chunks come from the vector store build cache (a build runs if needed). Each
+backend embeds a sample of chunk texts and a set of condition queries;
+recall@k is the overlap of its top-k chunks with those of the torch backend,
+and cosine is the mean similarity of its chunk vectors to the torch ones.
+Run from the ``server`` directory::
+
+    python -m benchmarks.embedding_backends --threads 4
+    python -m benchmarks.embedding_backends --backends torch onnx_int8 --sample 5000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks.hybrid_retrieval import SAMPLE_CONDITIONS
+from config import RAGConfig
+from embedding_backends import EMBEDDING_BACKENDS, create_embeddings
+from index_builder import VectorStoreBuilder
+
+
+def _create(backend: str, config: RAGConfig, threads, batch_size: int):
+    return create_embeddings(
+        backend,
+        config.EMBEDDING_MODEL,
+        device=config.EMBEDDING_DEVICE,
+        threads=threads,
+        batch_size=batch_size,
+        max_seq_length=config.EMBEDDING_MAX_SEQ_LENGTH,
+        onnx_dir=config.EMBEDDING_ONNX_PATH,
+    )
+
+
+def _measure(embeddings, texts, queries, repeats: int):
+    embeddings.embed_documents(texts[:8])  # warm up
+
+    latencies = []
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            embeddings.embed_query(query)
+            latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    start = time.perf_counter()
+    batch_queries = np.asarray(embeddings.embed_documents(queries), dtype=np.float32)
+    batch_query_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    corpus_seconds = time.perf_counter() - start
+
+    timings = {
+        "query_latency_ms_p50": latencies[len(latencies) // 2] * 1000,
+        "query_latency_ms_p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        "batched_query_ms_per_query": batch_query_seconds * 1000 / len(queries),
+        "chunks_per_second": len(texts) / corpus_seconds,
+    }
+    return timings, batch_queries, vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS))
+    parser.add_argument("--k", type=int, default=RAGConfig.RETRIEVAL_K)
+    parser.add_argument("--sample", type=int, default=2000, help="Chunk texts embedded by each backend")
+    parser.add_argument("--threads", type=int, default=RAGConfig.EMBEDDING_THREADS)
+    parser.add_argument("--batch-size", type=int, default=RAGConfig.EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--repeats", type=int, default=3, help="Passes over the queries for single-query latency")
+    args = parser.parse_args()
+
+    unknown = set(args.backends) - set(EMBEDDING_BACKENDS)
+    if unknown:
+        parser.error(f"Unknown backends: {', '.join(sorted(unknown))}")
+
+    config = RAGConfig()
+    reference, _ = _create("torch", config, args.threads, args.batch_size)
+    builder = VectorStoreBuilder(
+        reference,
+        embedding_model=config.EMBEDDING_MODEL,
+        cache_dir=config.DOCUMENTS_CACHE_PATH,
+        chunk_size=config.CHUNK_SIZE,
+        chunk_overlap=config.CHUNK_OVERLAP,
+        workers=config.BUILD_WORKERS,
+    )
+    texts = builder.build([config.PDF_PATH] + list(config.ADDITIONAL_PDF_PATHS)).texts
+    builder.close()
+
+    rng = np.random.default_rng(0)
+    texts = [texts[i] for i in sorted(rng.choice(len(texts), min(args.sample, len(texts)), replace=False))]
+    queries = [f"{condition} symptoms causes treatment diagnosis" for condition in SAMPLE_CONDITIONS]
+
+    report = {"k": args.k, "chunks": len(texts), "queries": len(queries), "threads": args.threads, "backends": {}}
+    truth = reference_vectors = None
+    for backend in ["torch"] + [b for b in args.backends if b != "torch"]:
+        embeddings, loaded = (reference, "torch") if backend == "torch" else _create(backend, config, args.threads, args.batch_size)
+        if loaded != backend:
+            report["backends"][backend] = {"skipped": f"fell back to {loaded}"}
+            continue
+
+        timings, query_vectors, vectors = _measure(embeddings, texts, queries, args.repeats)
+        neighbours = np.argsort(-(query_vectors @ vectors.T), axis=1)[:, :args.k]
+        if truth is None:
+            truth, reference_vectors = neighbours, vectors
+        recall = np.mean([len(set(found) & set(expected)) / args.k for found, expected in zip(neighbours, truth)])
+
+        report["backends"][backend] = {
+            **timings,
+            f"recall@{args.k}": float(recall),
+            "cosine_to_torch": float(np.mean(np.sum(vectors * reference_vectors, axis=1))),
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Emergency matcher throughput over large lexicons and long inputs.
+
+Builds synthetic lexicons (the shipped lexicon plus generated multi-word
+phrases) and synthetic symptom descriptions, then times the compiled
+matcher against the previous substring scan (``phrase in text.lower()``
+for every phrase) and a compiled regex alternation. First checks the
+shipped lexicon against labelled inputs that must or must not answer
+immediately as emergencies (ambiguous words, history, hedges, questions,
+third parties, resolved episodes, misspellings) and exits non-zero on a
+mismatch. Needs only the standard library. Run from the ``server``
+directory::
+
+    python -m benchmarks.emergency_triage
+    python -m benchmarks.emergency_triage --phrases 100 1000 10000 --words 20 200 2000
+"""
+import argparse
+import json
+import random
+import re
+import string
+import sys
+import time
+
+from config import RAGConfig
+from emergency_triage import EmergencyMatcher
+
+FILLER = (
+    "i have had a mild cough and a runny nose for three days with some tiredness and my "
+    "throat feels scratchy in the morning but it gets better after tea no fever so far"
+).split()
+
+# (input, expected short_circuit, expected emergency): only a current, first-person
+# symptom short-circuits; other mentions still flag an emergency for the LLM analysis
+SHORT_CIRCUIT_FIXTURES = [
+    ("crushing chest pain right now", True, True),
+    ("I have crushing chest pain", True, True),
+    ("Ive had chest pain for an hour", True, True),
+    ("no fever but I have chest pain", True, True),
+    ("history of asthma, now I cant breathe", True, True),
+    ("I have chest pain, my father had a stroke", True, True),
+    ("my lips are turning blue", True, True),
+    ("I think I am having a heart attack", True, True),
+    ("denies fever, chills or chest pain", False, False),
+    ("fitting new shoes gave me blisters", False, False),
+    ("my father had a heart attack last year, I have a mild cough", False, True),
+    ("history of stroke in 2015, now a runny nose", False, True),
+    ("I had a seizure as a child", False, True),
+    ("worried about heart attack risk", False, True),
+    ("I fainted yesterday but feel fine now", False, True),
+    ("I cant breathe through my nose because of a cold", False, True),
+    ("my chest pain went away", False, True),
+    ("I had chest pain", False, True),
+    ("my dog had a seizure", False, True),
+    ("my son is unconscious and wont wake up", False, True),
+    ("he is having a fit", False, True),
+    ("mild chest pain when coughing", False, True),
+    ("what are the signs of a heart attack", False, True),
+    ("I want to know about heart attack prevention", False, True),
+    ("chest pian", False, True),
+]
+
+
+def _check_fixtures(path: str) -> list:
+    """Fixtures whose short-circuit or emergency decision differs from the expected one"""
+    matcher = EmergencyMatcher.from_lexicon(path)
+    failures = []
+    for text, short_circuit, emergency in SHORT_CIRCUIT_FIXTURES:
+        result = matcher.match(text)
+        if (result.short_circuit, result.emergency) != (short_circuit, emergency):
+            failures.append({
+                "input": text,
+                "expected": {"short_circuit": short_circuit, "emergency": emergency},
+                "matches": [
+                    (match.text, match.negated, match.contextual, match.current, match.confidence)
+                    for match in result.matches
+                ],
+            })
+    return failures
+
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9)))
+
+
+def _lexicon(base: dict, phrases: int, rng: random.Random) -> dict:
+    concepts = list(base["concepts"])
+    per_concept = 10
+    for i in range((max(0, phrases - sum(len(c["phrases"]) for c in concepts)) + per_concept - 1) // per_concept):
+        concepts.append({
+            "id": f"synthetic_{i}",
+            "severity": "urgent",
+            "phrases": [" ".join(_word(rng) for _ in range(rng.randint(1, 4))) for _ in range(per_concept)],
+        })
+    return {**base, "concepts": concepts}
+
+
+def _inputs(lexicon: dict, words: int, count: int, rng: random.Random):
+    phrases = [phrase for concept in lexicon["concepts"] for phrase in concept["phrases"]]
+    texts = []
+    for _ in range(count):
+        tokens = [rng.choice(FILLER) for _ in range(words)]
+        # Roughly one lexicon phrase per 50 words, some negated
+        for _ in range(max(1, words // 50)):
+            phrase = rng.choice(phrases)
+            if rng.random() < 0.3:
+                phrase = "no " + phrase
+            tokens.insert(rng.randrange(len(tokens) + 1), phrase)
+        texts.append(" ".join(tokens))
+    return texts
+
+
+def _time(fn, texts, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for text in texts:
+            fn(text)
+    return (time.perf_counter() - start) / (repeats * len(texts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lexicon", default=RAGConfig.EMERGENCY_LEXICON_PATH)
+    parser.add_argument("--phrases", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--words", type=int, nargs="+", default=[20, 200, 2000])
+    parser.add_argument("--inputs", type=int, default=50, help="Synthetic inputs per size")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    failures = _check_fixtures(args.lexicon)
+    print(f"{len(SHORT_CIRCUIT_FIXTURES) - len(failures)}/{len(SHORT_CIRCUIT_FIXTURES)} short-circuit fixtures passed")
+
+    rng = random.Random(args.seed)
+    with open(args.lexicon) as f:
+        base = json.load(f)
+
+    report = {"fixture_failures": failures, "runs": []}
+    for phrase_count in args.phrases:
+        lexicon = _lexicon(base, phrase_count, rng)
+        phrases = [phrase for concept in lexicon["concepts"] for phrase in concept["phrases"]]
+
+        start = time.perf_counter()
+        matcher = EmergencyMatcher(
+            lexicon["concepts"],
+            negation_cues=lexicon.get("negation_cues", ()),
+            scope_terminators=lexicon.get("scope_terminators", ()),
+            negation_window=lexicon.get("negation_window", 5),
+            context_cues=lexicon.get("context_cues", ()),
+            context_followers=lexicon.get("context_followers", ()),
+            context_terminators=lexicon.get("context_terminators", ()),
+            current_cues=lexicon.get("current_cues", ()),
+        )
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        pattern = re.compile("|".join(re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True)))
+        regex_build_ms = (time.perf_counter() - start) * 1000
+
+        for word_count in args.words:
+            texts = _inputs(lexicon, word_count, args.inputs, rng)
+            repeats = args.repeats if word_count * len(phrases) < 2_000_000 else 1
+            matcher_s = _time(matcher.match, texts, args.repeats)
+            substring_s = _time(lambda text: [phrase for phrase in phrases if phrase in text.lower()], texts, repeats)
+            regex_s = _time(lambda text: pattern.findall(text.lower()), texts, args.repeats)
+            chars = sum(len(text) for text in texts) / len(texts)
+
+            run = {
+                "phrases": len(phrases),
+                "words": word_count,
+                "matcher_build_ms": build_ms,
+                "regex_build_ms": regex_build_ms,
+                "matcher_us": matcher_s * 1e6,
+                "substring_scan_us": substring_s * 1e6,
+                "regex_us": regex_s * 1e6,
+                "matcher_mb_per_s": chars / matcher_s / 1e6,
+            }
+            report["runs"].append(run)
+            print(
+                f"{len(phrases):>6} phrases, {word_count:>5} words: matcher {run['matcher_us']:9.1f}us, "
+                f"substring scan {run['substring_scan_us']:10.1f}us, regex {run['regex_us']:9.1f}us"
+            )
+
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
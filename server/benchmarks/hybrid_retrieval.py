@@ -0,0 +1,102 @@
+"""Dense-only vs. hybrid (dense + BM25) retrieval: latency and quality.
+
+Quality is measured on condition-name queries: a hit means a retrieved chunk
+mentions the condition by name. Single rare drug names are also run through
+the symptom and medical-info query templates, where one exact term is a
+small part of the query and dense retrieval alone tends to miss it.
+Nonsense words run through the same templates should retrieve nothing, so
+the prompt is built without context. Reports hit@k, MRR and mean per-query
+latency for each mode, and the documents returned for nonsense queries.
+Run from the ``server`` directory::
+
+    python -m benchmarks.hybrid_retrieval --k 3
+    python -m benchmarks.hybrid_retrieval --conditions conditions.txt
+"""
+import argparse
+import json
+import time
+
+from rag_service import QUERY_TEMPLATES, RAGService
+
+SAMPLE_CONDITIONS = [
+    "Acetaminophen", "Addison's disease", "Amyotrophic lateral sclerosis", "Anorexia nervosa",
+    "Appendicitis", "Bell's palsy", "Botulism", "Bronchiectasis", "Carpal tunnel syndrome",
+    "Celiac disease", "Cholecystitis", "Cushing's syndrome", "Cystic fibrosis", "Diverticulitis",
+    "Endometriosis", "Gaucher disease", "Guillain-Barre syndrome", "Hashimoto's thyroiditis",
+    "Hemochromatosis", "Kawasaki syndrome", "Legionnaires' disease", "Lyme disease",
+    "Marfan syndrome", "Meniere's disease", "Myasthenia gravis", "Pheochromocytoma",
+    "Raynaud's disease", "Sarcoidosis", "Tetanus", "Wilson disease",
+]
+
+# One rare term each, looked up the way the endpoints template their queries
+RARE_DRUGS = ["Metformin", "Warfarin", "Digoxin", "Isoniazid", "Methotrexate", "Clozapine"]
+# Words in no chunk: only the template terms can match
+NONSENSE = ["qwzzx blorf", "vlemp grask", "zorbule frint"]
+
+
+def _evaluate(service: RAGService, conditions, k: int, template: str = QUERY_TEMPLATES["medical_info"]) -> dict:
+    hits, reciprocal_ranks, latencies = 0, [], []
+    for condition in conditions:
+        start = time.perf_counter()
+        result = service._search_batch([template.format(condition)], k)[0]
+        latencies.append(time.perf_counter() - start)
+
+        name = condition.lower()
+        rank = next((i + 1 for i, (doc, _) in enumerate(result.documents) if name in doc.page_content.lower()), None)
+        hits += rank is not None
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+
+    return {
+        f"hit@{k}": hits / len(conditions),
+        "mrr": sum(reciprocal_ranks) / len(conditions),
+        "latency_ms_mean": sum(latencies) / len(latencies) * 1000,
+    }
+
+
+def _nonsense_documents(service: RAGService, k: int) -> dict:
+    """Mean documents retrieved for nonsense words, per query template (should be 0)"""
+    return {
+        endpoint: sum(
+            len(service._search_batch([template.format(words)], k, [endpoint])[0].documents) for words in NONSENSE
+        ) / len(NONSENSE)
+        for endpoint, template in QUERY_TEMPLATES.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--conditions", help="File with one condition name per line")
+    args = parser.parse_args()
+
+    conditions = SAMPLE_CONDITIONS
+    if args.conditions:
+        with open(args.conditions) as f:
+            conditions = [line.strip() for line in f if line.strip()]
+
+    service = RAGService(groq_api_key="benchmark")
+    service.initialize()
+    shards = service.corpora.shards()
+    lexical_indexes = [shard.lexical_index for shard in shards]
+    if not any(lexical_indexes):
+        raise SystemExit("Hybrid retrieval is disabled (HYBRID_RETRIEVAL_ENABLED)")
+
+    def evaluate_all() -> dict:
+        results = {"conditions": _evaluate(service, conditions, args.k)}
+        for endpoint, template in QUERY_TEMPLATES.items():
+            results[f"rare_drugs_{endpoint}"] = _evaluate(service, RARE_DRUGS, args.k, template)
+        results["nonsense_documents"] = _nonsense_documents(service, args.k)
+        return results
+
+    for shard in shards:
+        shard.lexical_index = None
+    dense = evaluate_all()
+    for shard, lexical_index in zip(shards, lexical_indexes):
+        shard.lexical_index = lexical_index
+    hybrid = evaluate_all()
+
+    print(json.dumps({"queries": len(conditions), "rare_drug_queries": len(RARE_DRUGS), "dense": dense, "hybrid": hybrid}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
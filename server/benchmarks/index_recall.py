@@ -0,0 +1,97 @@
+"""Recall@k and latency of each FAISS index mode against the flat baseline.
+
+Uses the chunk embeddings cached by the vector store build, so it needs a
+prior build (or it will run one). Run from the ``server`` directory::
+
+    python -m benchmarks.index_recall --k 5 --holdout 500
+    python -m benchmarks.index_recall --queries queries.txt
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from config import RAGConfig
+from index_builder import VectorStoreBuilder
+from index_factory import INDEX_TYPES, build_index, configure_search
+
+
+def _search_latency(index, queries: np.ndarray, k: int):
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query[None, :], k)
+    per_query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    _, neighbours = index.search(queries, k)
+    return neighbours, per_query_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, default=RAGConfig.RETRIEVAL_K)
+    parser.add_argument("--holdout", type=int, default=500, help="Chunks held out of the index and used as queries")
+    parser.add_argument("--queries", help="File with one query per line, used instead of held-out chunks")
+    parser.add_argument("--modes", nargs="+", default=list(INDEX_TYPES))
+    args = parser.parse_args()
+
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    config = RAGConfig()
+    embeddings = HuggingFaceEmbeddings(
+        model_name=config.EMBEDDING_MODEL,
+        model_kwargs={'device': config.EMBEDDING_DEVICE}
+    )
+    builder = VectorStoreBuilder(
+        embeddings,
+        embedding_model=config.EMBEDDING_MODEL,
+        cache_dir=config.DOCUMENTS_CACHE_PATH,
+        chunk_size=config.CHUNK_SIZE,
+        chunk_overlap=config.CHUNK_OVERLAP,
+        workers=config.BUILD_WORKERS,
+    )
+    vectors = builder.build([config.PDF_PATH] + list(config.ADDITIONAL_PDF_PATHS)).vectors
+    builder.close()
+
+    if args.queries:
+        with open(args.queries) as f:
+            lines = [line.strip() for line in f if line.strip()]
+        queries = np.asarray(embeddings.embed_documents(lines), dtype=np.float32)
+        base = vectors
+    else:
+        rng = np.random.default_rng(0)
+        order = rng.permutation(len(vectors))
+        queries, base = vectors[order[:args.holdout]], vectors[order[args.holdout:]]
+
+    report = {"k": args.k, "base_vectors": len(base), "queries": len(queries), "modes": {}}
+    truth = None
+    for mode in ["flat"] + [m for m in args.modes if m != "flat"]:
+        build_start = time.perf_counter()
+        index = build_index(
+            base,
+            index_type=mode,
+            nlist=config.INDEX_NLIST,
+            pq_m=config.INDEX_PQ_M,
+            pq_nbits=config.INDEX_PQ_NBITS,
+            hnsw_m=config.INDEX_HNSW_M,
+            ef_construction=config.INDEX_HNSW_EF_CONSTRUCTION,
+            training_size=config.INDEX_TRAINING_SIZE,
+        )
+        build_seconds = time.perf_counter() - build_start
+        configure_search(index, nprobe=config.INDEX_NPROBE, ef_search=config.INDEX_HNSW_EF_SEARCH)
+
+        neighbours, per_query_ms = _search_latency(index, queries, args.k)
+        if truth is None:
+            truth = neighbours
+        recall = np.mean([len(set(found) & set(expected)) / args.k for found, expected in zip(neighbours, truth)])
+
+        report["modes"][mode] = {
+            f"recall@{args.k}": float(recall),
+            "latency_ms_per_query": per_query_ms,
+            "build_seconds": build_seconds,
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""Drive LLMGateway against the local stub and check its limits.
+
+Runs a burst of requests with injected 429/503s through the configured
+endpoint limits and reports success rate, retries, peak queue depth and
+latency percentiles, then checks that:
+
+- no more requests are in flight than the endpoint's concurrency limit,
+  as counted by both the gateway and the stub;
+- injected rejections are retried rather than surfaced;
+- retries wait at least ``Retry-After`` when it is sent, stay within the
+  backoff cap when it is not, and give up after ``max_retries``;
+- requests queued or running past their deadline fail with
+  ``LLMDeadlineExceeded`` shortly after it;
+- token reservations follow measured usage, so a burst of short answers
+  is not held back by ``max_tokens``, and unused tokens are refunded.
+
+Exits non-zero on any failed check. Run from the ``server`` directory::
+
+    python -m benchmarks.llm_gateway --requests 200 --error-rate 0.2
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from groq import APIStatusError
+
+from benchmarks.stub_llm import start_stub_server
+from config import RAGConfig
+from llm_gateway import LLMDeadlineExceeded, LLMGateway
+
+MESSAGES = [{"role": "system", "content": "stub"}, {"role": "user", "content": "headache and fever"}]
+SLACK_SECONDS = 0.15  # Scheduling and HTTP overhead allowed on top of a computed wait
+
+
+def _gateway(base_url: str, **overrides) -> LLMGateway:
+    settings = dict(
+        endpoint_concurrency=RAGConfig.LLM_ENDPOINT_CONCURRENCY,
+        endpoint_deadlines=RAGConfig.LLM_ENDPOINT_DEADLINE_SECONDS,
+        tokens_per_minute=RAGConfig.LLM_TOKENS_PER_MINUTE,
+        max_retries=RAGConfig.LLM_MAX_RETRIES,
+        backoff_base=RAGConfig.LLM_BACKOFF_BASE_SECONDS,
+        backoff_max=RAGConfig.LLM_BACKOFF_MAX_SECONDS,
+    )
+    settings.update(overrides)
+    return LLMGateway("benchmark", RAGConfig.LLM_MODEL, base_url=base_url, **settings)
+
+
+async def _request(gateway: LLMGateway, endpoint: str, stream: bool = False, max_tokens: int = 32):
+    if stream:
+        async for _ in gateway.stream(endpoint, MESSAGES, max_tokens=max_tokens, temperature=0.0):
+            pass
+    else:
+        await gateway.complete(endpoint, MESSAGES, max_tokens=max_tokens, temperature=0.0)
+
+
+def _gaps(arrivals) -> list:
+    return [later - earlier for earlier, later in zip(arrivals, arrivals[1:])]
+
+
+async def _burst(args) -> dict:
+    server, stub, base_url = start_stub_server(
+        latency_ms=args.latency_ms, tokens_per_second=args.tokens_per_second, error_rate=args.error_rate
+    )
+    gateway = _gateway(base_url, tokens_per_minute=args.tokens_per_minute)
+    latencies, errors = [], {}
+
+    async def one():
+        start = time.perf_counter()
+        try:
+            await _request(gateway, args.endpoint, args.stream)
+            latencies.append(time.perf_counter() - start)
+        except LLMDeadlineExceeded:
+            errors["deadline"] = errors.get("deadline", 0) + 1
+        except Exception as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - start
+    await gateway.aclose()
+    server.shutdown()
+
+    stats = gateway.get_stats()
+    endpoint_stats = stats["endpoints"][args.endpoint]
+    limit = endpoint_stats["concurrency"]
+    latencies.sort()
+    # With up to max_retries retries, a request fails only if every attempt is rejected
+    expected_failures = args.requests * args.error_rate ** (RAGConfig.LLM_MAX_RETRIES + 1)
+    return {
+        "requests": args.requests,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else None,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else None,
+        "gateway": stats,
+        "stub": {"requests": stub.requests, "rejected": stub.rejected, "max_in_flight": stub.max_in_flight},
+        "checks": {
+            "gateway_in_flight_within_limit": endpoint_stats["max_in_flight"] <= limit,
+            "stub_in_flight_within_limit": stub.max_in_flight <= limit,
+            "limit_reached": endpoint_stats["max_in_flight"] == min(limit, args.requests),
+            "rejections_retried": args.error_rate == 0 or endpoint_stats["retries"] > 0,
+            "rejections_not_surfaced": args.requests - len(latencies) <= max(1, 10 * expected_failures),
+        },
+    }
+
+
+async def _retry_after() -> dict:
+    retry_after, failures = 0.3, 2
+    server, stub, base_url = start_stub_server(latency_ms=10, retry_after=retry_after, fail_first=failures)
+    gateway = _gateway(base_url, max_retries=failures, backoff_max=1.0)
+    error = None
+    try:
+        await _request(gateway, "chat")
+    except Exception as e:
+        error = type(e).__name__
+    await gateway.aclose()
+    server.shutdown()
+
+    gaps = _gaps(stub.arrivals)
+    return {
+        "error": error,
+        "gaps_ms": [gap * 1000 for gap in gaps],
+        "checks": {
+            "succeeded": error is None,
+            "retried_each_rejection": stub.requests == failures + 1,
+            "waited_retry_after": len(gaps) == failures and all(gap >= retry_after * 0.95 for gap in gaps),
+        },
+    }
+
+
+async def _backoff() -> dict:
+    base, cap, retries = 0.05, 0.15, 3
+    server, stub, base_url = start_stub_server(latency_ms=10, retry_after=None, fail_first=retries)
+    gateway = _gateway(base_url, max_retries=retries, backoff_base=base, backoff_max=cap)
+    error = None
+    try:
+        await _request(gateway, "chat")
+    except Exception as e:
+        error = type(e).__name__
+    gaps = _gaps(stub.arrivals)
+
+    # One more rejection than the gateway retries must reach the caller
+    stub.requests, stub.fail_first, stub.arrivals = 0, retries + 1, []
+    gave_up = False
+    try:
+        await _request(gateway, "chat")
+    except APIStatusError:
+        gave_up = True
+    await gateway.aclose()
+    server.shutdown()
+
+    return {
+        "error": error,
+        "gaps_ms": [gap * 1000 for gap in gaps],
+        "checks": {
+            "succeeded": error is None,
+            # Full jitter draws each delay from [0, min(cap, base * 2 ** attempt)]
+            "within_backoff_cap": len(gaps) == retries and all(
+                gap <= min(cap, base * 2 ** attempt) + SLACK_SECONDS for attempt, gap in enumerate(gaps)
+            ),
+            "gives_up_after_max_retries": gave_up and stub.requests == retries + 1,
+        },
+    }
+
+
+async def _deadline() -> dict:
+    deadline, latency_ms = 0.5, 300
+    server, stub, base_url = start_stub_server(latency_ms=latency_ms, tokens_per_second=10000)
+    gateway = _gateway(base_url, endpoint_concurrency={"chat": 1}, endpoint_deadlines={"chat": deadline})
+
+    async def timed(endpoint: str):
+        start = time.perf_counter()
+        try:
+            await _request(gateway, endpoint)
+            return "ok", time.perf_counter() - start
+        except LLMDeadlineExceeded:
+            return "deadline", time.perf_counter() - start
+
+    # Only one request fits in the deadline; the rest time out in the queue
+    queued = await asyncio.gather(*(timed("chat") for _ in range(4)))
+    # A single request slower than its deadline times out while running
+    stub.latency_ms = 1000
+    running = await timed("chat")
+    await gateway.aclose()
+    server.shutdown()
+
+    outcomes = [outcome for outcome, _ in queued]
+    return {
+        "queued": [{"outcome": outcome, "ms": seconds * 1000} for outcome, seconds in queued],
+        "running": {"outcome": running[0], "ms": running[1] * 1000},
+        "checks": {
+            "first_request_served": outcomes.count("ok") == 1,
+            "queued_requests_time_out": outcomes.count("deadline") == len(queued) - 1,
+            "running_request_times_out": running[0] == "deadline",
+            "fails_soon_after_deadline": all(seconds <= deadline + SLACK_SECONDS for _, seconds in queued + [running]),
+            "counted": gateway.get_stats()["endpoints"]["chat"]["deadline_exceeded"] == outcomes.count("deadline") + 1,
+        },
+    }
+
+
+async def _token_budget() -> dict:
+    # Room for a dozen reservations of max_tokens, but hundreds of the short answers the stub gives
+    max_tokens, requests = 1000, 40
+    tokens_per_minute = 12 * max_tokens
+    server, stub, base_url = start_stub_server(latency_ms=10, tokens_per_second=10000)
+    gateway = _gateway(base_url, tokens_per_minute=tokens_per_minute)
+
+    await _request(gateway, "chat", max_tokens=max_tokens)
+    after_one = gateway.get_stats()["tokens_available"]
+    await asyncio.gather(*(_request(gateway, "chat", max_tokens=max_tokens) for _ in range(requests)))
+    stats = gateway.get_stats()
+    await gateway.aclose()
+    server.shutdown()
+
+    return {
+        "tokens_available_after_one": after_one,
+        "expected_completion_tokens": stats["endpoints"]["chat"]["completion_tokens"],
+        "rate_limit_wait_seconds": stats["rate_limit_wait_seconds"],
+        "checks": {
+            "unused_tokens_refunded": after_one >= tokens_per_minute - 100,
+            "reservation_follows_usage": stats["endpoints"]["chat"]["completion_tokens"] < max_tokens / 10,
+            "short_answers_not_throttled": stats["rate_limit_wait_seconds"] == 0,
+        },
+    }
+
+
+async def _run(args) -> dict:
+    return {
+        "burst": await _burst(args),
+        "retry_after": await _retry_after(),
+        "backoff": await _backoff(),
+        "deadline": await _deadline(),
+        "token_budget": await _token_budget(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--endpoint", default="chat", choices=sorted(RAGConfig.LLM_ENDPOINT_CONCURRENCY))
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--tokens-per-second", type=float, default=500.0)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--tokens-per-minute", type=int, default=RAGConfig.LLM_TOKENS_PER_MINUTE)
+    args = parser.parse_args()
+
+    report = asyncio.run(_run(args))
+    failed = [f"{case}.{check}" for case, result in report.items() for check, ok in result["checks"].items() if not ok]
+    report["failed"] = failed
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""End-to-end load test of the API against a stub LLM and a synthetic corpus.
+
+Generates a synthetic encyclopedia PDF, starts the stub LLM server and
+``main:app`` under uvicorn (pointed at both through DOCBOT_* setting
+overrides), waits for the index to be built, then drives /chat,
+/analyze-symptoms and /medical-info in turn at a fixed concurrency.
+Reports throughput, p50/p95/p99 latency and a per-stage breakdown taken
+from the server's Server-Timing header, and writes everything as JSON so
+runs can be compared. Run from the ``server`` directory::
+
+    python -m benchmarks.load_test --concurrency 16 --requests 200 --output baseline.json
+    python -m benchmarks.load_test --set CHUNK_SIZE=500 --set 'CONTEXT_TOKEN_BUDGETS={"analyze_symptoms": 400, "chat": 300, "medical_info": 400}' --output chunk500.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import httpx
+
+from benchmarks.synthetic_corpus import SYMPTOMS, generate
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = ("chat", "analyze_symptoms", "medical_info")
+CHAT_TEMPLATES = [
+    "What are the symptoms of {name}?",
+    "How is {name} treated?",
+    "What causes {name}?",
+    "Is {name} contagious and how is it diagnosed?",
+]
+
+
+def _percentile(ordered: List[float], fraction: float):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _parse_server_timing(header: str) -> Dict[str, float]:
+    stages = {}
+    for entry in header.split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur" and name:
+                stages[name] = float(value)
+    return stages
+
+
+def _request_factory(endpoint: str, names: List[str], rng: random.Random) -> Callable[[int], Tuple[str, str, Any]]:
+    """(method, path, json body) for the i-th request to an endpoint"""
+    if endpoint == "chat":
+        return lambda i: ("POST", "/chat", {"message": rng.choice(CHAT_TEMPLATES).format(name=names[i % len(names)])})
+    if endpoint == "analyze_symptoms":
+        return lambda i: ("POST", "/analyze-symptoms", {
+            "symptoms": f"{', '.join(rng.sample(SYMPTOMS, 3))} for {rng.randint(1, 10)} days",
+            "age": rng.randint(5, 80),
+        })
+    return lambda i: ("GET", f"/medical-info/{names[i % len(names)]}", None)
+
+
+async def _drive(base_url: str, endpoint: str, make_request, requests: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def worker():
+            while True:
+                try:
+                    i = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                method, path, body = make_request(i)
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                except httpx.HTTPError as e:
+                    errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                    continue
+                elapsed = (time.perf_counter() - start) * 1000
+                if response.status_code != 200:
+                    errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+                    continue
+                latencies.append(elapsed)
+                for stage, duration in _parse_server_timing(response.headers.get("server-timing", "")).items():
+                    stages.setdefault(stage, []).append(duration)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed,
+        "latency_ms": {
+            "mean": sum(latencies) / len(latencies) if latencies else None,
+            "p50": _percentile(latencies, 0.50),
+            "p95": _percentile(latencies, 0.95),
+            "p99": _percentile(latencies, 0.99),
+        },
+        # Stages a request skipped (e.g. llm on a cache hit, or everything for a request
+        # coalesced into another one) are absent, so sample counts can be below "succeeded"
+        "stages_ms": {
+            stage: {
+                "samples": len(values),
+                "mean": sum(values) / len(values),
+                "p50": _percentile(sorted(values), 0.50),
+                "p95": _percentile(sorted(values), 0.95),
+            }
+            for stage, values in sorted(stages.items())
+        },
+    }
+
+
+def _wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float) -> Dict[str, Any]:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            status = httpx.get(f"{base_url}/rag-status", timeout=5.0).json()
+            if status.get("status") in ("ready", "error"):
+                return status
+        except httpx.HTTPError:
+            pass
+        time.sleep(1.0)
+    raise TimeoutError(f"Server at {base_url} was not ready after {timeout:.0f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="Comma-separated subset of " + ", ".join(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100, help="Requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed requests per endpoint")
+    parser.add_argument("--entries", type=int, default=200, help="Synthetic corpus entries")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=150.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--stub-port", type=int, default=8900)
+    parser.add_argument("--set", action="append", default=[], metavar="SETTING=VALUE", help="RAGConfig override, e.g. CHUNK_SIZE=500")
+    parser.add_argument("--keep-cache", action="store_true", help="Leave the semantic response cache enabled")
+    parser.add_argument("--workdir", default=None, help="Keep corpus and index here between runs (default: a temp dir)")
+    parser.add_argument("--ready-timeout", type=float, default=600.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write results JSON here as well as stdout")
+    args = parser.parse_args()
+
+    endpoints = [endpoint.strip() for endpoint in args.endpoints.split(",") if endpoint.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="docbot-load-")
+    os.makedirs(workdir, exist_ok=True)
+    corpus_path = os.path.join(workdir, "corpus.pdf")
+    names = generate(corpus_path, args.entries, args.seed)
+
+    overrides = {
+        "PDF_PATH": corpus_path,
+        "ADDITIONAL_PDF_PATHS": "[]",
+        "VECTOR_STORE_PATH": os.path.join(workdir, "vector_store"),
+        "DOCUMENTS_CACHE_PATH": os.path.join(workdir, "documents_cache"),
+        "CONDITION_PAGES_PATH": os.path.join(workdir, "condition_pages"),
+        "SEMANTIC_CACHE_PATH": "null",
+        "LLM_BASE_URL": f"http://127.0.0.1:{args.stub_port}",
+        "LLM_TOKENS_PER_MINUTE": "null",
+    }
+    if not args.keep_cache:
+        overrides["SEMANTIC_CACHE_ENABLED"] = "false"
+    for assignment in args.set:
+        name, sep, value = assignment.partition("=")
+        if not sep:
+            parser.error(f"--set expects SETTING=VALUE, got {assignment!r}")
+        overrides[name.strip().upper()] = value
+
+    env = dict(os.environ)
+    env.setdefault("GROQ_API_KEY", "load-test")
+    env.update({f"DOCBOT_{name}": value for name, value in overrides.items()})
+
+    stub = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.stub_llm", "--port", str(args.stub_port),
+        "--latency-ms", str(args.llm_latency_ms), "--tokens-per-second", str(args.llm_tokens_per_second),
+    ], cwd=SERVER_DIR)
+    server = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning",
+    ], cwd=SERVER_DIR, env=env)
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        start = time.perf_counter()
+        status = _wait_until_ready(base_url, server, args.ready_timeout)
+        ready_seconds = time.perf_counter() - start
+        if status["status"] != "ready":
+            raise RuntimeError(f"RAG initialization failed: {status.get('startup_error')}")
+
+        rng = random.Random(args.seed)
+        results = {
+            "settings": {
+                "concurrency": args.concurrency,
+                "requests_per_endpoint": args.requests,
+                "corpus_entries": args.entries,
+                "llm_latency_ms": args.llm_latency_ms,
+                "llm_tokens_per_second": args.llm_tokens_per_second,
+                "overrides": {name: value for name, value in overrides.items() if name not in ("PDF_PATH", "VECTOR_STORE_PATH", "DOCUMENTS_CACHE_PATH", "CONDITION_PAGES_PATH")},
+            },
+            "server": {
+                "ready_seconds": ready_seconds,
+                "index_type": status.get("index_type"),
+                "build_stats": status.get("build_stats"),
+            },
+            "endpoints": {},
+        }
+        for endpoint in endpoints:
+            make_request = _request_factory(endpoint, names, rng)
+            asyncio.run(_drive(base_url, endpoint, make_request, args.warmup, args.concurrency))
+            results["endpoints"][endpoint] = asyncio.run(_drive(base_url, endpoint, make_request, args.requests, args.concurrency))
+            summary = results["endpoints"][endpoint]
+            print(
+                f"{endpoint}: {summary['throughput_rps']:.1f} req/s, p50 {summary['latency_ms']['p50'] or 0:.0f}ms, "
+                f"p95 {summary['latency_ms']['p95'] or 0:.0f}ms, p99 {summary['latency_ms']['p99'] or 0:.0f}ms",
+                file=sys.stderr,
+            )
+    finally:
+        server.terminate()
+        stub.terminate()
+        server.wait(timeout=30)
+        stub.wait(timeout=30)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
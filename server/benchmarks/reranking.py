@@ -0,0 +1,65 @@
+"""Retrieval with and without cross-encoder reranking: quality, depth and latency.
+
+Uses the same condition-name queries and hit criterion as
+``benchmarks.hybrid_retrieval``. The reranked pass runs twice, cold and then
+with the (query, chunk) score cache warm. Run from the ``server`` directory::
+
+    python -m benchmarks.reranking --k 3
+    python -m benchmarks.reranking --latency-budget-ms 30 --margin 0.1
+"""
+import argparse
+import json
+
+from benchmarks.hybrid_retrieval import SAMPLE_CONDITIONS, _evaluate
+from config import RAGConfig
+from rag_service import RAGService
+from reranker import CrossEncoderReranker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--conditions", help="File with one condition name per line")
+    parser.add_argument("--candidates", type=int, default=RAGConfig.RERANK_CANDIDATES)
+    parser.add_argument("--margin", type=float, default=RAGConfig.RERANK_SCORE_MARGIN)
+    parser.add_argument("--latency-budget-ms", type=float, default=RAGConfig.RERANK_LATENCY_BUDGET_MS)
+    args = parser.parse_args()
+
+    conditions = SAMPLE_CONDITIONS
+    if args.conditions:
+        with open(args.conditions) as f:
+            conditions = [line.strip() for line in f if line.strip()]
+
+    service = RAGService(groq_api_key="benchmark")
+    service.initialize()
+    service.reranker = None
+    baseline = _evaluate(service, conditions, args.k)
+
+    config = service.config
+    reranker = CrossEncoderReranker(
+        model_name=config.RERANK_MODEL,
+        max_candidates=args.candidates,
+        min_candidates=config.RERANK_MIN_CANDIDATES,
+        score_margin=args.margin,
+        latency_budget_ms=args.latency_budget_ms,
+        min_score=config.RERANK_MIN_SCORE,
+        batch_size=config.RERANK_BATCH_SIZE,
+        max_length=config.RERANK_MAX_LENGTH,
+        cache_size=config.RERANK_CACHE_SIZE,
+    )
+    reranker.load()
+    service.reranker = reranker
+    cold = _evaluate(service, conditions, args.k)
+    warm = _evaluate(service, conditions, args.k)
+
+    print(json.dumps({
+        "queries": len(conditions),
+        "baseline": baseline,
+        "reranked_cold": cold,
+        "reranked_warm": warm,
+        "reranker": reranker.get_stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Retrieval throughput vs. concurrency: blocking calls vs. the batched executor.
+
+Run from the ``server`` directory against an existing vector store::
+
+    python -m benchmarks.retrieval_throughput --requests 512 --concurrency 1 4 16 64
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import List
+
+from rag_service import RAGService
+
+SAMPLE_QUERIES = [
+    "symptoms fever headache stiff neck diagnosis treatment",
+    "What causes type 2 diabetes?",
+    "asthma symptoms causes treatment diagnosis",
+    "How is hypertension treated?",
+    "symptoms chest pain shortness of breath diagnosis treatment",
+    "migraine symptoms causes treatment diagnosis",
+    "What are the side effects of ibuprofen?",
+    "symptoms rash joint pain fatigue diagnosis treatment",
+]
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+async def _drive(call, total: int, concurrency: int) -> dict:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            query = f"{SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]} {i}"
+            start = time.perf_counter()
+            await call(query)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "throughput_qps": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    service = RAGService(groq_api_key="benchmark")
+    service.initialize()
+
+    async def blocking(query: str):
+        # The pre-batching path: a synchronous search on the event loop
+        service.get_relevant_context(query, k=args.k)
+
+    async def batched(query: str):
+        await service.aget_relevant_context(query, k=args.k)
+
+    report = {"blocking": [], "batched": []}
+    for concurrency in args.concurrency:
+        report["blocking"].append(await _drive(blocking, args.requests, concurrency))
+        report["batched"].append(await _drive(batched, args.requests, concurrency))
+
+    report["batcher"] = service.batcher.get_stats()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,134 @@
+"""Check request coalescing against a slow stub LLM client.
+
+Fires bursts of concurrent identical requests through ``SingleFlight`` the
+way the endpoints do (key = endpoint plus normalized text, work = one LLM
+completion) and checks that:
+
+- a burst of identical requests makes one LLM call, distinct keys one each;
+- every caller gets an independent copy (mutating one result does not
+  change the others);
+- cancelling the leader does not cancel the shared call for the waiters;
+- an LLM error reaches every caller, and the key is retried afterwards.
+
+Needs only the standard library. Exits non-zero on any failed check. Run
+from the ``server`` directory::
+
+    python -m benchmarks.single_flight
+    python -m benchmarks.single_flight --concurrency 500 --latency-ms 50
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from single_flight import SingleFlight, normalize_key_text
+
+
+class SlowStubLLM:
+    """Completion client that answers after a fixed delay, optionally failing"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.fail = False
+
+    async def complete(self, prompt: str) -> dict:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.fail:
+            raise RuntimeError("stub LLM failure")
+        return {"information": f"Answer for {prompt}", "sources": [{"source": "stub.pdf", "page": 1}]}
+
+
+def _request(flight: SingleFlight, llm: SlowStubLLM, condition: str):
+    key = json.dumps(["medical_info", normalize_key_text(condition)])
+    return flight.do(key, lambda: llm.complete(condition))
+
+
+async def _coalesces(concurrency: int, latency: float) -> dict:
+    flight, llm = SingleFlight(), SlowStubLLM(latency)
+    start = time.perf_counter()
+    # Case and whitespace variants share a key
+    variants = ["Asthma", "asthma", "  ASTHMA "]
+    results = await asyncio.gather(*(_request(flight, llm, variants[i % len(variants)]) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    results[0]["sources"].append({"source": "mutated"})
+    results[0]["information"] = "mutated"
+    independent = all(
+        result["information"] == "Answer for Asthma" and len(result["sources"]) == 1 for result in results[1:]
+    ) and len({id(result) for result in results}) == len(results)
+
+    await asyncio.gather(_request(flight, llm, "asthma"), _request(flight, llm, "bronchitis"))
+    return {
+        "llm_calls": llm.calls,
+        "collapsed": flight.collapsed,
+        "elapsed_ms": elapsed * 1000,
+        "checks": {
+            "one_call_per_burst": llm.calls == 3,  # The burst, then one each for the two distinct keys
+            "all_answered": len(results) == concurrency,
+            "independent_copies": independent,
+            "not_in_flight_after": flight.get_stats()["in_flight"] == 0,
+        },
+    }
+
+
+async def _leader_cancelled(waiters: int, latency: float) -> dict:
+    flight, llm = SingleFlight(), SlowStubLLM(latency)
+    leader = asyncio.ensure_future(_request(flight, llm, "Asthma"))
+    await asyncio.sleep(0)
+    others = [asyncio.ensure_future(_request(flight, llm, "asthma")) for _ in range(waiters)]
+    await asyncio.sleep(latency / 4)
+    leader.cancel()
+    results = await asyncio.gather(*others, return_exceptions=True)
+    return {
+        "llm_calls": llm.calls,
+        "checks": {
+            "leader_cancelled": leader.cancelled(),
+            "waiters_answered": all(isinstance(result, dict) for result in results),
+            "one_call": llm.calls == 1,
+        },
+    }
+
+
+async def _leader_raises(waiters: int, latency: float) -> dict:
+    flight, llm = SingleFlight(), SlowStubLLM(latency)
+    llm.fail = True
+    results = await asyncio.gather(*(_request(flight, llm, "Asthma") for _ in range(waiters + 1)), return_exceptions=True)
+    llm.fail = False
+    retried = await _request(flight, llm, "Asthma")
+    return {
+        "llm_calls": llm.calls,
+        "checks": {
+            "every_caller_sees_error": all(isinstance(result, RuntimeError) for result in results),
+            "one_failed_call": llm.calls == 2,  # The failed burst plus the retry below
+            "retried_after_error": retried["information"] == "Answer for Asthma",
+        },
+    }
+
+
+async def _run(args) -> dict:
+    latency = args.latency_ms / 1000
+    return {
+        "coalesces": await _coalesces(args.concurrency, latency),
+        "leader_cancelled": await _leader_cancelled(args.concurrency - 1, latency),
+        "leader_raises": await _leader_raises(args.concurrency - 1, latency),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=100, help="Identical requests per burst")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Stub LLM latency")
+    args = parser.parse_args()
+
+    report = asyncio.run(_run(args))
+    failed = [f"{case}.{check}" for case, result in report.items() for check, ok in result["checks"].items() if not ok]
+    report["failed"] = failed
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
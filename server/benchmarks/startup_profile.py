@@ -0,0 +1,64 @@
+"""Import-time and startup profile of the server.
+
+Imports ``main`` in a fresh interpreter under ``-X importtime``, then runs the
+RAG initialization the lifespan task would run, and reports the slowest
+imports plus the time spent in each startup phase. Run from the ``server``
+directory::
+
+    python -m benchmarks.startup_profile --top 20
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+PROBE = """
+import json, time
+start = time.perf_counter()
+import main
+import_seconds = time.perf_counter() - start
+start = time.perf_counter()
+main.rag_service.initialize()
+print(json.dumps({
+    "import_main_seconds": import_seconds,
+    "initialize_seconds": time.perf_counter() - start,
+    "status": main.rag_service.status,
+    "phases_seconds": main.rag_service.startup_timings,
+}))
+"""
+
+
+def _parse_importtime(stderr: str, top: int):
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        imports.append({
+            "module": name.strip(),
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    return sorted(imports, key=lambda entry: entry["cumulative_ms"], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("GROQ_API_KEY", "startup-profile")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        capture_output=True, text=True, env=env, check=True,
+    )
+
+    startup = json.loads(completed.stdout.strip().splitlines()[-1])
+    startup["slowest_imports"] = _parse_importtime(completed.stderr, args.top)
+    print(json.dumps(startup, indent=2))
+
+
+if __name__ == "__main__":
+    main()
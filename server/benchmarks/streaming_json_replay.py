@@ -0,0 +1,110 @@
+"""Replay recorded symptom analysis token streams through the streaming JSON parser.
+
+Each fixture stream is fed chunk by chunk, as ``stream_symptom_analysis``
+receives it from the LLM, and checked against its expectations: the
+urgency level, the possible conditions sent before the stream ends, and
+the repaired, validated final answer. Reports how early in the stream
+urgency and the first condition reach the client, and the parser's cost
+per chunk. Exits non-zero if any stream does not match. Run from the
+``server`` directory::
+
+    python -m benchmarks.streaming_json_replay
+    python -m benchmarks.streaming_json_replay --fixtures recorded.json --repeats 200
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from schemas import coerce_condition, coerce_symptom_analysis, normalize_urgency
+from streaming_json import StreamingJSONParser
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "symptom_streams.json")
+
+
+def _replay(chunks):
+    parser = StreamingJSONParser(stream_arrays=("possible_conditions",))
+    urgency = urgency_chunk = first_condition_chunk = None
+    conditions = 0
+    for position, chunk in enumerate(chunks):
+        for kind, key, value in parser.feed(chunk):
+            if kind == "item":
+                if coerce_condition(value) is not None:
+                    conditions += 1
+                    if first_condition_chunk is None:
+                        first_condition_chunk = position
+            elif key == "urgency_level" and urgency is None:
+                urgency, urgency_chunk = normalize_urgency(value), position
+    result = coerce_symptom_analysis(parser.close())
+    return {
+        "urgency_level": urgency,
+        "urgency_chunk": urgency_chunk,
+        "first_condition_chunk": first_condition_chunk,
+        "streamed_conditions": conditions,
+        "result": result,
+    }
+
+
+def _check(expect, replayed):
+    result = replayed["result"]
+    actual = {
+        # A stream cut off before urgency_level still gets a (validated) final value
+        "urgency_level": replayed["urgency_level"] or result["urgency_level"],
+        "streamed_conditions": replayed["streamed_conditions"],
+        "conditions": len(result["possible_conditions"]),
+        "treatment_recommendations": len(result["treatment_recommendations"]),
+        "follow_up_questions": len(result["follow_up_questions"]),
+    }
+    return {key: {"expected": value, "actual": actual[key]} for key, value in expect.items() if actual[key] != value}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=FIXTURES_PATH, help="JSON file of recorded streams")
+    parser.add_argument("--repeats", type=int, default=50, help="Replays per stream when timing the parser")
+    args = parser.parse_args()
+
+    with open(args.fixtures) as f:
+        streams = json.load(f)["streams"]
+
+    report = {"streams": [], "failures": 0}
+    for stream in streams:
+        chunks = stream["chunks"]
+        try:
+            replayed = _replay(chunks)
+            mismatches = _check(stream.get("expect", {}), replayed)
+        except ValueError as e:
+            replayed, mismatches = None, {"error": str(e)}
+
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            streaming = StreamingJSONParser(stream_arrays=("possible_conditions",))
+            for chunk in chunks:
+                streaming.feed(chunk)
+            streaming.close()
+        per_chunk_us = (time.perf_counter() - start) / (args.repeats * len(chunks)) * 1e6
+
+        run = {
+            "name": stream["name"],
+            "chunks": len(chunks),
+            "urgency_chunk": replayed["urgency_chunk"] if replayed else None,
+            "first_condition_chunk": replayed["first_condition_chunk"] if replayed else None,
+            "parser_us_per_chunk": per_chunk_us,
+            "ok": not mismatches,
+        }
+        if mismatches:
+            run["mismatches"] = mismatches
+            report["failures"] += 1
+        report["streams"].append(run)
+        print(
+            f"{'ok  ' if run['ok'] else 'FAIL'} {stream['name']:<36} {len(chunks):>4} chunks, urgency at "
+            f"{run['urgency_chunk']}, first condition at {run['first_condition_chunk']}, {per_chunk_us:.1f}us/chunk"
+        )
+
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report["failures"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Local OpenAI/Groq-compatible chat completions stub.
+
+Answers ``POST .../chat/completions`` (streaming or not) after a fixed
+latency, emits tokens at a fixed rate and can reject a fraction of requests
+(or the first few) with 429 or 503 to exercise retry paths. It records
+arrival times and peak concurrency so callers can check their limits. Prompts asking for JSON get a
+well-formed symptom analysis so /analyze-symptoms takes its normal path.
+Standard library only, so it runs anywhere the server does::
+
+    python -m benchmarks.stub_llm --port 8900 --latency-ms 200 --tokens-per-second 200
+    DOCBOT_LLM_BASE_URL=http://127.0.0.1:8900 uvicorn main:app
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+
+STUB_TEXT = (
+    "Based on the medical reference material, these symptoms are most often associated with a "
+    "self-limiting condition. Rest, fluids and monitoring are usually sufficient, but please consult "
+    "a healthcare provider if symptoms worsen or persist."
+)
+
+STUB_ANALYSIS = {
+    "analysis_summary": "Symptoms are consistent with a common viral illness.",
+    "possible_conditions": [{
+        "name": "Viral infection", "probability": "Moderate", "description": "Self-limiting infection",
+        "common_symptoms": ["fever", "fatigue", "headache"], "reference_match": "Partial",
+    }],
+    "treatment_recommendations": [{
+        "type": "Home care", "description": "Rest and fluids", "urgency": "low", "source": "Stub",
+    }],
+    "urgency_level": "low",
+    "medical_evidence": "Stub evidence",
+    "disclaimer": "Stub response",
+    "follow_up_questions": ["How long have you had these symptoms?"],
+}
+
+
+class StubSettings:
+    def __init__(
+        self,
+        latency_ms: float = 200.0,
+        tokens_per_second: float = 200.0,
+        error_rate: float = 0.0,
+        retry_after: Optional[float] = 0.2,
+        fail_first: int = 0,
+    ):
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.retry_after = retry_after  # None sends no Retry-After header
+        self.fail_first = fail_first
+        self.requests = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.arrivals = []  # time.monotonic() of every request, in order
+        self.lock = threading.Lock()
+
+
+def _handler(settings: StubSettings):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+            if not self.path.endswith("/chat/completions"):
+                return self._send_json(404, {"error": {"message": "not found"}})
+
+            with settings.lock:
+                settings.requests += 1
+                settings.arrivals.append(time.monotonic())
+                reject = settings.requests <= settings.fail_first or random.random() < settings.error_rate
+                settings.rejected += reject
+            if reject:
+                status = random.choice((429, 503))
+                headers = {"retry-after": str(settings.retry_after)} if settings.retry_after is not None else {}
+                return self._send_json(status, {"error": {"message": "stub rejection"}}, headers)
+
+            with settings.lock:
+                settings.in_flight += 1
+                settings.max_in_flight = max(settings.max_in_flight, settings.in_flight)
+            try:
+                self._answer(body)
+            finally:
+                with settings.lock:
+                    settings.in_flight -= 1
+
+        def _answer(self, body):
+            time.sleep(settings.latency_ms / 1000.0)
+            wants_json = any("JSON" in m.get("content", "") for m in body.get("messages", []))
+            text = json.dumps(STUB_ANALYSIS) if wants_json else STUB_TEXT
+            words = text.split(" ")
+            if not wants_json:
+                words = words[: max(1, int(body.get("max_tokens") or 64))]
+            prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+            if body.get("stream"):
+                self._stream(body, words)
+            else:
+                time.sleep(len(words) / settings.tokens_per_second)
+                self._send_json(200, {
+                    "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": body.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(words), "total_tokens": prompt_tokens + len(words)},
+                })
+
+        def _stream(self, body, words):
+            self.send_response(200)
+            self.send_header("content-type", "text/event-stream")
+            self.send_header("transfer-encoding", "chunked")
+            self.end_headers()
+            for i, word in enumerate(words):
+                time.sleep(1.0 / settings.tokens_per_second)
+                chunk = {
+                    "id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": body.get("model"),
+                    "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+                }
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+            self._write_chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _write_chunk(self, text: str):
+            data = text.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def _send_json(self, status: int, payload: dict, headers: dict = None):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def start_stub_server(port: int = 0, **settings) -> Tuple[ThreadingHTTPServer, StubSettings, str]:
+    """Start the stub in a daemon thread; returns (server, settings, base_url)"""
+    stub_settings = StubSettings(**settings)
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(stub_settings))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stub_settings, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429/503")
+    args = parser.parse_args()
+
+    server, _, base_url = start_stub_server(
+        args.port, latency_ms=args.latency_ms, tokens_per_second=args.tokens_per_second, error_rate=args.error_rate
+    )
+    print(f"Stub LLM listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
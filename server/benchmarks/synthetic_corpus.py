@@ -0,0 +1,140 @@
+"""Generate a small synthetic medical encyclopedia PDF for benchmarks.
+
+Entries follow the layout of the real reference (title, then Definition,
+Description, Causes and symptoms, Treatment sections) so chunking, heading
+detection and retrieval behave as they do on the full corpus, but indexing
+takes seconds instead of minutes. The PDF is written directly with the
+standard library. Run from the ``server`` directory::
+
+    python -m benchmarks.synthetic_corpus --entries 200 --output /tmp/docbot/corpus.pdf
+"""
+import argparse
+import os
+import random
+import textwrap
+from typing import List, Tuple
+
+CONDITIONS = [
+    "Appendicitis", "Asthma", "Bronchitis", "Celiac disease", "Chickenpox", "Cholecystitis",
+    "Conjunctivitis", "Dehydration", "Diabetes mellitus", "Diverticulitis", "Eczema", "Gastritis",
+    "Gout", "Hepatitis A", "Hypertension", "Hypothyroidism", "Influenza", "Iron deficiency anemia",
+    "Kidney stones", "Lyme disease", "Measles", "Migraine", "Mononucleosis", "Osteoarthritis",
+    "Otitis media", "Pancreatitis", "Pneumonia", "Psoriasis", "Rheumatoid arthritis", "Scarlet fever",
+    "Shingles", "Sinusitis", "Strep throat", "Tension headache", "Tonsillitis", "Urinary tract infection",
+    "Vertigo", "Whooping cough",
+]
+SYSTEMS = ["respiratory tract", "digestive system", "skin", "nervous system", "joints", "urinary tract", "blood", "immune system"]
+SYMPTOMS = [
+    "fever", "fatigue", "headache", "nausea", "vomiting", "abdominal pain", "cough", "sore throat",
+    "joint pain", "rash", "itching", "dizziness", "shortness of breath", "chest tightness",
+    "muscle aches", "loss of appetite", "diarrhea", "swelling", "chills", "blurred vision",
+]
+TREATMENTS = [
+    "rest and increased fluid intake", "over-the-counter pain relievers", "a course of antibiotics",
+    "antiviral medication", "anti-inflammatory drugs", "dietary changes", "physical therapy",
+    "topical corticosteroids", "surgery in severe cases", "regular monitoring by a physician",
+]
+
+LINE_CHARS = 90
+LINES_PER_PAGE = 60
+
+
+def condition_names(entries: int) -> List[str]:
+    """Entry titles; the base list is reused with a numeric suffix beyond its length"""
+    return [
+        CONDITIONS[i % len(CONDITIONS)] + ("" if i < len(CONDITIONS) else f" type {i // len(CONDITIONS) + 1}")
+        for i in range(entries)
+    ]
+
+
+def _entry(name: str, rng: random.Random) -> List[str]:
+    system = rng.choice(SYSTEMS)
+    symptoms = rng.sample(SYMPTOMS, 4)
+    treatments = rng.sample(TREATMENTS, 3)
+    sections = [
+        ("Definition", f"{name} is a condition affecting the {system} that is characterized by {symptoms[0]} and {symptoms[1]}."),
+        ("Description", f"{name} occurs in people of all ages, although it is more common in "
+                        f"{rng.choice(['children', 'older adults', 'young adults', 'women', 'men'])}. "
+                        f"The course of {name.lower()} ranges from mild to severe, and most patients recover "
+                        f"within {rng.randint(1, 6)} weeks with appropriate care."),
+        ("Causes and symptoms", f"{name} is usually caused by {rng.choice(['a viral infection', 'a bacterial infection', 'inflammation', 'an autoimmune reaction', 'genetic factors'])}. "
+                                f"Common symptoms of {name.lower()} include {', '.join(symptoms[:3])} and {symptoms[3]}. "
+                                f"Patients with {name.lower()} may also report {rng.choice(SYMPTOMS)}."),
+        ("Diagnosis", f"Diagnosis of {name.lower()} is based on a physical examination, the patient's history "
+                      f"and, where needed, {rng.choice(['blood tests', 'imaging studies', 'a throat culture', 'urinalysis', 'a biopsy'])}."),
+        ("Treatment", f"Treatment of {name.lower()} includes {treatments[0]}, {treatments[1]} and {treatments[2]}. "
+                      f"Patients should seek medical attention if {symptoms[0]} becomes severe."),
+    ]
+
+    lines = [name]
+    for heading, text in sections:
+        lines.append(heading)
+        lines.extend(textwrap.wrap(text, LINE_CHARS))
+    lines.append("")
+    return lines
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _page_stream(lines: List[str]) -> bytes:
+    commands = ["BT", "/F1 10 Tf", "12 TL", "50 770 Td"]
+    commands.extend(f"({_escape(line)}) '" for line in lines)
+    commands.append("ET")
+    return "\n".join(commands).encode("latin-1", errors="replace")
+
+
+def write_pdf(path: str, pages: List[List[str]]):
+    """Write pages of text lines as a minimal single-font PDF"""
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    objects: List[Tuple[int, bytes]] = [
+        (1, b"<< /Type /Catalog /Pages 2 0 R >>"),
+        (2, f"<< /Type /Pages /Kids [{' '.join(f'{pid} 0 R' for pid in page_ids)}] /Count {len(pages)} >>".encode("ascii")),
+        (3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"),
+    ]
+    for page_id, lines in zip(page_ids, pages):
+        stream = _page_stream(lines)
+        objects.append((page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+        ).encode("ascii")))
+        objects.append((page_id + 1, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = {}
+        for object_id, body in objects:
+            offsets[object_id] = f.tell()
+            f.write(b"%d 0 obj\n" % object_id + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for object_id in range(1, len(objects) + 1):
+            f.write(b"%010d 00000 n \n" % offsets[object_id])
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def generate(path: str, entries: int = 200, seed: int = 0) -> List[str]:
+    """Write the corpus PDF and return its condition names"""
+    rng = random.Random(seed)
+    names = condition_names(entries)
+    lines = [line for name in names for line in _entry(name, rng)]
+    pages = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)]
+    write_pdf(path, pages)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="synthetic_corpus.pdf")
+    args = parser.parse_args()
+
+    names = generate(args.output, args.entries, args.seed)
+    print(f"Wrote {len(names)} entries to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
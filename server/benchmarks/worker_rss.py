@@ -0,0 +1,122 @@
+"""Per-worker memory and load time: pickled FAISS store vs. the mmap store.
+
+Starts N worker processes per format, each loading the vector store and
+running a few searches, and reports RSS and PSS (proportional set size,
+which splits shared pages between the processes mapping them). Run from the
+``server`` directory after the vector store has been built::
+
+    python -m benchmarks.worker_rss --workers 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from config import RAGConfig
+
+
+def _memory_kb() -> dict:
+    usage = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                usage["rss_kb"] = int(line.split()[1])
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    usage["pss_kb"] = int(line.split()[1])
+    except FileNotFoundError:
+        pass
+    return usage
+
+
+def _worker(store_format: str, path: str, ready, release, results):
+    from langchain_community.vectorstores import FAISS
+    from mmap_store import load_mmap_store
+
+    before = _memory_kb()
+    start = time.perf_counter()
+    if store_format == "mmap":
+        store = load_mmap_store(path, None)
+    else:
+        store = FAISS.load_local(path, None, allow_dangerous_deserialization=True)
+    load_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(os.getpid())
+    queries = rng.standard_normal((50, store.index.d)).astype(np.float32)
+    _, indices = store.index.search(queries, 5)
+    for i in indices.ravel():
+        if i != -1:
+            store.docstore.search(store.index_to_docstore_id[int(i)])
+
+    # Measure while every worker is still alive so shared pages are split between them
+    ready.wait()
+    after = _memory_kb()
+    results.put({"load_seconds": load_seconds, "before": before, "after": after})
+    release.wait()
+
+
+def _export_pickle_store(source_path: str, target_path: str):
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from mmap_store import load_mmap_store
+
+    store = load_mmap_store(source_path, None)
+    count = store.index.ntotal
+    ids = [str(i) for i in range(count)]
+    FAISS(
+        embedding_function=None,
+        index=store.index,
+        docstore=InMemoryDocstore({ids[i]: store.docstore.search(i) for i in range(count)}),
+        index_to_docstore_id=dict(enumerate(ids)),
+    ).save_local(target_path)
+
+
+def _run(store_format: str, path: str, workers: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    ready = context.Barrier(workers)
+    release = context.Barrier(workers + 1)
+    results = context.Queue()
+    processes = [context.Process(target=_worker, args=(store_format, path, ready, release, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    samples = [results.get() for _ in processes]
+    release.wait()
+    for process in processes:
+        process.join()
+
+    def mean(key, phase):
+        values = [sample[phase].get(key) for sample in samples if sample[phase].get(key) is not None]
+        return sum(values) / len(values) / 1024 if values else None
+
+    return {
+        "workers": workers,
+        "load_seconds_mean": sum(sample["load_seconds"] for sample in samples) / len(samples),
+        "rss_mb_per_worker": mean("rss_kb", "after"),
+        "pss_mb_per_worker": mean("pss_kb", "after"),
+        "rss_mb_growth_per_worker": mean("rss_kb", "after") - mean("rss_kb", "before"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--store", default=RAGConfig.VECTOR_STORE_PATH, help="Path of an mmap-format vector store")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pickle_path:
+        _export_pickle_store(args.store, pickle_path)
+        report = {
+            "pickle": _run("langchain", pickle_path, args.workers),
+            "mmap": _run("mmap", args.store, args.workers),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
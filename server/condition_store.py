@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+# Gale entries open with the entry title on its own line followed by "Definition"
+HEADING_RE = re.compile(r"(?m)^[ \t]*([A-Z][A-Za-z0-9 ,'’()\-]{1,60}?)[ \t]*\n[ \t]*Definition\b")
+
+
+def condition_slug(condition: str) -> str:
+    return SLUG_RE.sub("-", condition.casefold()).strip("-")
+
+
+def find_condition_headings(texts: Iterable[str]) -> List[str]:
+    """Entry titles of the encyclopedia found in the indexed chunk texts"""
+    headings = {}
+    for text in texts:
+        for match in HEADING_RE.finditer(text):
+            heading = match.group(1).strip()
+            headings.setdefault(condition_slug(heading), heading)
+    return sorted(headings.values(), key=str.casefold)
+
+
+def compute_etag(payload: Dict[str, Any]) -> str:
+    digest = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches an ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return any((candidate[2:] if candidate.startswith("W/") else candidate) == etag for candidate in candidates)
+
+
+class ConditionPageStore:
+    """Pre-generated /medical-info pages on disk, one JSON file per condition.
+
+    Pages live under ``root/<version>/``. The version is derived from
+    everything that shapes a page (prompt, model, corpus), so a change
+    starts a fresh directory instead of serving stale pages. A store without
+    a version (the corpus is not loaded yet) holds no pages.
+    """
+
+    def __init__(self, root: str, version: Optional[str] = None):
+        self.root = root
+        self.version = version
+        self.path = os.path.join(root, version) if version else None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, condition: str) -> Optional[Dict[str, Any]]:
+        """Stored entry with ``page``, ``etag`` and ``generated_at``, if any"""
+        if self.path is None:
+            self.misses += 1
+            return None
+        try:
+            with open(self._file(condition)) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, condition: str, page: Dict[str, Any]):
+        if self.path is None:
+            raise RuntimeError("Condition pages have no version until the corpus is loaded")
+        os.makedirs(self.path, exist_ok=True)
+        entry = {"page": page, "etag": compute_etag(page), "generated_at": time.time()}
+        # Write then rename so readers never see a partial file
+        target = self._file(condition)
+        temp = f"{target}.tmp"
+        with open(temp, "w") as f:
+            json.dump(entry, f)
+        os.replace(temp, target)
+
+    def contains(self, condition: str) -> bool:
+        return self.path is not None and os.path.exists(self._file(condition))
+
+    def count(self) -> int:
+        if self.path is None or not os.path.isdir(self.path):
+            return 0
+        return sum(1 for name in os.listdir(self.path) if name.endswith(".json"))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"version": self.version, "pages": self.count(), "hits": self.hits, "misses": self.misses}
+
+    def _file(self, condition: str) -> str:
+        return os.path.join(self.path, f"{condition_slug(condition)}.json")
@@ -1,4 +1,5 @@
 import os
+import json
 from typing import Dict, Any
 
 class RAGConfig:
@@ -6,26 +7,157 @@ class RAGConfig:
     
     # File paths
     PDF_PATH = "RAG/The-Gale-Encyclopedia-of-Medicine-3rd-Edition-staibabussalamsula.ac_.id_ (1).pdf"
+    ADDITIONAL_PDF_PATHS = []  # Further PDFs indexed alongside PDF_PATH
     VECTOR_STORE_PATH = "vector_store"
-    DOCUMENTS_CACHE_PATH = "documents.pkl"
+    DOCUMENTS_CACHE_PATH = "documents_cache"  # Extracted pages and chunk embeddings keyed by content hash
+    
+    # Corpus shards: name -> source PDFs. Each corpus is built, versioned and
+    # loaded as its own index under CORPUS_SHARDS_PATH/<name>, e.g.
+    # {"encyclopedia": [PDF_PATH], "formulary": ["RAG/formulary.pdf"]}.
+    # None serves PDF_PATH and ADDITIONAL_PDF_PATHS as one shard at VECTOR_STORE_PATH.
+    CORPORA = None
+    CORPUS_SHARDS_PATH = "vector_store_shards"
+    # Corpora searched per endpoint, e.g. {"analyze_symptoms": ["encyclopedia", "guidelines"]};
+    # endpoints not listed search every shard
+    ENDPOINT_CORPORA = {}
+    SHARD_MERGE = "score"  # "score" (relevance relative to each shard's best match) or "rrf" (reciprocal rank across shards)
+    SHARD_SEARCH_WORKERS = 4  # Threads searching shards in parallel
+    CORPUS_ADMIN_ENDPOINTS_ENABLED = False  # Serve POST /corpora/{name}/reload
     
     # Embedding settings
     EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
     EMBEDDING_DEVICE = "cpu"
+    EMBEDDING_BACKEND = "torch"  # torch, torch_int8, onnx or onnx_int8 (the onnx backends need onnxruntime, see requirements-onnx.txt)
+    EMBEDDING_THREADS = None  # Intra-op threads for encoding; None keeps the library default
+    EMBEDDING_BATCH_SIZE = 64  # Texts per encoder call; longer inputs are sorted together to cut padding
+    EMBEDDING_MAX_SEQ_LENGTH = 256  # Token limit for the torch_int8 and onnx backends
+    EMBEDDING_ONNX_PATH = "onnx_models"  # Exported and quantized ONNX models
     
     # Text splitting settings
     CHUNK_SIZE = 1000
     CHUNK_OVERLAP = 200
     
+    # Vector store build settings
+    BUILD_WORKERS = 4  # Processes extracting PDF pages
+    BUILD_PAGE_BATCH_SIZE = 50  # Pages per extraction task / checkpoint
+    BUILD_EMBED_BATCH_SIZE = 256  # Chunks per embedding call / checkpoint
+    
+    # Vector index settings
+    VECTOR_STORE_FORMAT = "mmap"  # "mmap" (read-only files shared across workers) or "langchain" (FAISS.save_local)
+    INDEX_TYPE = "flat"  # flat, ivf_flat, ivf_pq or hnsw
+    INDEX_TRAINING_SIZE = 50000  # Vectors sampled to train IVF/PQ indexes
+    INDEX_NLIST = 1024  # IVF lists (clamped for small corpora)
+    INDEX_NPROBE = 16  # IVF lists searched per query
+    INDEX_PQ_M = 48  # PQ sub-quantizers, must divide the embedding dimension
+    INDEX_PQ_NBITS = 8
+    INDEX_HNSW_M = 32
+    INDEX_HNSW_EF_CONSTRUCTION = 200
+    INDEX_HNSW_EF_SEARCH = 64
+    
     # Retrieval settings
     RETRIEVAL_K = 5  # Number of documents to retrieve
-    RETRIEVAL_SCORE_THRESHOLD = 0.7
+    # Documents actually used per endpoint; only this many are fetched
+    ENDPOINT_RETRIEVAL_K = {
+        "analyze_symptoms": 3,
+        "chat": 2,
+        "medical_info": 3,
+    }
+    # Minimum cosine similarity for a dense match. MiniLM puts on-topic passages
+    # at roughly 0.4-0.7, so 0.7 dropped most useful context.
+    RETRIEVAL_SCORE_THRESHOLD = 0.45
+    # Minimum normalised BM25 score (0-1) for a lexical match over the user's text. A chunk
+    # containing one of two equally rare query terms once scores about 0.2.
+    LEXICAL_SCORE_THRESHOLD = 0.15
+    # ...and as a fraction of the query's best lexical match
+    LEXICAL_RELATIVE_THRESHOLD = 0.3
+    
+    # Prompt context token budgets, per endpoint
+    CONTEXT_TOKEN_BUDGETS = {
+        "analyze_symptoms": 600,
+        "chat": 400,
+        "medical_info": 600,
+    }
+    
+    # Precomputed /medical-info pages
+    CONDITION_PAGES_PATH = "condition_pages"
+    CONDITION_PAGES_CONCURRENCY = 4  # Parallel generations in precompute_conditions.py
+    CONDITION_PAGE_MAX_AGE_SECONDS = 24 * 3600  # Cache-Control for precomputed pages
+    LIVE_CONDITION_PAGE_MAX_AGE_SECONDS = 300  # Cache-Control for pages generated on request
+    
+    # Bulk triage (/analyze-symptoms/batch and batch_triage.py)
+    BATCH_TRIAGE_WINDOW = 128  # Records embedded and searched together
+    
+    # Conversation memory settings
+    CONVERSATION_BACKEND = "memory"  # "memory" or "sqlite"
+    CONVERSATION_DB_PATH = "conversations.sqlite"
+    CONVERSATION_MAX_ACTIVE = 10000  # Conversations kept before LRU eviction
+    CONVERSATION_TTL_SECONDS = 6 * 3600
+    CONVERSATION_RECENT_TURNS = 4  # Exchanges kept verbatim; older ones are summarized
+    CONVERSATION_MAX_TURN_CHARS = 1500
+    CONVERSATION_SUMMARY_MAX_TOKENS = 200
+    
+    # Hybrid (dense + BM25) retrieval settings
+    HYBRID_RETRIEVAL_ENABLED = True
+    HYBRID_DENSE_WEIGHT = 1.0  # Reciprocal rank fusion weights
+    HYBRID_LEXICAL_WEIGHT = 1.0
+    HYBRID_RRF_K = 60
+    HYBRID_CANDIDATES = 20  # Candidates taken from each ranking before fusion
+    BM25_K1 = 1.5
+    BM25_B = 0.75
+    
+    # Cross-encoder reranking settings
+    RERANK_ENABLED = False
+    RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES = 20  # Most candidates retrieved and scored per query
+    RERANK_MIN_CANDIDATES = 5  # Always scored, even when the top retrieval score is clear
+    RERANK_SCORE_MARGIN = 0.2  # Candidates further than this below the best retrieval score are not scored
+    RERANK_LATENCY_BUDGET_MS = 60  # Caps depth by the measured cost per scored pair
+    RERANK_MIN_SCORE = 0.05  # Reranked passages below this relevance are left out of the prompt
+    RERANK_BATCH_SIZE = 32
+    RERANK_MAX_LENGTH = 256  # Tokens per (query, passage) pair
+    RERANK_CACHE_SIZE = 20000  # Cached (query, chunk) scores
+    
+    # Retrieval batching settings
+    RETRIEVAL_BATCH_MAX_SIZE = 32  # Max queries embedded/searched together
+    RETRIEVAL_BATCH_MAX_WAIT_MS = 5  # How long to wait for a batch to fill
+    RETRIEVAL_WORKERS = 2  # Worker threads running embedding + FAISS search
     
     # LLM settings
     LLM_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
     LLM_TEMPERATURE = 0.3
     LLM_MAX_TOKENS = 1500
     
+    # LLM gateway settings
+    LLM_BASE_URL = None  # Defaults to GROQ_BASE_URL or the Groq API; point at a local stub for testing
+    LLM_MAX_CONNECTIONS = 64
+    LLM_MAX_KEEPALIVE_CONNECTIONS = 32
+    LLM_KEEPALIVE_EXPIRY_SECONDS = 30
+    LLM_CONNECT_TIMEOUT_SECONDS = 5
+    LLM_READ_TIMEOUT_SECONDS = 60
+    # Concurrent LLM requests per endpoint; further requests queue
+    LLM_ENDPOINT_CONCURRENCY = {
+        "analyze_symptoms": 8,
+        "chat": 16,
+        "medical_info": 8,
+        "conversation_summary": 4,
+        "analyze_symptoms_batch": 4,  # Bulk triage, kept apart so it cannot starve interactive requests
+    }
+    # Time allowed per request, including queueing, rate limiting and retries
+    LLM_ENDPOINT_DEADLINE_SECONDS = {
+        "analyze_symptoms": 30,
+        "chat": 30,
+        "medical_info": 45,
+        "conversation_summary": 20,
+        "analyze_symptoms_batch": 120,
+    }
+    # Provider TPM budget shared by all endpoints; None disables. Requests reserve their prompt plus
+    # the endpoint's average completion (max_tokens until one has been measured) and are refunded
+    # the difference once usage is known, so this can be set to the account's actual limit
+    LLM_TOKENS_PER_MINUTE = 30000
+    LLM_MAX_RETRIES = 4  # Retries on 429, 5xx and connection errors
+    LLM_BACKOFF_BASE_SECONDS = 0.5
+    LLM_BACKOFF_MAX_SECONDS = 8
+    
     # Chat settings
     CHAT_MAX_TOKENS = 800
     CHAT_TEMPERATURE = 0.4
@@ -34,28 +166,191 @@ class RAGConfig:
     MEDICAL_INFO_MAX_TOKENS = 1200
     MEDICAL_INFO_TEMPERATURE = 0.3
     
+    # Semantic response cache settings
+    SEMANTIC_CACHE_ENABLED = True
+    SEMANTIC_CACHE_THRESHOLD = 0.95  # Cosine similarity between query vectors needed to reuse an answer
+    SEMANTIC_CACHE_TTL_SECONDS = 3600
+    SEMANTIC_CACHE_MAX_ENTRIES = 2000
+    SEMANTIC_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    SEMANTIC_CACHE_PATH = None  # e.g. "semantic_cache.sqlite" to keep the cache across restarts
+    
+    # Emergency triage settings
+    EMERGENCY_LEXICON_PATH = "emergency_lexicon.json"  # Concepts, synonyms, negation and context cues; MedicalPrompts.EMERGENCY_KEYWORDS if missing
+    EMERGENCY_SHORT_CIRCUIT = True  # Answer confident critical matches at once, before retrieval or the LLM
+    EMERGENCY_SHORT_CIRCUIT_CONFIDENCE = 0.9  # Exact critical matches score 0.95; corrected misspellings 0.81
+    EMERGENCY_MIN_FUZZY_LENGTH = 5  # Shortest word corrected as a misspelling
+    EMERGENCY_BACKGROUND_ANALYSIS = True  # Still run the full analysis; fetch it from /analyze-symptoms/result/{id}
+    EMERGENCY_RESULT_TTL_SECONDS = 900
+    EMERGENCY_RESULT_MAX_ENTRIES = 1000
+    
+    # Query embedding cache settings
+    QUERY_EMBEDDING_CACHE_ENABLED = True
+    QUERY_EMBEDDING_CACHE_SIZE = 10000  # Cached queries (a 384-d MiniLM slab of 10k rows is ~15 MB)
+    QUERY_EMBEDDING_CACHE_PATH = None  # e.g. "query_embeddings.npz" to keep popular queries across restarts
+    
+    # Speculative retrieval while the user types (POST /prefetch)
+    PREFETCH_ENABLED = True
+    PREFETCH_MIN_CHARS = 10  # Shorter partial text is not worth a retrieval
+    PREFETCH_MIN_SIMILARITY = 0.85  # difflib ratio between prefetched and submitted text needed to reuse the retrieval
+    PREFETCH_TTL_SECONDS = 60
+    PREFETCH_MAX_ENTRIES = 5000  # One entry per (session, endpoint)
+    
+    # Metrics, tracing and profiling
+    METRICS_ENABLED = True  # Serve Prometheus metrics at /metrics
+    TRACE_REQUEST_IDS = True  # Accept or assign X-Request-ID and log slow requests under it
+    SLOW_REQUEST_LOG_SECONDS = 10.0
+    PROFILER_ENDPOINTS_ENABLED = False  # Allow starting the sampling profiler over /debug/profiler
+    PROFILER_INTERVAL_MS = 10
+    PROFILER_MAX_SECONDS = 300  # A started profiler stops itself after this long
+    
+    ENV_OVERRIDE_PREFIX = "DOCBOT_"
+    
+    @classmethod
+    def apply_env_overrides(cls, environ=None):
+        """Override settings from DOCBOT_<SETTING> environment variables.
+        
+        Values are parsed as JSON where possible (numbers, booleans, null,
+        lists and dicts) and used as plain strings otherwise, e.g.
+        DOCBOT_CHUNK_SIZE=500 or DOCBOT_LLM_BASE_URL=http://127.0.0.1:8900.
+        """
+        environ = os.environ if environ is None else environ
+        for key, raw in environ.items():
+            if not key.startswith(cls.ENV_OVERRIDE_PREFIX):
+                continue
+            name = key[len(cls.ENV_OVERRIDE_PREFIX):]
+            if not name.isupper() or not hasattr(cls, name):
+                print(f"Ignoring {key}: no such setting")
+                continue
+            try:
+                value = json.loads(raw)
+            except ValueError:
+                value = raw
+            setattr(cls, name, value)
+    
     @classmethod
     def get_config(cls) -> Dict[str, Any]:
         """Get all configuration as a dictionary"""
         return {
             "pdf_path": cls.PDF_PATH,
+            "additional_pdf_paths": cls.ADDITIONAL_PDF_PATHS,
             "vector_store_path": cls.VECTOR_STORE_PATH,
             "documents_cache_path": cls.DOCUMENTS_CACHE_PATH,
+            "corpora": cls.CORPORA,
+            "corpus_shards_path": cls.CORPUS_SHARDS_PATH,
+            "endpoint_corpora": cls.ENDPOINT_CORPORA,
+            "shard_merge": cls.SHARD_MERGE,
+            "shard_search_workers": cls.SHARD_SEARCH_WORKERS,
+            "corpus_admin_endpoints_enabled": cls.CORPUS_ADMIN_ENDPOINTS_ENABLED,
             "embedding_model": cls.EMBEDDING_MODEL,
             "embedding_device": cls.EMBEDDING_DEVICE,
+            "embedding_backend": cls.EMBEDDING_BACKEND,
+            "embedding_threads": cls.EMBEDDING_THREADS,
+            "embedding_batch_size": cls.EMBEDDING_BATCH_SIZE,
+            "embedding_max_seq_length": cls.EMBEDDING_MAX_SEQ_LENGTH,
+            "embedding_onnx_path": cls.EMBEDDING_ONNX_PATH,
             "chunk_size": cls.CHUNK_SIZE,
             "chunk_overlap": cls.CHUNK_OVERLAP,
+            "build_workers": cls.BUILD_WORKERS,
+            "build_page_batch_size": cls.BUILD_PAGE_BATCH_SIZE,
+            "build_embed_batch_size": cls.BUILD_EMBED_BATCH_SIZE,
+            "vector_store_format": cls.VECTOR_STORE_FORMAT,
+            "index_type": cls.INDEX_TYPE,
+            "index_training_size": cls.INDEX_TRAINING_SIZE,
+            "index_nlist": cls.INDEX_NLIST,
+            "index_nprobe": cls.INDEX_NPROBE,
+            "index_pq_m": cls.INDEX_PQ_M,
+            "index_pq_nbits": cls.INDEX_PQ_NBITS,
+            "index_hnsw_m": cls.INDEX_HNSW_M,
+            "index_hnsw_ef_construction": cls.INDEX_HNSW_EF_CONSTRUCTION,
+            "index_hnsw_ef_search": cls.INDEX_HNSW_EF_SEARCH,
             "retrieval_k": cls.RETRIEVAL_K,
+            "endpoint_retrieval_k": cls.ENDPOINT_RETRIEVAL_K,
             "retrieval_score_threshold": cls.RETRIEVAL_SCORE_THRESHOLD,
+            "lexical_score_threshold": cls.LEXICAL_SCORE_THRESHOLD,
+            "lexical_relative_threshold": cls.LEXICAL_RELATIVE_THRESHOLD,
+            "context_token_budgets": cls.CONTEXT_TOKEN_BUDGETS,
+            "condition_pages_path": cls.CONDITION_PAGES_PATH,
+            "condition_pages_concurrency": cls.CONDITION_PAGES_CONCURRENCY,
+            "condition_page_max_age_seconds": cls.CONDITION_PAGE_MAX_AGE_SECONDS,
+            "live_condition_page_max_age_seconds": cls.LIVE_CONDITION_PAGE_MAX_AGE_SECONDS,
+            "batch_triage_window": cls.BATCH_TRIAGE_WINDOW,
+            "conversation_backend": cls.CONVERSATION_BACKEND,
+            "conversation_db_path": cls.CONVERSATION_DB_PATH,
+            "conversation_max_active": cls.CONVERSATION_MAX_ACTIVE,
+            "conversation_ttl_seconds": cls.CONVERSATION_TTL_SECONDS,
+            "conversation_recent_turns": cls.CONVERSATION_RECENT_TURNS,
+            "conversation_max_turn_chars": cls.CONVERSATION_MAX_TURN_CHARS,
+            "conversation_summary_max_tokens": cls.CONVERSATION_SUMMARY_MAX_TOKENS,
+            "hybrid_retrieval_enabled": cls.HYBRID_RETRIEVAL_ENABLED,
+            "hybrid_dense_weight": cls.HYBRID_DENSE_WEIGHT,
+            "hybrid_lexical_weight": cls.HYBRID_LEXICAL_WEIGHT,
+            "hybrid_rrf_k": cls.HYBRID_RRF_K,
+            "hybrid_candidates": cls.HYBRID_CANDIDATES,
+            "bm25_k1": cls.BM25_K1,
+            "bm25_b": cls.BM25_B,
+            "rerank_enabled": cls.RERANK_ENABLED,
+            "rerank_model": cls.RERANK_MODEL,
+            "rerank_candidates": cls.RERANK_CANDIDATES,
+            "rerank_min_candidates": cls.RERANK_MIN_CANDIDATES,
+            "rerank_score_margin": cls.RERANK_SCORE_MARGIN,
+            "rerank_latency_budget_ms": cls.RERANK_LATENCY_BUDGET_MS,
+            "rerank_min_score": cls.RERANK_MIN_SCORE,
+            "rerank_batch_size": cls.RERANK_BATCH_SIZE,
+            "rerank_max_length": cls.RERANK_MAX_LENGTH,
+            "rerank_cache_size": cls.RERANK_CACHE_SIZE,
+            "retrieval_batch_max_size": cls.RETRIEVAL_BATCH_MAX_SIZE,
+            "retrieval_batch_max_wait_ms": cls.RETRIEVAL_BATCH_MAX_WAIT_MS,
+            "retrieval_workers": cls.RETRIEVAL_WORKERS,
             "llm_model": cls.LLM_MODEL,
             "llm_temperature": cls.LLM_TEMPERATURE,
             "llm_max_tokens": cls.LLM_MAX_TOKENS,
+            "llm_base_url": cls.LLM_BASE_URL,
+            "llm_max_connections": cls.LLM_MAX_CONNECTIONS,
+            "llm_max_keepalive_connections": cls.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            "llm_keepalive_expiry_seconds": cls.LLM_KEEPALIVE_EXPIRY_SECONDS,
+            "llm_connect_timeout_seconds": cls.LLM_CONNECT_TIMEOUT_SECONDS,
+            "llm_read_timeout_seconds": cls.LLM_READ_TIMEOUT_SECONDS,
+            "llm_endpoint_concurrency": cls.LLM_ENDPOINT_CONCURRENCY,
+            "llm_endpoint_deadline_seconds": cls.LLM_ENDPOINT_DEADLINE_SECONDS,
+            "llm_tokens_per_minute": cls.LLM_TOKENS_PER_MINUTE,
+            "llm_max_retries": cls.LLM_MAX_RETRIES,
+            "llm_backoff_base_seconds": cls.LLM_BACKOFF_BASE_SECONDS,
+            "llm_backoff_max_seconds": cls.LLM_BACKOFF_MAX_SECONDS,
             "chat_max_tokens": cls.CHAT_MAX_TOKENS,
             "chat_temperature": cls.CHAT_TEMPERATURE,
             "medical_info_max_tokens": cls.MEDICAL_INFO_MAX_TOKENS,
             "medical_info_temperature": cls.MEDICAL_INFO_TEMPERATURE,
+            "semantic_cache_enabled": cls.SEMANTIC_CACHE_ENABLED,
+            "semantic_cache_threshold": cls.SEMANTIC_CACHE_THRESHOLD,
+            "semantic_cache_ttl_seconds": cls.SEMANTIC_CACHE_TTL_SECONDS,
+            "semantic_cache_max_entries": cls.SEMANTIC_CACHE_MAX_ENTRIES,
+            "semantic_cache_max_bytes": cls.SEMANTIC_CACHE_MAX_BYTES,
+            "semantic_cache_path": cls.SEMANTIC_CACHE_PATH,
+            "emergency_lexicon_path": cls.EMERGENCY_LEXICON_PATH,
+            "emergency_short_circuit": cls.EMERGENCY_SHORT_CIRCUIT,
+            "emergency_short_circuit_confidence": cls.EMERGENCY_SHORT_CIRCUIT_CONFIDENCE,
+            "emergency_min_fuzzy_length": cls.EMERGENCY_MIN_FUZZY_LENGTH,
+            "emergency_background_analysis": cls.EMERGENCY_BACKGROUND_ANALYSIS,
+            "emergency_result_ttl_seconds": cls.EMERGENCY_RESULT_TTL_SECONDS,
+            "emergency_result_max_entries": cls.EMERGENCY_RESULT_MAX_ENTRIES,
+            "query_embedding_cache_enabled": cls.QUERY_EMBEDDING_CACHE_ENABLED,
+            "query_embedding_cache_size": cls.QUERY_EMBEDDING_CACHE_SIZE,
+            "query_embedding_cache_path": cls.QUERY_EMBEDDING_CACHE_PATH,
+            "prefetch_enabled": cls.PREFETCH_ENABLED,
+            "prefetch_min_chars": cls.PREFETCH_MIN_CHARS,
+            "prefetch_min_similarity": cls.PREFETCH_MIN_SIMILARITY,
+            "prefetch_ttl_seconds": cls.PREFETCH_TTL_SECONDS,
+            "prefetch_max_entries": cls.PREFETCH_MAX_ENTRIES,
+            "metrics_enabled": cls.METRICS_ENABLED,
+            "trace_request_ids": cls.TRACE_REQUEST_IDS,
+            "slow_request_log_seconds": cls.SLOW_REQUEST_LOG_SECONDS,
+            "profiler_endpoints_enabled": cls.PROFILER_ENDPOINTS_ENABLED,
+            "profiler_interval_ms": cls.PROFILER_INTERVAL_MS,
+            "profiler_max_seconds": cls.PROFILER_MAX_SECONDS,
         }
 
+RAGConfig.apply_env_overrides()
+
 # Medical prompts for different use cases
 class MedicalPrompts:
     """Medical prompt templates for different scenarios"""
@@ -68,10 +363,20 @@ class MedicalPrompts:
     Provide accurate health information using markdown formatting and evidence-based responses. 
     Always recommend consulting healthcare providers for serious concerns."""
     
+    CONVERSATION_SUMMARY_SYSTEM = """You condense medical chat conversations. Keep the user's symptoms, conditions, 
+    medications, age and other health details, and the key advice given. Be brief and factual."""
+    
     MEDICAL_INFO_SYSTEM = """Provide accurate medical information using markdown formatting and evidence from medical literature. 
     Use headers, lists, bold text, italics, and other markdown features appropriately. 
     Base responses on medical literature when available."""
     
+    # Bump a version whenever its prompt template or response shape changes so cached answers are not reused
+    PROMPT_VERSIONS = {
+        "analyze_symptoms": "5",
+        "chat": "5",
+        "medical_info": "4",
+    }
+    
     DISCLAIMER = "This analysis is based on medical literature but is not a substitute for professional medical advice. Always consult with a healthcare provider for proper medical evaluation and treatment."
     
     EMERGENCY_KEYWORDS = [
@@ -82,18 +387,29 @@ class MedicalPrompts:
         "high fever", "severe vomiting", "severe diarrhea", "dehydration"
     ]
     
+    @classmethod
+    def get_context_block(cls, context_text: str) -> str:
+        """Get the reference context section, or a note that none is available"""
+        if not context_text.strip():
+            return """MEDICAL REFERENCE CONTEXT:
+No reference material is available for this request. Answer from general medical knowledge and say so clearly.
+"""
+        return f"""MEDICAL REFERENCE CONTEXT:
+{context_text}
+"""
+    
     @classmethod
     def get_symptom_analysis_prompt(cls, context_text: str, patient_context: str, symptoms: str) -> str:
         """Get formatted symptom analysis prompt"""
         return f"""
-MEDICAL REFERENCE CONTEXT:
-{context_text}
+{cls.get_context_block(context_text)}
 
 PATIENT CONTEXT: {patient_context}
 SYMPTOMS: {symptoms}
 
 Based on the medical reference information above and the patient's symptoms, provide a detailed analysis in the following JSON format:
 {{
+    "urgency_level": "low/moderate/high/emergency",
     "analysis_summary": "Brief summary of the symptom analysis based on medical literature",
     "possible_conditions": [
         {{
@@ -112,7 +428,6 @@ Based on the medical reference information above and the patient's symptoms, pro
             "source": "Evidence from medical reference"
         }}
     ],
-    "urgency_level": "low/moderate/high/emergency",
     "medical_evidence": "Summary of relevant medical evidence from the reference material",
     "disclaimer": "{cls.DISCLAIMER}",
     "follow_up_questions": ["question1", "question2"]
@@ -131,12 +446,12 @@ Response must be valid JSON only, no additional text.
 """
     
     @classmethod
-    def get_chat_prompt(cls, context_text: str, message: str) -> str:
+    def get_chat_prompt(cls, context_text: str, message: str, history_text: str = "") -> str:
         """Get formatted chat prompt"""
+        history_block = f"\nCONVERSATION SO FAR:\n{history_text}\n" if history_text else ""
         return f"""
-MEDICAL REFERENCE CONTEXT:
-{context_text}
-
+{cls.get_context_block(context_text)}
+{history_block}
 USER QUESTION: {message}
 
 Based on the medical reference information provided above, please answer the user's question. Use markdown formatting for better readability.
@@ -151,14 +466,25 @@ Guidelines:
 - Add disclaimer: {cls.DISCLAIMER}
 
 Provide a comprehensive, well-formatted response using markdown.
+"""
+    
+    @classmethod
+    def get_conversation_summary_prompt(cls, summary: str, history_text: str) -> str:
+        """Get prompt that folds older turns into the running conversation summary"""
+        return f"""
+CURRENT SUMMARY: {summary or "None"}
+
+NEW TURNS:
+{history_text}
+
+Rewrite the summary to include the new turns in at most five sentences. Respond with the summary only.
 """
     
     @classmethod
     def get_medical_info_prompt(cls, context_text: str, condition: str) -> str:
         """Get formatted medical information prompt"""
         return f"""
-MEDICAL REFERENCE CONTEXT:
-{context_text}
+{cls.get_context_block(context_text)}
 
 CONDITION TO RESEARCH: {condition}
 
@@ -0,0 +1,157 @@
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from langchain_core.documents import Document
+
+SENTENCE_END_RE = re.compile(r"[.!?](?=\s)")
+
+
+class TokenCounter:
+    """Counts tokens with tiktoken, falling back to a 4-chars-per-token estimate.
+
+    The Llama tokenizer differs from cl100k_base, but the two agree closely
+    enough on English text for budgeting prompts.
+    """
+
+    def __init__(self, encoding_name: str = "cl100k_base"):
+        self.encoding_name = encoding_name
+        self._encoding = None
+        self._loaded = False
+
+    def _get_encoding(self):
+        if not self._loaded:
+            self._loaded = True
+            try:
+                import tiktoken
+                self._encoding = tiktoken.get_encoding(self.encoding_name)
+            except Exception as e:
+                print(f"tiktoken unavailable ({e}), estimating tokens from character counts")
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        encoding = self._get_encoding()
+        if encoding is None:
+            return (len(text) + 3) // 4
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text to at most ``max_tokens``, preferring a sentence boundary"""
+        encoding = self._get_encoding()
+        if encoding is None:
+            cut = text[:max_tokens * 4]
+        else:
+            tokens = encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            cut = encoding.decode(tokens[:max_tokens])
+
+        boundaries = [match.end() for match in SENTENCE_END_RE.finditer(cut)]
+        if boundaries and boundaries[-1] > len(cut) // 2:
+            cut = cut[:boundaries[-1]]
+        return cut.rstrip()
+
+
+class AssembledContext(NamedTuple):
+    text: str
+    tokens: int
+    raw_tokens: int
+    passages: int
+
+
+class _Passage:
+    __slots__ = ("source", "page", "text", "score")
+
+    def __init__(self, source: Optional[str], page: Optional[int], text: str, score: float):
+        self.source = source
+        self.page = page
+        self.text = text
+        self.score = score
+
+
+class ContextAssembler:
+    """Turns retrieved chunks into a compact, token-budgeted context block.
+
+    Chunks from the same page that overlap (the splitter repeats up to
+    CHUNK_OVERLAP characters between neighbours) are stitched into one
+    passage, passages contained in others are dropped, and the rest are added
+    in relevance order until the endpoint's token budget is spent.
+    """
+
+    def __init__(self, token_counter: TokenCounter, max_overlap_chars: int = 200, min_overlap_chars: int = 20, min_tail_tokens: int = 40):
+        self.token_counter = token_counter
+        self.max_overlap_chars = max_overlap_chars
+        self.min_overlap_chars = min_overlap_chars
+        self.min_tail_tokens = min_tail_tokens
+
+    def assemble(self, documents: List[Tuple[Document, float]], budget_tokens: int) -> AssembledContext:
+        if not documents:
+            return AssembledContext("", 0, 0, 0)
+
+        raw_tokens = self.token_counter.count("\n\n".join(doc.page_content for doc, _ in documents))
+        passages = self._dedupe(self._merge_pages(documents))
+        passages.sort(key=lambda passage: passage.score, reverse=True)
+
+        blocks = []
+        used = 0
+        for passage in passages:
+            block = f"[{self._label(passage)}]\n{passage.text}"
+            tokens = self.token_counter.count(block) + (2 if blocks else 0)
+            if used + tokens <= budget_tokens:
+                blocks.append(block)
+                used += tokens
+                continue
+
+            remaining = budget_tokens - used
+            if remaining >= self.min_tail_tokens:
+                block = self.token_counter.truncate(block, remaining - 2)
+                blocks.append(block)
+                used += self.token_counter.count(block) + 2
+            break
+
+        text = "\n\n".join(blocks)
+        return AssembledContext(text, self.token_counter.count(text) if blocks else 0, raw_tokens, len(blocks))
+
+    def _merge_pages(self, documents: List[Tuple[Document, float]]) -> List[_Passage]:
+        groups: Dict[Tuple[Optional[str], Optional[int]], List[_Passage]] = {}
+        for doc, score in documents:
+            key = (doc.metadata.get("source"), doc.metadata.get("page"))
+            passage = _Passage(key[0], key[1], doc.page_content.strip(), score)
+            group = groups.setdefault(key, [])
+
+            merged = True
+            while merged:
+                merged = False
+                for i, other in enumerate(group):
+                    stitched = self._stitch(other.text, passage.text) or self._stitch(passage.text, other.text)
+                    if stitched is not None:
+                        passage = _Passage(key[0], key[1], stitched, max(score, other.score, passage.score))
+                        del group[i]
+                        merged = True
+                        break
+            group.append(passage)
+
+        return [passage for group in groups.values() for passage in group]
+
+    def _stitch(self, first: str, second: str) -> Optional[str]:
+        """Join two chunks if the end of ``first`` repeats at the start of ``second``"""
+        longest = min(len(first), len(second), self.max_overlap_chars)
+        for size in range(longest, self.min_overlap_chars - 1, -1):
+            if first.endswith(second[:size]):
+                return first + second[size:]
+        return None
+
+    @staticmethod
+    def _dedupe(passages: List[_Passage]) -> List[_Passage]:
+        kept = []
+        for passage in sorted(passages, key=lambda p: len(p.text), reverse=True):
+            if not any(passage.text in other.text for other in kept):
+                kept.append(passage)
+        return kept
+
+    @staticmethod
+    def _label(passage: _Passage) -> str:
+        source = os.path.basename(passage.source) if passage.source else "Medical reference"
+        if passage.page is None:
+            return f"Source: {source}"
+        return f"Source: {source}, page {passage.page + 1}"
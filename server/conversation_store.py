@@ -0,0 +1,192 @@
+import asyncio
+import json
+import re
+import sqlite3
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+FOLLOW_UP_RE = re.compile(
+    r"\b(it|its|this|that|these|those|they|them|their|he|she|his|her|what about|how about|and if|also|instead)\b",
+    re.IGNORECASE,
+)
+
+
+class ConversationState:
+    """Running summary plus the most recent turns of one conversation"""
+
+    __slots__ = ("summary", "turns", "updated_at")
+
+    def __init__(self, summary: str = "", turns: Optional[List[Dict[str, str]]] = None, updated_at: Optional[float] = None):
+        self.summary = summary
+        self.turns = turns or []
+        self.updated_at = updated_at or time.time()
+
+    def to_json(self) -> str:
+        return json.dumps({"s": self.summary, "t": [[t["role"][0], t["content"]] for t in self.turns], "u": self.updated_at})
+
+    @classmethod
+    def from_json(cls, payload: str) -> "ConversationState":
+        data = json.loads(payload)
+        roles = {"u": "user", "a": "assistant"}
+        return cls(data["s"], [{"role": roles[r], "content": c} for r, c in data["t"]], data["u"])
+
+
+class InMemoryConversationBackend:
+    """In-process conversation states with LRU and TTL eviction"""
+
+    def __init__(self, max_conversations: int = 10000, ttl_seconds: float = 6 * 3600):
+        self.max_conversations = max_conversations
+        self.ttl_seconds = ttl_seconds
+        self._states: "OrderedDict[str, ConversationState]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, conversation_id: str) -> Optional[ConversationState]:
+        state = self._states.get(conversation_id)
+        if state is None:
+            return None
+        if time.time() - state.updated_at > self.ttl_seconds:
+            del self._states[conversation_id]
+            self.evictions += 1
+            return None
+        self._states.move_to_end(conversation_id)
+        return state
+
+    def put(self, conversation_id: str, state: ConversationState):
+        self._states[conversation_id] = state
+        self._states.move_to_end(conversation_id)
+        while len(self._states) > self.max_conversations:
+            self._states.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+
+class SQLiteConversationBackend:
+    """Conversation states on disk, so active sessions don't have to fit in RAM"""
+
+    def __init__(self, path: str, max_conversations: int = 100000, ttl_seconds: float = 6 * 3600):
+        self.max_conversations = max_conversations
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self._puts = 0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS conversations_updated_at ON conversations (updated_at)")
+        self._db.commit()
+
+    def get(self, conversation_id: str) -> Optional[ConversationState]:
+        row = self._db.execute("SELECT state, updated_at FROM conversations WHERE id = ?", (conversation_id,)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl_seconds:
+            return None
+        return ConversationState.from_json(row[0])
+
+    def put(self, conversation_id: str, state: ConversationState):
+        self._db.execute(
+            "INSERT OR REPLACE INTO conversations (id, state, updated_at) VALUES (?, ?, ?)",
+            (conversation_id, state.to_json(), state.updated_at),
+        )
+        self._puts += 1
+        if self._puts % 100 == 0:
+            self._prune()
+        self._db.commit()
+
+    def _prune(self):
+        cursor = self._db.execute("DELETE FROM conversations WHERE updated_at < ?", (time.time() - self.ttl_seconds,))
+        evicted = cursor.rowcount
+        cursor = self._db.execute(
+            "DELETE FROM conversations WHERE id NOT IN "
+            "(SELECT id FROM conversations ORDER BY updated_at DESC LIMIT ?)",
+            (self.max_conversations,),
+        )
+        self.evictions += evicted + cursor.rowcount
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+
+class ConversationStore:
+    """Bounded per-conversation memory for the chat endpoint.
+
+    Keeps the last ``recent_turns`` exchanges verbatim and folds older ones
+    into a running summary with ``summarize_fn(summary, turns)``, so the
+    history added to each prompt stays roughly constant in size.
+    """
+
+    def __init__(
+        self,
+        backend,
+        summarize_fn: Callable[[str, List[Dict[str, str]]], Awaitable[str]],
+        recent_turns: int = 4,
+        max_turn_chars: int = 1500,
+    ):
+        self.backend = backend
+        self.summarize_fn = summarize_fn
+        self.recent_turns = recent_turns
+        self.max_turn_chars = max_turn_chars
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self.compactions = 0
+
+    def get(self, conversation_id: Optional[str]) -> Optional[ConversationState]:
+        if not conversation_id:
+            return None
+        return self.backend.get(conversation_id)
+
+    async def record_turn(self, conversation_id: Optional[str], user_message: str, assistant_message: str):
+        """Append an exchange, compacting the oldest turns into the summary when needed"""
+        if not conversation_id:
+            return
+
+        lock = self._locks.get(conversation_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[conversation_id] = lock
+
+        async with lock:
+            state = self.backend.get(conversation_id) or ConversationState()
+            state.turns.append({"role": "user", "content": user_message[:self.max_turn_chars]})
+            state.turns.append({"role": "assistant", "content": assistant_message[:self.max_turn_chars]})
+
+            overflow = len(state.turns) - 2 * self.recent_turns
+            if overflow > 0:
+                old_turns, state.turns = state.turns[:overflow], state.turns[overflow:]
+                state.summary = await self.summarize_fn(state.summary, old_turns)
+                self.compactions += 1
+
+            state.updated_at = time.time()
+            self.backend.put(conversation_id, state)
+
+    def retrieval_query(self, state: Optional[ConversationState], message: str) -> str:
+        """Rewrite follow-up questions so retrieval sees what they refer to"""
+        if state is None or not state.turns:
+            return message
+        if len(message.split()) > 12 and not FOLLOW_UP_RE.search(message):
+            return message
+
+        previous = next((turn["content"] for turn in reversed(state.turns) if turn["role"] == "user"), "")
+        return f"{previous} {message}".strip()
+
+    @staticmethod
+    def format_history(state: Optional[ConversationState]) -> str:
+        if state is None or (not state.summary and not state.turns):
+            return ""
+        lines = []
+        if state.summary:
+            lines.append(f"Summary of earlier conversation: {state.summary}")
+        for turn in state.turns:
+            speaker = "User" if turn["role"] == "user" else "Assistant"
+            lines.append(f"{speaker}: {turn['content']}")
+        return "\n".join(lines)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__,
+            "active_conversations": len(self.backend),
+            "evictions": self.backend.evictions,
+            "compactions": self.compactions,
+        }
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+ScoredDocuments = List[Tuple[Document, float]]
+SHARD_MERGE_MODES = ("score", "rrf")
+
+
+class CorpusShard:
+    """One independently built and versioned corpus index.
+
+    Holds the loaded FAISS store and BM25 index of a corpus together with the
+    settings it was built with; ``version`` is derived from those settings so
+    two shards built from the same inputs share a version.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        pdf_paths: List[str],
+        path: str,
+        vector_store,
+        lexical_index=None,
+        settings: Optional[Dict[str, Any]] = None,
+        build_stats: Optional[Dict[str, Any]] = None,
+    ):
+        self.name = name
+        self.pdf_paths = list(pdf_paths)
+        self.path = path
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.settings = settings or {}
+        self.build_stats = build_stats
+        self.version = hashlib.sha256(json.dumps(self.settings, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        self.loaded_at = time.time()
+        self.queries = 0
+
+    @property
+    def size(self) -> int:
+        return self.vector_store.index.ntotal
+
+    def document(self, position: int) -> Document:
+        return self.vector_store.docstore.search(self.vector_store.index_to_docstore_id[position])
+
+    def contents(self) -> Tuple[Any, List[str], List[Dict[str, Any]]]:
+        """Index, texts and metadata of the shard in index order"""
+        documents = [self.document(i) for i in range(self.size)]
+        return (
+            self.vector_store.index,
+            [doc.page_content for doc in documents],
+            [doc.metadata for doc in documents],
+        )
+
+    def index_type(self) -> str:
+        from index_factory import index_type_of
+        return index_type_of(self.vector_store.index)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "pdf_paths": self.pdf_paths,
+            "path": self.path,
+            "chunks": self.size,
+            "index_type": self.index_type(),
+            "hybrid": self.lexical_index is not None,
+            "loaded_at": self.loaded_at,
+            "queries": self.queries,
+            "build_stats": self.build_stats,
+        }
+
+
+class CorpusRegistry:
+    """Named corpus shards searched in parallel and merged per query.
+
+    ``routes`` maps an endpoint to the corpora it searches; endpoints that are
+    not listed search every shard. A search hands each shard the queries
+    routed to it on a worker pool, then merges each query's candidates by
+    relevance score relative to the best score in the same shard
+    (``merge="score"``: shards differ in score scale, e.g. hybrid fused
+    scores against plain cosine, and in how well a query matches overall)
+    or by reciprocal rank across shards (``merge="rrf"``), which ignores
+    score scale entirely. Merged candidates keep their own scores. Shards are
+    replaced with ``swap``; searches already running keep the shard they
+    started with, so a corpus can be rebuilt and swapped in without a restart.
+    """
+
+    def __init__(self, routes: Optional[Dict[str, Sequence[str]]] = None, merge: str = "score", workers: int = 4, rrf_k: int = 60):
+        if merge not in SHARD_MERGE_MODES:
+            raise ValueError(f"Unknown shard merge mode {merge!r}, expected one of {SHARD_MERGE_MODES}")
+        self.routes = {endpoint: tuple(names) for endpoint, names in (routes or {}).items()}
+        self.merge = merge
+        self.rrf_k = rrf_k
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="shard-search")
+        self._shards: Dict[str, CorpusShard] = {}
+        self._lock = threading.Lock()
+        self.swaps = 0
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+    def get(self, name: str) -> Optional[CorpusShard]:
+        return self._shards.get(name)
+
+    def shards(self) -> List[CorpusShard]:
+        return list(self._shards.values())
+
+    def swap(self, shard: CorpusShard) -> Optional[CorpusShard]:
+        """Serve ``shard`` under its name from now on; returns the shard it replaced"""
+        with self._lock:
+            previous = self._shards.get(shard.name)
+            shards = dict(self._shards)
+            shards[shard.name] = shard
+            self._shards = shards
+            self.swaps += previous is not None
+        return previous
+
+    def shards_for(self, endpoint: Optional[str] = None) -> List[CorpusShard]:
+        """Shards an endpoint searches, in routing order"""
+        shards = self._shards
+        names = self.routes.get(endpoint) if endpoint else None
+        if not names:
+            return list(shards.values())
+        return [shards[name] for name in names if name in shards]
+
+    def version(self, endpoint: Optional[str] = None) -> str:
+        """Combined version of the shards an endpoint searches"""
+        parts = sorted(f"{shard.name}={shard.version}" for shard in self.shards_for(endpoint))
+        return hashlib.sha256(",".join(parts).encode("utf-8")).hexdigest()[:12]
+
+    def search(
+        self,
+        routes: Sequence[Optional[str]],
+        search_fn: Callable[[CorpusShard, List[int]], List[ScoredDocuments]],
+        k: int,
+    ) -> List[ScoredDocuments]:
+        """Top ``k`` merged candidates per query.
+
+        ``routes[i]`` is the endpoint query ``i`` is routed for (or None for
+        every shard). ``search_fn(shard, positions)`` returns the ranked
+        candidates of the queries at ``positions`` within that shard.
+        """
+        shards = self._shards
+        assignments: Dict[str, List[int]] = {}
+        for position, endpoint in enumerate(routes):
+            for shard in self.shards_for(endpoint):
+                assignments.setdefault(shard.name, []).append(position)
+
+        def run(name: str) -> Tuple[str, List[ScoredDocuments]]:
+            shard = shards[name]
+            shard.queries += len(assignments[name])
+            return name, search_fn(shard, assignments[name])
+
+        names = list(assignments)
+        if len(names) == 1:
+            outputs = [run(names[0])]
+        else:
+            outputs = list(self.executor.map(run, names))
+
+        per_query: List[List[ScoredDocuments]] = [[] for _ in routes]
+        for name, rankings in outputs:
+            for position, ranking in zip(assignments[name], rankings):
+                per_query[position].append(ranking)
+        return [self._merge(rankings, k) for rankings in per_query]
+
+    def _merge(self, rankings: List[ScoredDocuments], k: int) -> ScoredDocuments:
+        if len(rankings) <= 1:
+            return rankings[0][:k] if rankings else []
+        if self.merge == "score":
+            merged = []
+            for ranking in rankings:
+                best = max((score for _, score in ranking), default=0.0)
+                merged.extend((score / best if best > 0 else 0.0, score, doc) for doc, score in ranking)
+            merged.sort(key=lambda item: (item[0], item[1]), reverse=True)
+            return [(doc, score) for _, score, doc in merged[:k]]
+
+        fused = []
+        for ranking in rankings:
+            for rank, (doc, score) in enumerate(ranking):
+                fused.append((1.0 / (self.rrf_k + rank + 1), score, doc))
+        fused.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        return [(doc, score) for _, score, doc in fused[:k]]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "shards": {name: shard.get_stats() for name, shard in self._shards.items()},
+            "routes": {endpoint: list(names) for endpoint, names in self.routes.items()},
+            "merge": self.merge,
+            "swaps": self.swaps,
+        }
@@ -0,0 +1,176 @@
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_BACKENDS = ("torch", "torch_int8", "onnx", "onnx_int8")
+
+
+def _set_torch_threads(threads: Optional[int]):
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+
+
+class _BatchedEmbeddings(Embeddings):
+    """Shared batching: texts are encoded in length-sorted batches to minimise padding"""
+
+    def __init__(self, batch_size: int = 64):
+        self.batch_size = batch_size
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        encoded = [
+            self._encode([texts[i] for i in order[start:start + self.batch_size]])
+            for start in range(0, len(order), self.batch_size)
+        ]
+        vectors = np.empty((len(texts), encoded[0].shape[1]), dtype=np.float32)
+        vectors[order] = np.vstack(encoded)
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class QuantizedTorchEmbeddings(_BatchedEmbeddings):
+    """sentence-transformers model with int8 dynamic quantization of its Linear layers"""
+
+    def __init__(self, model_name: str, batch_size: int = 64, max_seq_length: int = 256):
+        super().__init__(batch_size)
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(model_name, device="cpu")
+        model.max_seq_length = max_seq_length
+        self.model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=len(texts), normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+
+class OnnxEmbeddings(_BatchedEmbeddings):
+    """ONNX Runtime encoder with mean pooling and L2 normalisation.
+
+    The model is exported from the Hugging Face checkpoint on first use (and
+    optionally int8-quantized) into ``model_dir``. Pooling matches
+    sentence-transformers models that use mean pooling, such as
+    all-MiniLM-L6-v2.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        model_dir: str,
+        quantize: bool = False,
+        threads: Optional[int] = None,
+        batch_size: int = 64,
+        max_seq_length: int = 256,
+    ):
+        super().__init__(batch_size)
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.max_seq_length = max_seq_length
+        model_path = self._prepare_model(model_name, model_dir, quantize)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    @staticmethod
+    def _prepare_model(model_name: str, model_dir: str, quantize: bool) -> str:
+        fp32_path = os.path.join(model_dir, "model.onnx")
+        int8_path = os.path.join(model_dir, "model.int8.onnx")
+
+        if not os.path.exists(fp32_path):
+            import torch
+            from transformers import AutoModel, AutoTokenizer
+
+            print(f"Exporting {model_name} to ONNX...")
+            os.makedirs(model_dir, exist_ok=True)
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            model = AutoModel.from_pretrained(model_name).eval()
+            sample = tokenizer(["export sample"], return_tensors="pt")
+            input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+            dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+            with torch.no_grad():
+                torch.onnx.export(
+                    model,
+                    tuple(sample[name] for name in input_names),
+                    fp32_path,
+                    input_names=input_names,
+                    output_names=["last_hidden_state"],
+                    dynamic_axes=dynamic_axes,
+                    opset_version=14,
+                )
+            tokenizer.save_pretrained(model_dir)
+
+        if not quantize:
+            return fp32_path
+        if not os.path.exists(int8_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            print(f"Quantizing {fp32_path} to int8...")
+            quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        return int8_path
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors="np")
+        feeds = {name: value.astype(np.int64) for name, value in encoded.items() if name in self.input_names}
+        hidden = self.session.run(None, feeds)[0]
+
+        mask = encoded["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+
+def create_embeddings(
+    backend: str,
+    model_name: str,
+    device: str = "cpu",
+    threads: Optional[int] = None,
+    batch_size: int = 64,
+    max_seq_length: int = 256,
+    onnx_dir: str = "onnx_models",
+) -> Tuple[Embeddings, str]:
+    """Build the configured embedding backend.
+
+    Returns the embeddings and the name of the backend actually loaded: if
+    onnxruntime is not installed, the ONNX backends fall back to PyTorch.
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {EMBEDDING_BACKENDS}")
+
+    if backend.startswith("onnx"):
+        try:
+            import onnxruntime  # noqa: F401
+        except ImportError:
+            print(f"onnxruntime is not installed (see requirements-onnx.txt), using the torch embedding backend instead of {backend}")
+            backend = "torch"
+        else:
+            model_dir = os.path.join(onnx_dir, model_name.replace("/", "__"))
+            return OnnxEmbeddings(model_name, model_dir, backend == "onnx_int8", threads, batch_size, max_seq_length), backend
+
+    _set_torch_threads(threads)
+    if backend == "torch_int8":
+        return QuantizedTorchEmbeddings(model_name, batch_size, max_seq_length), backend
+
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    embeddings = HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs={"device": device},
+        encode_kwargs={"batch_size": batch_size},
+    )
+    return embeddings, "torch"
@@ -0,0 +1,369 @@
+import json
+import os
+import re
+from collections import deque
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+SEVERITIES = ("critical", "urgent")
+
+# Apostrophes are dropped so "can't" and "cant" are the same token
+_APOSTROPHES = re.compile(r"['’]")
+# Words, plus sentence punctuation that ends a negation's scope
+_TOKEN_RE = re.compile(r"([a-z0-9]+)|([.;!?\n])")
+_BREAK = -2
+_UNKNOWN = -1
+
+
+def tokenize(text: str) -> List[str]:
+    """Case-folded word tokens; sentence breaks are returned as "." tokens"""
+    folded = _APOSTROPHES.sub("", text.casefold())
+    return [match.group(1) or "." for match in _TOKEN_RE.finditer(folded)]
+
+
+def _phrase_tokens(phrase: str) -> Tuple[str, ...]:
+    return tuple(token for token in tokenize(phrase) if token != ".")
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """Optimal string alignment distance of at most 1 (one insert, delete, substitution or transposition)"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diffs = [i for i in range(len(a)) if a[i] != b[i]]
+        if len(diffs) == 1:
+            return True
+        return len(diffs) == 2 and diffs[1] == diffs[0] + 1 and a[diffs[0]] == b[diffs[1]] and a[diffs[1]] == b[diffs[0]]
+    shorter, longer = (a, b) if len(a) < len(b) else (b, a)
+    i = 0
+    while i < len(shorter) and shorter[i] == longer[i]:
+        i += 1
+    return shorter[i:] == longer[i + 1:]
+
+
+class TriageMatch(NamedTuple):
+    concept: str
+    label: str
+    severity: str
+    text: str  # Matched tokens, after misspelling correction
+    start: int  # Token positions of the match in the input
+    end: int
+    negated: bool
+    contextual: bool  # History, a hedge, a question, someone else, or an episode that is over
+    current: bool  # First-person or present-time wording in the same clause ("I have", "right now")
+    fuzzy: bool  # At least one token was a corrected misspelling
+    confidence: float
+
+
+class TriageResult(NamedTuple):
+    emergency: bool  # A non-negated match of any severity
+    short_circuit: bool  # A critical match confident enough to answer without the LLM
+    confidence: float
+    matches: List[TriageMatch]
+
+    @property
+    def positive(self) -> List[TriageMatch]:
+        return [match for match in self.matches if not match.negated]
+
+
+class EmergencyMatcher:
+    """Precompiled emergency phrase matcher.
+
+    Every phrase of every lexicon concept (its synonyms) is compiled into a
+    token-level Aho-Corasick automaton, so one pass over the input finds all
+    phrases regardless of lexicon size. Input tokens missing from the
+    lexicon vocabulary are corrected to a vocabulary word within one edit
+    (found through a precomputed single-deletion index) when both are at
+    least ``min_fuzzy_length`` characters long; shorter tokens of at least
+    ``min_transposition_length`` characters are corrected only for swapped
+    adjacent letters ("pian"). A match is negated when a
+    negation cue appears within ``negation_window`` tokens before it in the
+    same clause ("no chest pain", "denies fever or chest pain", but not
+    "no fever but chest pain"). A match is contextual when, within the same
+    window and clause, a context cue precedes it ("history of stroke", "I
+    had chest pain", "mild chest pain", "signs of a heart attack", "my dog")
+    or a context follower comes after it ("a seizure as a child", "chest
+    pain went away", "heart attack prevention"), unless a context terminator
+    such as "now" or "ive had" comes between them. Only a current,
+    first-person symptom short-circuits: contextual matches, and matches
+    without a current cue ("i", "my", "right now") in their clause, still
+    count as emergencies but their confidence stays below the threshold, so
+    the LLM sees them instead.
+    """
+
+    def __init__(
+        self,
+        concepts: Sequence[Dict[str, Any]],
+        negation_cues: Iterable[str] = (),
+        scope_terminators: Iterable[str] = (),
+        negation_window: int = 5,
+        context_cues: Iterable[str] = (),
+        context_followers: Iterable[str] = (),
+        context_terminators: Iterable[str] = (),
+        current_cues: Iterable[str] = (),
+        min_fuzzy_length: int = 5,
+        min_transposition_length: int = 4,
+        short_circuit_confidence: float = 0.9,
+        version: str = "",
+    ):
+        self.negation_window = negation_window
+        self.min_fuzzy_length = min_fuzzy_length
+        self.min_transposition_length = min_transposition_length
+        self.short_circuit_confidence = short_circuit_confidence
+        self.version = version
+        self.concepts: Dict[str, Dict[str, Any]] = {}
+
+        self._vocab: Dict[str, int] = {}
+        self._goto: List[Dict[int, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Per state: (concept id, phrase length in tokens) of every phrase ending there
+        self._outputs: List[List[Tuple[str, int]]] = [[]]
+        self.phrases = 0
+
+        for concept in concepts:
+            severity = concept.get("severity", "critical")
+            if severity not in SEVERITIES:
+                raise ValueError(f"Unknown severity {severity!r} for emergency concept {concept.get('id')!r}")
+            self.concepts[concept["id"]] = {**concept, "severity": severity, "label": concept.get("label", concept["id"])}
+            for phrase in concept["phrases"]:
+                tokens = _phrase_tokens(phrase)
+                if tokens:
+                    self._add_phrase(tokens, concept["id"])
+        self._build_failure_links()
+
+        self._negations = {_phrase_tokens(cue) for cue in negation_cues} - {()}
+        self._terminators = {_phrase_tokens(term) for term in scope_terminators} - {()}
+        self._context_cues = {_phrase_tokens(cue) for cue in context_cues} - {()}
+        self._context_followers = {_phrase_tokens(cue) for cue in context_followers} - {()}
+        # A current-time word ends a context cue's scope but not a negation's ("not currently having chest pain")
+        self._context_terminators = self._terminators | ({_phrase_tokens(term) for term in context_terminators} - {()})
+        self._current_cues = {_phrase_tokens(cue) for cue in current_cues} - {()}
+        self._max_scope_length = max(
+            (
+                len(span)
+                for span in self._negations | self._context_terminators | self._context_cues
+                | self._context_followers | self._current_cues
+            ),
+            default=0,
+        )
+
+        # Single-deletion index over long vocabulary words for misspelling correction
+        self._deletes: Dict[str, List[str]] = {}
+        for word in self._vocab:
+            if len(word) >= self.min_fuzzy_length:
+                for variant in {word} | {word[:i] + word[i + 1:] for i in range(len(word))}:
+                    self._deletes.setdefault(variant, []).append(word)
+        self._corrections: Dict[str, Optional[str]] = {}
+
+        self.checks = 0
+        self.emergencies = 0
+        self.short_circuits = 0
+
+    @classmethod
+    def from_lexicon(cls, path: str, fallback_keywords: Sequence[str] = (), **kwargs) -> "EmergencyMatcher":
+        """Matcher for a JSON lexicon file; without one, each fallback keyword is a critical concept"""
+        if path and os.path.exists(path):
+            with open(path) as f:
+                lexicon = json.load(f)
+            return cls(
+                lexicon["concepts"],
+                negation_cues=lexicon.get("negation_cues", ()),
+                scope_terminators=lexicon.get("scope_terminators", ()),
+                negation_window=lexicon.get("negation_window", 5),
+                context_cues=lexicon.get("context_cues", ()),
+                context_followers=lexicon.get("context_followers", ()),
+                context_terminators=lexicon.get("context_terminators", ()),
+                current_cues=lexicon.get("current_cues", ()),
+                version=str(lexicon.get("version", "")),
+                **kwargs,
+            )
+        print(f"Emergency lexicon not found at {path}, using the built-in keyword list")
+        concepts = [{"id": keyword, "label": keyword, "severity": "critical", "phrases": [keyword]} for keyword in fallback_keywords]
+        return cls(concepts, negation_cues=("no", "not", "denies", "without", "never"), scope_terminators=("but", "however"), **kwargs)
+
+    def _add_phrase(self, tokens: Tuple[str, ...], concept_id: str):
+        state = 0
+        for token in tokens:
+            token_id = self._vocab.setdefault(token, len(self._vocab))
+            next_state = self._goto[state].get(token_id)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][token_id] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            state = next_state
+        if (concept_id, len(tokens)) not in self._outputs[state]:
+            self._outputs[state].append((concept_id, len(tokens)))
+            self.phrases += 1
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token_id, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and token_id not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(token_id, 0)
+                self._fail[child] = target if target != child else 0
+                # Phrases ending at the fallback state also end here
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+
+    def _correct(self, token: str) -> Optional[str]:
+        """Vocabulary word within one edit of an unknown token, if any"""
+        if token in self._corrections:
+            return self._corrections[token]
+        correction = None
+        if len(token) >= self.min_fuzzy_length:
+            candidates = set(self._deletes.get(token, ()))
+            for i in range(len(token)):
+                candidates.update(self._deletes.get(token[:i] + token[i + 1:], ()))
+            # Typos rarely change the first letter; then prefer the closest length
+            matches = sorted(
+                (word[0] != token[0], abs(len(word) - len(token)), word)
+                for word in candidates if _within_one_edit(token, word)
+            )
+            correction = matches[0][2] if matches else None
+        elif len(token) >= self.min_transposition_length:
+            swaps = (token[:i] + token[i + 1] + token[i] + token[i + 2:] for i in range(len(token) - 1))
+            correction = next((word for word in swaps if word in self._vocab), None)
+        if len(self._corrections) < 100000:
+            self._corrections[token] = correction
+        return correction
+
+    def _token_ids(self, tokens: List[str]) -> Tuple[List[int], List[bool]]:
+        ids, fuzzy = [], []
+        for token in tokens:
+            if token == ".":
+                ids.append(_BREAK)
+                fuzzy.append(False)
+                continue
+            token_id = self._vocab.get(token)
+            corrected = False
+            if token_id is None and not token.isdigit():
+                correction = self._correct(token)
+                if correction is not None:
+                    token_id, corrected = self._vocab[correction], True
+            ids.append(_UNKNOWN if token_id is None else token_id)
+            fuzzy.append(corrected)
+        return ids, fuzzy
+
+    def _cue_before(
+        self, words: List[str], start: int, cues: Set[Tuple[str, ...]], terminators: Set[Tuple[str, ...]]
+    ) -> bool:
+        """Whether one of ``cues`` precedes token ``start`` within the window and the same clause"""
+        lowest = max(0, start - self.negation_window - self._max_scope_length)
+        for end in range(start, lowest, -1):
+            if words[end - 1] == ".":
+                return False
+            # Longest spans first, so a terminator such as "ive had" wins over the cue "had"
+            for length in range(min(self._max_scope_length, end), 0, -1):
+                span = tuple(words[end - length:end])
+                if span in terminators:
+                    return False
+                if span in cues and start - end < self.negation_window:
+                    return True
+        return False
+
+    def _cue_after(
+        self, words: List[str], end: int, cues: Set[Tuple[str, ...]], terminators: Set[Tuple[str, ...]]
+    ) -> bool:
+        """Whether one of ``cues`` follows the match ending before token ``end``, within the window and clause"""
+        for start in range(end, min(len(words), end + self.negation_window)):
+            if words[start] == ".":
+                return False
+            for length in range(min(self._max_scope_length, len(words) - start), 0, -1):
+                span = tuple(words[start:start + length])
+                if span in terminators:
+                    return False
+                if span in cues:
+                    return True
+        return False
+
+    def _is_negated(self, words: List[str], start: int) -> bool:
+        return self._cue_before(words, start, self._negations, self._terminators)
+
+    def _is_contextual(self, words: List[str], start: int, end: int) -> bool:
+        return (
+            self._cue_before(words, start, self._context_cues, self._context_terminators)
+            or self._cue_after(words, end, self._context_followers, self._context_terminators)
+        )
+
+    def _is_current(self, words: List[str], start: int, end: int) -> bool:
+        return (
+            any((word,) in self._current_cues for word in words[start:end])
+            or self._cue_before(words, start, self._current_cues, self._terminators)
+            or self._cue_after(words, end, self._current_cues, self._terminators)
+        )
+
+    def match(self, text: str) -> TriageResult:
+        """Find emergency phrases in ``text`` in a single pass"""
+        words = tokenize(text)
+        ids, fuzzy = self._token_ids(words)
+
+        matches: Dict[Tuple[str, int, int], TriageMatch] = {}
+        state = 0
+        for position, token_id in enumerate(ids):
+            if token_id == _BREAK:
+                state = 0
+                continue
+            while state and token_id not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token_id, 0)
+            for concept_id, length in self._outputs[state]:
+                start = position - length + 1
+                key = (concept_id, start, position)
+                if key in matches:
+                    continue
+                concept = self.concepts[concept_id]
+                corrected = any(fuzzy[start:position + 1])
+                contextual = self._is_contextual(words, start, position + 1)
+                current = self._is_current(words, start, position + 1)
+                confidence = (
+                    (0.95 if concept["severity"] == "critical" else 0.6)
+                    * (0.85 if corrected else 1.0)
+                    * (0.5 if contextual else 1.0)
+                    * (1.0 if current else 0.9)
+                )
+                matches[key] = TriageMatch(
+                    concept=concept_id,
+                    label=concept["label"],
+                    severity=concept["severity"],
+                    text=" ".join(
+                        word if not fuzzy[start + i] else self._correct(word)
+                        for i, word in enumerate(words[start:position + 1])
+                    ),
+                    start=start,
+                    end=position + 1,
+                    negated=self._is_negated(words, start),
+                    contextual=contextual,
+                    current=current,
+                    fuzzy=corrected,
+                    confidence=confidence,
+                )
+
+        ordered = sorted(matches.values(), key=lambda match: (match.start, -match.end))
+        positive = [match for match in ordered if not match.negated]
+        confidence = max((match.confidence for match in positive), default=0.0)
+        short_circuit = any(
+            match.severity == "critical" and match.confidence >= self.short_circuit_confidence for match in positive
+        )
+
+        self.checks += 1
+        self.emergencies += bool(positive)
+        self.short_circuits += short_circuit
+        return TriageResult(bool(positive), short_circuit, confidence, ordered)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "lexicon_version": self.version,
+            "concepts": len(self.concepts),
+            "phrases": self.phrases,
+            "states": len(self._goto),
+            "checks": self.checks,
+            "emergencies": self.emergencies,
+            "short_circuits": self.short_circuits,
+        }
@@ -0,0 +1,218 @@
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, List, NamedTuple, Tuple
+
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+
+def _extract_pages(pdf_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract text for pages [start, end) of a PDF (runs in a worker process)"""
+    from pypdf import PdfReader
+
+    reader = PdfReader(pdf_path)
+    return [(page_number, reader.pages[page_number].extract_text() or "") for page_number in range(start, end)]
+
+
+def _page_count(pdf_path: str) -> int:
+    from pypdf import PdfReader
+
+    return len(PdfReader(pdf_path).pages)
+
+
+def file_hash(path: str) -> str:
+    """Content hash of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class BuildOutput(NamedTuple):
+    texts: List[str]
+    metadatas: List[Dict[str, Any]]
+    vectors: np.ndarray
+    stats: Dict[str, Any]
+
+
+class ChunkCache:
+    """On-disk checkpoint of extracted page text and chunk embeddings.
+
+    Pages are keyed by the content hash of their PDF and embeddings by a hash
+    of the embedding model and chunk text, so a rebuild after changing chunking
+    or adding a document only embeds chunks it has never seen.
+    """
+
+    def __init__(self, cache_dir: str):
+        os.makedirs(cache_dir, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(cache_dir, "chunk_cache.sqlite"))
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "source_hash TEXT NOT NULL, page INTEGER NOT NULL, text TEXT NOT NULL, "
+            "PRIMARY KEY (source_hash, page))"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (chunk_hash TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._db.commit()
+
+    def get_pages(self, source_hash: str) -> Dict[int, str]:
+        rows = self._db.execute("SELECT page, text FROM pages WHERE source_hash = ?", (source_hash,))
+        return dict(rows.fetchall())
+
+    def put_pages(self, source_hash: str, pages: Iterable[Tuple[int, str]]):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO pages (source_hash, page, text) VALUES (?, ?, ?)",
+            [(source_hash, page, text) for page, text in pages],
+        )
+        self._db.commit()
+
+    def get_vectors(self, chunk_hashes: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(chunk_hashes), 500):
+            batch = chunk_hashes[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._db.execute(
+                f"SELECT chunk_hash, vector FROM embeddings WHERE chunk_hash IN ({placeholders})", batch
+            )
+            for chunk_hash, blob in rows:
+                found[chunk_hash] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_vectors(self, items: Iterable[Tuple[str, np.ndarray]]):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO embeddings (chunk_hash, vector) VALUES (?, ?)",
+            [(chunk_hash, np.asarray(vector, dtype=np.float32).tobytes()) for chunk_hash, vector in items],
+        )
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+
+class VectorStoreBuilder:
+    """Builds chunk texts and embeddings from PDFs in bounded, resumable steps.
+
+    Page extraction runs in a process pool and is checkpointed per page batch;
+    chunks are embedded in batches and their vectors checkpointed by content
+    hash. An interrupted build resumes from whatever reached the cache.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        embedding_model: str,
+        cache_dir: str,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        workers: int = 4,
+        page_batch_size: int = 50,
+        embed_batch_size: int = 256,
+    ):
+        self.embeddings = embeddings
+        self.embedding_model = embedding_model
+        self.cache = ChunkCache(cache_dir)
+        self.workers = workers
+        self.page_batch_size = page_batch_size
+        self.embed_batch_size = embed_batch_size
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=len,
+        )
+
+    def build(self, pdf_paths: List[str]) -> BuildOutput:
+        """Extract, split and embed every PDF, reusing cached pages and vectors"""
+        start = time.perf_counter()
+        texts, metadatas, hashes = [], [], []
+        pages_total = 0
+
+        for pdf_path in pdf_paths:
+            if not os.path.exists(pdf_path):
+                raise FileNotFoundError(f"PDF file not found at {pdf_path}")
+
+            pages = self._load_pages(pdf_path)
+            pages_total += len(pages)
+            for page_number in sorted(pages):
+                for chunk in self.text_splitter.split_text(pages[page_number]):
+                    chunk_hash = self._chunk_hash(chunk)
+                    texts.append(chunk)
+                    hashes.append(chunk_hash)
+                    metadatas.append({"source": pdf_path, "page": page_number, "chunk_hash": chunk_hash})
+
+        extract_seconds = time.perf_counter() - start
+        print(f"Created {len(texts)} text chunks from {pages_total} pages "
+              f"({pages_total / max(extract_seconds, 1e-9):.1f} pages/sec)")
+
+        embed_start = time.perf_counter()
+        vectors, embedded = self._embed_chunks(texts, hashes)
+        embed_seconds = time.perf_counter() - embed_start
+
+        stats = {
+            "pages": pages_total,
+            "chunks": len(texts),
+            "chunks_embedded": embedded,
+            "chunks_from_cache": len(texts) - embedded,
+            "pages_per_sec": pages_total / max(extract_seconds, 1e-9),
+            "chunks_per_sec": embedded / max(embed_seconds, 1e-9),
+            "total_seconds": time.perf_counter() - start,
+        }
+        print(f"Embedded {embedded} new chunks ({stats['chunks_per_sec']:.1f} chunks/sec), "
+              f"reused {stats['chunks_from_cache']} from cache")
+        return BuildOutput(texts, metadatas, vectors, stats)
+
+    def _load_pages(self, pdf_path: str) -> Dict[int, str]:
+        source_hash = file_hash(pdf_path)
+        pages = self.cache.get_pages(source_hash)
+        page_count = _page_count(pdf_path)
+
+        missing = [page for page in range(page_count) if page not in pages]
+        if not missing:
+            print(f"Loaded {page_count} pages of {pdf_path} from cache")
+            return pages
+
+        print(f"Extracting {len(missing)} of {page_count} pages from {pdf_path}...")
+        ranges = []
+        for page in missing:
+            if ranges and ranges[-1][1] == page and ranges[-1][1] - ranges[-1][0] < self.page_batch_size:
+                ranges[-1][1] = page + 1
+            else:
+                ranges.append([page, page + 1])
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(_extract_pages, pdf_path, first, last) for first, last in ranges]
+            for future in as_completed(futures):
+                extracted = future.result()
+                self.cache.put_pages(source_hash, extracted)
+                pages.update(extracted)
+
+        return pages
+
+    def _embed_chunks(self, texts: List[str], hashes: List[str]) -> Tuple[np.ndarray, int]:
+        cached = self.cache.get_vectors(list(set(hashes)))
+
+        pending = {}
+        for text, chunk_hash in zip(texts, hashes):
+            if chunk_hash not in cached:
+                pending[chunk_hash] = text
+        pending_items = list(pending.items())
+
+        for i in range(0, len(pending_items), self.embed_batch_size):
+            batch = pending_items[i:i + self.embed_batch_size]
+            batch_vectors = self.embeddings.embed_documents([text for _, text in batch])
+            computed = [(chunk_hash, np.asarray(vector, dtype=np.float32)) for (chunk_hash, _), vector in zip(batch, batch_vectors)]
+            self.cache.put_vectors(computed)
+            cached.update(computed)
+            print(f"Embedded {min(i + self.embed_batch_size, len(pending_items))}/{len(pending_items)} new chunks")
+
+        vectors = np.vstack([cached[chunk_hash] for chunk_hash in hashes]) if hashes else np.zeros((0, 0), dtype=np.float32)
+        return vectors.astype(np.float32, copy=False), len(pending_items)
+
+    def _chunk_hash(self, text: str) -> str:
+        return hashlib.sha256(f"{self.embedding_model}\0{text}".encode("utf-8")).hexdigest()
+
+    def close(self):
+        self.cache.close()
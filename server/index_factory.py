@@ -0,0 +1,85 @@
+from typing import Optional
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# FAISS wants roughly this many training points per IVF centroid
+MIN_POINTS_PER_CENTROID = 39
+
+
+def build_index(
+    vectors: np.ndarray,
+    index_type: str = "flat",
+    nlist: int = 1024,
+    pq_m: int = 48,
+    pq_nbits: int = 8,
+    hnsw_m: int = 32,
+    ef_construction: int = 200,
+    training_size: int = 50000,
+    seed: int = 0,
+) -> faiss.Index:
+    """Build and populate a FAISS index of the requested type.
+
+    All index types use L2 distance so scores stay comparable with the flat
+    baseline. IVF list counts are clamped to what the corpus can train.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dim = vectors.shape
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+    else:
+        nlist = max(1, min(nlist, count // MIN_POINTS_PER_CENTROID))
+        if index_type == "ivf_pq" and count < 2 ** pq_nbits:
+            print(f"Only {count} vectors, too few to train PQ codebooks; using ivf_flat")
+            index_type = "ivf_flat"
+
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_L2)
+        else:
+            if dim % pq_m:
+                raise ValueError(f"INDEX_PQ_M={pq_m} must divide the embedding dimension {dim}")
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_nbits)
+
+        rng = np.random.default_rng(seed)
+        sample = vectors if count <= training_size else vectors[rng.choice(count, training_size, replace=False)]
+        print(f"Training {index_type} index (nlist={nlist}) on {len(sample)} vectors...")
+        index.train(sample)
+
+    index.add(vectors)
+    return index
+
+
+def configure_search(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """Apply query-time parameters to an index"""
+    ivf = _as_ivf(index)
+    if ivf is not None and nprobe:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    if isinstance(index, faiss.IndexHNSW) and ef_search:
+        index.hnsw.efSearch = ef_search
+
+
+def index_type_of(index: faiss.Index) -> str:
+    """Name the index type of a loaded index"""
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    ivf = _as_ivf(index)
+    if ivf is not None:
+        return "ivf_pq" if isinstance(ivf, faiss.IndexIVFPQ) else "ivf_flat"
+    return "flat"
+
+
+def _as_ivf(index: faiss.Index):
+    try:
+        return faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return None
@@ -0,0 +1,133 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:['-][a-z0-9]+)*")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can for from has have how i in is it its may of on or that the their "
+    "them there these they this to was were what when which who will with".split()
+)
+
+VOCAB_FILE = "bm25_vocab.json"
+OFFSETS_FILE = "bm25_offsets.npy"
+DOCS_FILE = "bm25_docs.npy"
+TFS_FILE = "bm25_tfs.npy"
+LENGTHS_FILE = "bm25_doc_lengths.npy"
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, keeping hyphenated and possessive terms whole"""
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over chunk positions, stored as a CSR inverted index.
+
+    Postings for term ``t`` are ``docs[offsets[t]:offsets[t + 1]]`` with matching
+    term frequencies in ``tfs``. Document ids are positions in the vector
+    index, so lexical and dense results refer to the same chunks. The arrays
+    are saved as ``.npy`` files and memory-mapped on load.
+    """
+
+    def __init__(
+        self,
+        vocabulary: Dict[str, int],
+        offsets: np.ndarray,
+        docs: np.ndarray,
+        tfs: np.ndarray,
+        doc_lengths: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.doc_count = len(doc_lengths)
+        self.avg_doc_length = float(doc_lengths.mean()) if self.doc_count else 0.0
+
+    @classmethod
+    def build(cls, texts: List[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        vocabulary: Dict[str, int] = {}
+        postings: List[List[Tuple[int, int]]] = []
+        doc_lengths = np.zeros(len(texts), dtype=np.int32)
+
+        for position, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths[position] = len(tokens)
+            for term, count in Counter(tokens).items():
+                term_id = vocabulary.setdefault(term, len(vocabulary))
+                if term_id == len(postings):
+                    postings.append([])
+                postings[term_id].append((position, count))
+
+        offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(entries) for entries in postings])
+        docs = np.fromiter((doc for entries in postings for doc, _ in entries), dtype=np.int32, count=int(offsets[-1]))
+        tfs = np.fromiter((tf for entries in postings for _, tf in entries), dtype=np.int32, count=int(offsets[-1]))
+        return cls(vocabulary, offsets, docs, tfs, doc_lengths, k1, b)
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, VOCAB_FILE), "w") as f:
+            json.dump({"k1": self.k1, "b": self.b, "terms": self.vocabulary}, f)
+        np.save(os.path.join(path, OFFSETS_FILE), self.offsets)
+        np.save(os.path.join(path, DOCS_FILE), self.docs)
+        np.save(os.path.join(path, TFS_FILE), self.tfs)
+        np.save(os.path.join(path, LENGTHS_FILE), self.doc_lengths)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(os.path.join(path, VOCAB_FILE)) as f:
+            meta = json.load(f)
+        return cls(
+            meta["terms"],
+            np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r"),
+            np.load(os.path.join(path, DOCS_FILE), mmap_mode="r"),
+            np.load(os.path.join(path, TFS_FILE), mmap_mode="r"),
+            np.load(os.path.join(path, LENGTHS_FILE), mmap_mode="r"),
+            meta["k1"],
+            meta["b"],
+        )
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, VOCAB_FILE))
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top-k (position, score) pairs.
+
+        Scores are normalised by the best score any document could reach for
+        the query's known terms, so they fall in [0, 1] and are comparable
+        across shards. A document matching one rare term of a long query
+        scores low, so callers search with the user's text rather than a
+        templated query and filter relative to the top score as well.
+        """
+        term_ids = {self.vocabulary[term] for term in tokenize(query) if term in self.vocabulary}
+        if not term_ids or not self.doc_count:
+            return []
+
+        scores = np.zeros(self.doc_count, dtype=np.float32)
+        max_score = 0.0
+        for term_id in term_ids:
+            start, end = int(self.offsets[term_id]), int(self.offsets[term_id + 1])
+            docs = self.docs[start:end]
+            tfs = self.tfs[start:end].astype(np.float32)
+            idf = math.log(1.0 + (self.doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[docs] / self.avg_doc_length)
+            scores[docs] += idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+            max_score += idf * (self.k1 + 1.0)
+
+        k = min(k, self.doc_count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(position), float(scores[position] / max_score)) for position in top if scores[position] > 0]
@@ -0,0 +1,353 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+from groq import APIConnectionError, APIStatusError, AsyncGroq
+
+from metrics import LLM_TOKENS
+from timing import record
+
+RETRYABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class LLMDeadlineExceeded(Exception):
+    """The request could not be completed before its endpoint's deadline"""
+
+
+class TokenBucket:
+    """Tokens-per-minute budget shared by every LLM request.
+
+    Requests reserve an estimate up front and settle against the reported
+    usage afterwards, refunding what they did not use, so the balance may go
+    negative briefly when an estimate was too low.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+        self.wait_seconds = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: int, deadline: float):
+        tokens = min(float(tokens), self.capacity)
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # One waiter at a time keeps large requests from being starved by small ones
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+                if time.monotonic() + wait > deadline:
+                    raise LLMDeadlineExceeded("Token budget would not allow this request before its deadline")
+                self.wait_seconds += wait
+                await asyncio.sleep(wait)
+
+    def settle(self, reserved: int, used: int):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + reserved - used)
+
+
+class _EndpointStats:
+    __slots__ = (
+        "in_flight", "max_in_flight", "queued", "max_queued", "requests", "retries", "failures", "deadline_exceeded",
+        "completion_tokens",
+    )
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.deadline_exceeded = 0
+        # Moving average of completion lengths, used to size token reservations
+        self.completion_tokens: Optional[float] = None
+
+
+class LLMGateway:
+    """Single entry point for chat completions.
+
+    Wraps one ``AsyncGroq`` client on a pooled ``httpx`` connection pool and
+    adds, per endpoint, a concurrency limit and a request deadline, a shared
+    tokens-per-minute bucket, and retries with full-jitter exponential
+    backoff on 429, 5xx and connection errors (honouring ``Retry-After``).
+    The SDK's own retries are disabled so there is only one retry policy.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        base_url: Optional[str] = None,
+        endpoint_concurrency: Optional[Dict[str, int]] = None,
+        endpoint_deadlines: Optional[Dict[str, float]] = None,
+        default_concurrency: int = 8,
+        default_deadline: float = 30.0,
+        tokens_per_minute: Optional[int] = None,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        max_connections: int = 64,
+        max_keepalive_connections: int = 32,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+    ):
+        self.model = model
+        self.endpoint_concurrency = dict(endpoint_concurrency or {})
+        self.endpoint_deadlines = dict(endpoint_deadlines or {})
+        self.default_concurrency = default_concurrency
+        self.default_deadline = default_deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=timeout,
+        )
+        self.client = AsyncGroq(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=self.http_client,
+            max_retries=0,
+            timeout=timeout,
+        )
+
+        # Semaphores are created on first use so they bind to the serving event loop
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, _EndpointStats] = {}
+
+    async def complete(
+        self,
+        endpoint: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+    ) -> Any:
+        """Run a chat completion and return the SDK response"""
+        deadline = time.monotonic() + self.endpoint_deadlines.get(endpoint, self.default_deadline)
+        stats = self._endpoint_stats(endpoint)
+        queued_at = time.perf_counter()
+        try:
+            async with self._slot(endpoint, deadline):
+                reserved = await self._reserve(endpoint, messages, max_tokens, deadline)
+                started_at = time.perf_counter()
+                record("llm_queue", started_at - queued_at)
+                response = await self._with_retries(
+                    endpoint, deadline, lambda: self._create(messages, max_tokens, temperature)
+                )
+                record("llm", time.perf_counter() - started_at)
+                usage = getattr(response, "usage", None)
+                if usage is not None:
+                    LLM_TOKENS.inc(usage.prompt_tokens, endpoint=endpoint, kind="prompt")
+                    LLM_TOKENS.inc(usage.completion_tokens, endpoint=endpoint, kind="completion")
+                    self._observe_completion(endpoint, usage.completion_tokens)
+                if self.bucket is not None:
+                    self.bucket.settle(reserved, usage.total_tokens if usage else reserved)
+                return response
+        except LLMDeadlineExceeded:
+            stats.deadline_exceeded += 1
+            raise
+        except Exception:
+            stats.failures += 1
+            raise
+
+    async def stream(
+        self,
+        endpoint: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+    ) -> AsyncIterator[str]:
+        """Stream the completion's text deltas.
+
+        The deadline and retries cover opening the stream; once tokens have
+        been sent to the client the stream is never restarted.
+        """
+        deadline = time.monotonic() + self.endpoint_deadlines.get(endpoint, self.default_deadline)
+        stats = self._endpoint_stats(endpoint)
+        queued_at = time.perf_counter()
+        try:
+            async with self._slot(endpoint, deadline):
+                reserved = await self._reserve(endpoint, messages, max_tokens, deadline)
+                record("llm_queue", time.perf_counter() - queued_at)
+                stream = await self._with_retries(
+                    endpoint, deadline, lambda: self._create(messages, max_tokens, temperature, stream=True)
+                )
+                chars = 0
+                try:
+                    async for chunk in stream:
+                        if not chunk.choices:
+                            continue
+                        text = chunk.choices[0].delta.content
+                        if text:
+                            chars += len(text)
+                            yield text
+                finally:
+                    # Streamed chunks carry no usage, so count from the text
+                    prompt_tokens = self._estimate_tokens(messages)
+                    LLM_TOKENS.inc(prompt_tokens, endpoint=endpoint, kind="prompt")
+                    LLM_TOKENS.inc(chars // 4, endpoint=endpoint, kind="completion")
+                    self._observe_completion(endpoint, chars // 4)
+                    if self.bucket is not None:
+                        self.bucket.settle(reserved, prompt_tokens + chars // 4)
+        except LLMDeadlineExceeded:
+            stats.deadline_exceeded += 1
+            raise
+        except Exception:
+            stats.failures += 1
+            raise
+
+    def _create(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float, stream: bool = False):
+        return self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=stream,
+        )
+
+    @asynccontextmanager
+    async def _slot(self, endpoint: str, deadline: float):
+        """Hold one of the endpoint's concurrency slots, queueing until the deadline"""
+        semaphore = self._semaphores.get(endpoint)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.endpoint_concurrency.get(endpoint, self.default_concurrency))
+            self._semaphores[endpoint] = semaphore
+
+        stats = self._endpoint_stats(endpoint)
+        stats.requests += 1
+        stats.queued += 1
+        stats.max_queued = max(stats.max_queued, stats.queued)
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self._remaining(deadline))
+        except asyncio.TimeoutError:
+            raise LLMDeadlineExceeded(f"Timed out waiting for a {endpoint} LLM slot") from None
+        finally:
+            stats.queued -= 1
+
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        try:
+            yield
+        finally:
+            stats.in_flight -= 1
+            semaphore.release()
+
+    async def _reserve(self, endpoint: str, messages: List[Dict[str, str]], max_tokens: int, deadline: float) -> int:
+        """Take the prompt plus the endpoint's typical completion from the bucket.
+
+        Reserving the full ``max_tokens`` would hold back several times what
+        answers actually use and throttle well below the provider's limit;
+        until an endpoint has answered once, ``max_tokens`` is the estimate.
+        """
+        if self.bucket is None:
+            return 0
+        completion_tokens = self._endpoint_stats(endpoint).completion_tokens
+        if completion_tokens is None:
+            completion_tokens = max_tokens
+        reserved = self._estimate_tokens(messages) + min(max_tokens, int(completion_tokens) + 1)
+        await self.bucket.acquire(reserved, deadline)
+        return reserved
+
+    def _observe_completion(self, endpoint: str, tokens: int):
+        stats = self._endpoint_stats(endpoint)
+        if stats.completion_tokens is None:
+            stats.completion_tokens = float(tokens)
+        else:
+            stats.completion_tokens += 0.1 * (tokens - stats.completion_tokens)
+
+    async def _with_retries(self, endpoint: str, deadline: float, call):
+        stats = self._endpoint_stats(endpoint)
+        attempt = 0
+        while True:
+            try:
+                return await asyncio.wait_for(call(), self._remaining(deadline))
+            except asyncio.TimeoutError:
+                raise LLMDeadlineExceeded(f"{endpoint} LLM request exceeded its deadline") from None
+            except (APIStatusError, APIConnectionError) as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    raise
+                delay = self._backoff_delay(e, attempt)
+                if time.monotonic() + delay >= deadline:
+                    raise
+                attempt += 1
+                stats.retries += 1
+                print(f"LLM {endpoint} request failed ({e.__class__.__name__}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, APIStatusError):
+            return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+        return True
+
+    def _backoff_delay(self, error: Exception, attempt: int) -> float:
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def _remaining(deadline: float) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMDeadlineExceeded("LLM request exceeded its deadline")
+        return remaining
+
+    @staticmethod
+    def _estimate_tokens(messages: List[Dict[str, str]]) -> int:
+        return sum(len(message["content"]) for message in messages) // 4 + 4 * len(messages)
+
+    def _endpoint_stats(self, endpoint: str) -> _EndpointStats:
+        stats = self._stats.get(endpoint)
+        if stats is None:
+            stats = self._stats[endpoint] = _EndpointStats()
+        return stats
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth, concurrency and retry statistics per endpoint"""
+        stats: Dict[str, Any] = {
+            "endpoints": {
+                endpoint: {
+                    "concurrency": self.endpoint_concurrency.get(endpoint, self.default_concurrency),
+                    **{name: getattr(endpoint_stats, name) for name in _EndpointStats.__slots__},
+                }
+                for endpoint, endpoint_stats in self._stats.items()
+            },
+        }
+        if self.bucket is not None:
+            self.bucket._refill()
+            stats["tokens_per_minute"] = int(self.bucket.capacity)
+            stats["tokens_available"] = int(self.bucket.tokens)
+            stats["rate_limit_wait_seconds"] = round(self.bucket.wait_seconds, 3)
+        return stats
+
+    async def aclose(self):
+        await self.http_client.aclose()
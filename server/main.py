@@ -1,14 +1,107 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Match
 import os
+import json
+import time
+import uuid
 from dotenv import load_dotenv
-from rag_service import RAGService
+from rag_service import RAGService, PREFETCH_ENDPOINTS
+from condition_store import compute_etag, etag_matches
+from schemas import SymptomRequest, ChatRequest, CorpusReloadRequest, PrefetchRequest
+from batch_triage import iter_lines, triage_lines
+from timing import start_request, format_server_timing
+from metrics import registry, CACHE_LOOKUPS, REQUEST_DURATION, REQUESTS_IN_FLIGHT
+from sampling_profiler import SamplingProfiler
 
 load_dotenv()
 
-app = FastAPI(title="DocBot AI Medical Assistant with RAG")
+# Initialize RAG service (cheap: the model and index load in the background)
+groq_api_key = os.getenv("GROQ_API_KEY")
+if not groq_api_key:
+    raise ValueError("GROQ_API_KEY environment variable is required")
+
+rag_service = RAGService(groq_api_key)
+profiler = SamplingProfiler()
+
+# Component stats that already exist are exported as metrics when scraped
+registry.callback("docbot_rag_ready", "1 once the embedding model and index are loaded", lambda: [({}, rag_service.is_ready)])
+registry.callback(
+    "docbot_llm_in_flight", "LLM requests being sent, per gateway endpoint",
+    lambda: [({"endpoint": name}, stats["in_flight"]) for name, stats in rag_service.llm.get_stats()["endpoints"].items()],
+)
+registry.callback(
+    "docbot_llm_queue_depth", "LLM requests waiting for a concurrency slot, per gateway endpoint",
+    lambda: [({"endpoint": name}, stats["queued"]) for name, stats in rag_service.llm.get_stats()["endpoints"].items()],
+)
+registry.callback(
+    "docbot_llm_retries_total", "LLM requests retried after 429, 5xx or connection errors",
+    lambda: [({"endpoint": name}, stats["retries"]) for name, stats in rag_service.llm.get_stats()["endpoints"].items()],
+    type_name="counter",
+)
+registry.callback(
+    "docbot_retrieval_queries_total", "Queries embedded and searched through the retrieval batcher",
+    lambda: [({}, rag_service.batcher.queries_run)], type_name="counter",
+)
+registry.callback(
+    "docbot_retrieval_batches_total", "Batches run by the retrieval batcher",
+    lambda: [({}, rag_service.batcher.batches_run)], type_name="counter",
+)
+registry.callback(
+    "docbot_semantic_cache_entries", "Answers held in the semantic cache",
+    lambda: [({}, rag_service.response_cache.get_stats()["entries"])] if rag_service.response_cache else [],
+)
+registry.callback(
+    "docbot_query_embedding_cache_lookups_total", "Query embedding cache lookups by result (hit, miss)",
+    lambda: [
+        ({"result": "hit"}, rag_service.query_embedding_cache.hits),
+        ({"result": "miss"}, rag_service.query_embedding_cache.misses),
+    ] if rag_service.query_embedding_cache else [],
+    type_name="counter",
+)
+registry.callback(
+    "docbot_emergency_short_circuits_total", "Symptom analyses answered immediately as emergencies",
+    lambda: [({}, rag_service.emergency_matcher.short_circuits)], type_name="counter",
+)
+registry.callback(
+    "docbot_prefetch_total", "Retrieval prefetches by outcome (scheduled, unchanged, cancelled, stale, expired)",
+    lambda: [
+        ({"outcome": outcome}, rag_service.prefetch_cache.get_stats()[outcome])
+        for outcome in ("scheduled", "unchanged", "cancelled", "stale", "expired")
+    ] if rag_service.prefetch_cache else [],
+    type_name="counter",
+)
+registry.callback(
+    "docbot_single_flight_collapsed_total", "Requests answered by another identical in-flight request",
+    lambda: [({}, rag_service.single_flight.collapsed)], type_name="counter",
+)
+registry.callback(
+    "docbot_context_tokens_total", "Prompt context tokens before (raw) and after (context) assembly",
+    lambda: [({"kind": "raw"}, rag_service.context_stats["raw_tokens"]), ({"kind": "context"}, rag_service.context_stats["context_tokens"])],
+    type_name="counter",
+)
+registry.callback(
+    "docbot_active_conversations", "Conversations held in conversation memory",
+    lambda: [({}, rag_service.conversations.get_stats()["active_conversations"])],
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the embedding model and vector store without holding up startup;
+    # requests use context-free prompts until retrieval is ready
+    app.state.rag_init_task = asyncio.create_task(asyncio.to_thread(rag_service.initialize))
+    yield
+    await rag_service.batcher.shutdown()
+    await rag_service.llm.aclose()
+    if rag_service.query_embedding_cache is not None:
+        rag_service.query_embedding_cache.save()
+    if rag_service.response_cache is not None:
+        await asyncio.to_thread(rag_service.response_cache.close)
+
+app = FastAPI(title="DocBot AI Medical Assistant with RAG", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,22 +111,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize RAG service
-groq_api_key = os.getenv("GROQ_API_KEY")
-if not groq_api_key:
-    raise ValueError("GROQ_API_KEY environment variable is required")
+def _route_label(request: Request) -> str:
+    """Route template (e.g. /medical-info/{condition}) so metric labels stay bounded"""
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
 
-rag_service = RAGService(groq_api_key)
+@app.middleware("http")
+async def instrument_request(request: Request, call_next):
+    """Record request metrics and report per-stage durations in a Server-Timing header"""
+    start = time.perf_counter()
+    route = _route_label(request)
+    trace_id = None
+    if rag_service.config.TRACE_REQUEST_IDS:
+        trace_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    trace = start_request(route, trace_id)
+    
+    status = 500
+    REQUESTS_IN_FLIGHT.inc(route=route)
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - start
+        REQUESTS_IN_FLIGHT.dec(route=route)
+        REQUEST_DURATION.observe(elapsed, route=route, method=request.method, status=str(status))
+    
+    trace.stages["total"] = elapsed
+    response.headers["Server-Timing"] = format_server_timing(trace.stages)
+    if trace_id:
+        response.headers["X-Request-ID"] = trace_id
+        if elapsed >= rag_service.config.SLOW_REQUEST_LOG_SECONDS:
+            print(f"Slow request {trace_id}: {request.method} {route} {status} in {elapsed:.2f}s ({format_server_timing(trace.stages)})")
+    return response
 
-class SymptomRequest(BaseModel):
-    symptoms: str
-    age: Optional[int] = None
-    gender: Optional[str] = None
-    medical_history: Optional[str] = None
+def _sse_stream(events):
+    """Format (event, data) pairs as Server-Sent Events"""
+    async def generate():
+        async for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-class ChatRequest(BaseModel):
-    message: str
-    conversation_id: Optional[str] = None
+def _ndjson_stream(events):
+    """Format (event, data) pairs as newline-delimited JSON objects"""
+    async def generate():
+        async for event, data in events:
+            yield json.dumps({"event": event, "data": data}) + "\n"
+    
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/")
 async def root():
@@ -58,7 +194,8 @@ async def analyze_symptoms(request: SymptomRequest):
             symptoms=request.symptoms,
             age=request.age,
             gender=request.gender,
-            medical_history=request.medical_history
+            medical_history=request.medical_history,
+            session_id=request.session_id
         )
         return result
         
@@ -74,6 +211,42 @@ async def analyze_symptoms(request: SymptomRequest):
             "follow_up_questions": []
         }
 
+@app.post("/analyze-symptoms/stream")
+async def analyze_symptoms_stream(request: SymptomRequest, http_request: Request):
+    """Stream a symptom analysis field by field as NDJSON, or as Server-Sent Events for Accept: text/event-stream"""
+    if not request.symptoms or len(request.symptoms.strip()) < 3:
+        raise HTTPException(status_code=400, detail="Please provide detailed symptoms")
+    
+    events = rag_service.stream_symptom_analysis(
+        symptoms=request.symptoms,
+        age=request.age,
+        gender=request.gender,
+        medical_history=request.medical_history,
+        session_id=request.session_id
+    )
+    if "text/event-stream" in http_request.headers.get("accept", ""):
+        return _sse_stream(events)
+    return _ndjson_stream(events)
+
+@app.get("/analyze-symptoms/result/{analysis_id}")
+async def get_symptom_analysis_result(analysis_id: str):
+    """Full analysis that was finished in the background after an immediate emergency answer"""
+    entry = rag_service.get_background_analysis(analysis_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired analysis id")
+    if entry["status"] == "pending":
+        return JSONResponse(status_code=202, content={"analysis_id": analysis_id, "status": "pending"})
+    return {"analysis_id": analysis_id, "status": entry["status"], "result": entry["result"]}
+
+@app.post("/analyze-symptoms/batch")
+async def analyze_symptoms_batch(request: Request):
+    """Triage a JSONL body of SymptomRequest records, streaming NDJSON results in input order"""
+    async def generate():
+        async for record in triage_lines(rag_service, iter_lines(request.stream())):
+            yield json.dumps(record) + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
 @app.post("/chat")
 async def chat(request: ChatRequest):
     if not request.message or len(request.message.strip()) < 2:
@@ -83,40 +256,153 @@ async def chat(request: ChatRequest):
         # Use RAG service for enhanced chat responses
         result = await rag_service.chat_with_rag(
             message=request.message,
-            conversation_id=request.conversation_id
+            conversation_id=request.conversation_id,
+            session_id=request.session_id
         )
         return result
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    if not request.message or len(request.message.strip()) < 2:
+        raise HTTPException(status_code=400, detail="Please provide a message")
+    
+    return _sse_stream(rag_service.stream_chat_with_rag(
+        message=request.message,
+        conversation_id=request.conversation_id,
+        session_id=request.session_id
+    ))
+
+@app.post("/prefetch", status_code=202)
+async def prefetch(request: PrefetchRequest):
+    """Start retrieval for text the user is still typing; the submitted request reuses it if the text is close enough"""
+    if request.endpoint not in PREFETCH_ENDPOINTS:
+        raise HTTPException(status_code=400, detail=f"Prefetch is only available for {', '.join(PREFETCH_ENDPOINTS)}")
+    scheduled = rag_service.prefetch(request.session_id, request.endpoint, request.text, request.conversation_id)
+    return {"scheduled": scheduled}
+
+def _cached_json(request: Request, payload: dict, etag: str, max_age: int):
+    """JSON response with validators, or 304 if the client already has this version"""
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
+
 @app.get("/medical-info/{condition}")
-async def get_condition_info(condition: str):
+async def get_condition_info(condition: str, request: Request):
     if len(condition.strip()) < 2:
         raise HTTPException(status_code=400, detail="Please provide a valid condition")
     
+    # Serve a precomputed page when one exists
+    entry = rag_service.condition_pages.get(condition)
+    CACHE_LOOKUPS.inc(cache="condition_pages", endpoint="medical_info", result="miss" if entry is None else "hit")
+    if entry is not None:
+        return _cached_json(request, entry["page"], entry["etag"], rag_service.config.CONDITION_PAGE_MAX_AGE_SECONDS)
+    
     try:
         # Use RAG service for enhanced condition information
         result = await rag_service.get_condition_info_with_rag(condition)
-        return result
+        return _cached_json(request, result, compute_etag(result), rag_service.config.LIVE_CONDITION_PAGE_MAX_AGE_SECONDS)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Information retrieval failed: {str(e)}")
 
+@app.get("/medical-info/{condition}/stream")
+async def get_condition_info_stream(condition: str):
+    if len(condition.strip()) < 2:
+        raise HTTPException(status_code=400, detail="Please provide a valid condition")
+    
+    return _sse_stream(rag_service.stream_condition_info_with_rag(condition))
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-route and per-stage latency, tokens, cache lookups and in-flight gauges"""
+    if not rag_service.config.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+def _require_profiler_endpoints():
+    if not rag_service.config.PROFILER_ENDPOINTS_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler endpoints are disabled")
+
+@app.post("/debug/profiler/start")
+async def start_profiler(interval_ms: float = None, max_seconds: float = None):
+    """Start the sampling profiler; it stops by itself after max_seconds"""
+    _require_profiler_endpoints()
+    interval = (interval_ms or rag_service.config.PROFILER_INTERVAL_MS) / 1000.0
+    duration = min(max_seconds or rag_service.config.PROFILER_MAX_SECONDS, rag_service.config.PROFILER_MAX_SECONDS)
+    if not profiler.start(interval, duration):
+        raise HTTPException(status_code=409, detail="Profiler is already running")
+    return profiler.get_stats()
+
+@app.post("/debug/profiler/stop")
+async def stop_profiler():
+    _require_profiler_endpoints()
+    await asyncio.to_thread(profiler.stop)
+    return profiler.get_stats()
+
+@app.get("/debug/profiler")
+async def get_profile():
+    """Collapsed stacks (flamegraph.pl / speedscope format) from the last profiling run"""
+    _require_profiler_endpoints()
+    return PlainTextResponse(profiler.collapsed())
+
+@app.get("/corpora")
+async def list_corpora():
+    """Loaded corpus shards, their versions and endpoint routing"""
+    return rag_service.corpora.get_stats()
+
+@app.post("/corpora/{name}/reload")
+async def reload_corpus(name: str, request: CorpusReloadRequest = None):
+    """Rebuild a corpus shard if needed and swap it in without a restart"""
+    if not rag_service.config.CORPUS_ADMIN_ENDPOINTS_ENABLED:
+        raise HTTPException(status_code=404, detail="Corpus admin endpoints are disabled")
+    if not rag_service.is_ready:
+        raise HTTPException(status_code=503, detail="RAG system is not ready")
+    request = request or CorpusReloadRequest()
+    try:
+        shard = await asyncio.to_thread(rag_service.reload_corpus, name, request.pdf_paths, request.force)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reloading corpus {name}: {str(e)}")
+    return {"corpus": name, **shard.get_stats()}
+
 @app.get("/rag-status")
 async def get_rag_status():
     """Get the status of the RAG system"""
     try:
-        vector_store_exists = rag_service.vector_store is not None
-        retriever_ready = rag_service.retriever is not None
+        vector_store_exists = len(rag_service.corpora) > 0
+        retriever_ready = vector_store_exists and rag_service.is_ready
         
         return {
-            "status": "operational" if vector_store_exists and retriever_ready else "initializing",
+            "status": rag_service.status,
+            "ready": rag_service.is_ready,
+            "startup_seconds": rag_service.startup_timings,
+            "startup_error": rag_service.status_error,
             "vector_store_loaded": vector_store_exists,
             "retriever_ready": retriever_ready,
             "pdf_source": rag_service.pdf_path,
-            "embeddings_model": "sentence-transformers/all-MiniLM-L6-v2",
-            "vector_store_type": "FAISS"
+            "embeddings_model": rag_service.config.EMBEDDING_MODEL,
+            "embedding_backend": rag_service.embedding_backend,
+            "vector_store_type": "FAISS",
+            "index_type": rag_service.get_index_type(),
+            "build_stats": rag_service.build_stats,
+            "corpora": rag_service.corpora.get_stats(),
+            "retrieval_batching": rag_service.batcher.get_stats(),
+            "semantic_cache": rag_service.response_cache.get_stats() if rag_service.response_cache else None,
+            "query_embedding_cache": rag_service.query_embedding_cache.get_stats() if rag_service.query_embedding_cache else None,
+            "reranker": rag_service.reranker.get_stats() if rag_service.reranker else None,
+            "streaming": rag_service.get_streaming_stats(),
+            "context_assembly": rag_service.get_context_stats(),
+            "conversations": rag_service.conversations.get_stats(),
+            "single_flight": rag_service.single_flight.get_stats(),
+            "prefetch": rag_service.prefetch_cache.get_stats() if rag_service.prefetch_cache else None,
+            "emergency_triage": rag_service.emergency_matcher.get_stats(),
+            "condition_pages": rag_service.condition_pages.get_stats(),
+            "llm_gateway": rag_service.llm.get_stats()
         }
     except Exception as e:
         return {
@@ -0,0 +1,121 @@
+import json
+import mmap
+import os
+from collections.abc import Mapping
+from typing import Any, Dict, List
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+INDEX_FILE = "index.faiss"
+TEXTS_FILE = "chunks.bin"
+OFFSETS_FILE = "chunk_offsets.npy"
+PAGES_FILE = "chunk_pages.npy"
+SOURCES_FILE = "chunk_sources.npy"
+HASHES_FILE = "chunk_hashes.npy"
+MANIFEST_FILE = "chunks.json"
+
+
+class MmapDocstore:
+    """Read-only docstore over a memory-mapped chunk text file.
+
+    Chunk ``i`` is ``chunks.bin[offsets[i]:offsets[i + 1]]`` decoded as UTF-8;
+    page, source and content hash live in parallel NumPy arrays. Everything is
+    mapped read-only, so uvicorn workers share one copy through the page cache.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(os.path.join(path, TEXTS_FILE), "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._texts = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+        self._pages = np.load(os.path.join(path, PAGES_FILE), mmap_mode="r")
+        self._source_ids = np.load(os.path.join(path, SOURCES_FILE), mmap_mode="r")
+        self._hashes = np.load(os.path.join(path, HASHES_FILE), mmap_mode="r")
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            self._sources = json.load(f)["sources"]
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def get_text(self, position: int) -> str:
+        start, end = int(self._offsets[position]), int(self._offsets[position + 1])
+        return self._texts[start:end].decode("utf-8")
+
+    def get_metadata(self, position: int) -> Dict[str, Any]:
+        return {
+            "source": self._sources[int(self._source_ids[position])],
+            "page": int(self._pages[position]),
+            "chunk_hash": self._hashes[position].decode("ascii"),
+        }
+
+    def search(self, position: int) -> Document:
+        return Document(page_content=self.get_text(position), metadata=self.get_metadata(position))
+
+
+class PositionalIds(Mapping):
+    """index_to_docstore_id for stores whose docstore ids are index positions"""
+
+    def __init__(self, count: int):
+        self._count = count
+
+    def __getitem__(self, position: int) -> int:
+        if not 0 <= position < self._count:
+            raise KeyError(position)
+        return int(position)
+
+    def __iter__(self):
+        return iter(range(self._count))
+
+    def __len__(self) -> int:
+        return self._count
+
+
+def save_mmap_store(path: str, index: faiss.Index, texts: List[str], metadatas: List[Dict[str, Any]]):
+    """Write an index and its chunks in the memory-mappable layout"""
+    os.makedirs(path, exist_ok=True)
+    faiss.write_index(index, os.path.join(path, INDEX_FILE))
+
+    sources: List[str] = []
+    source_ids = {}
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    with open(os.path.join(path, TEXTS_FILE), "wb") as f:
+        for i, text in enumerate(texts):
+            encoded = text.encode("utf-8")
+            f.write(encoded)
+            offsets[i + 1] = offsets[i] + len(encoded)
+
+    for metadata in metadatas:
+        source = metadata.get("source") or ""
+        if source not in source_ids:
+            source_ids[source] = len(sources)
+            sources.append(source)
+
+    np.save(os.path.join(path, OFFSETS_FILE), offsets)
+    np.save(os.path.join(path, PAGES_FILE), np.asarray([m.get("page", -1) for m in metadatas], dtype=np.int32))
+    np.save(os.path.join(path, SOURCES_FILE), np.asarray([source_ids[m.get("source") or ""] for m in metadatas], dtype=np.int32))
+    np.save(os.path.join(path, HASHES_FILE), np.asarray([m.get("chunk_hash", "") for m in metadatas], dtype="S64"))
+    with open(os.path.join(path, MANIFEST_FILE), "w") as f:
+        json.dump({"sources": sources, "chunks": len(texts)}, f)
+
+
+def load_mmap_store(path: str, embeddings) -> FAISS:
+    """Open a memory-mapped store as a LangChain FAISS vector store"""
+    index_path = os.path.join(path, INDEX_FILE)
+    # IO_FLAG_MMAP_IFC (newer FAISS) also maps flat codes; older builds only map IVF lists
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    try:
+        index = faiss.read_index(index_path, flags)
+    except RuntimeError as e:
+        print(f"Could not memory-map {index_path} ({e}), reading it into memory")
+        index = faiss.read_index(index_path)
+
+    docstore = MmapDocstore(path)
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=PositionalIds(len(docstore)),
+    )
@@ -0,0 +1,78 @@
+"""Pre-generate /medical-info pages for every condition heading in the encyclopedia.
+
+Walks the entry titles found in the indexed chunks and generates each page
+with bounded concurrency into the versioned ConditionPageStore. Pages that
+already exist for the current version are skipped, so the job can be
+re-run or resumed. Run from the ``server`` directory::
+
+    python precompute_conditions.py --concurrency 4
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from dotenv import load_dotenv
+
+from condition_store import find_condition_headings
+from rag_service import RAGService
+
+
+async def precompute(service: RAGService, conditions, concurrency: int, force: bool):
+    semaphore = asyncio.Semaphore(concurrency)
+    done = failed = skipped = 0
+    start = time.perf_counter()
+
+    async def generate(condition: str):
+        nonlocal done, failed, skipped
+        if not force and service.condition_pages.contains(condition):
+            skipped += 1
+            return
+        async with semaphore:
+            try:
+                page = await service.get_condition_info_with_rag(condition)
+            except Exception as e:
+                failed += 1
+                print(f"Failed to generate {condition}: {e}")
+                return
+        service.condition_pages.put(condition, page)
+        done += 1
+        if done % 25 == 0:
+            print(f"Generated {done} pages ({done / (time.perf_counter() - start):.2f} pages/sec)")
+
+    await asyncio.gather(*(generate(condition) for condition in conditions))
+    print(f"Generated {done}, skipped {skipped}, failed {failed} "
+          f"into {service.condition_pages.path} in {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--limit", type=int, default=None, help="Only generate the first N conditions")
+    parser.add_argument("--force", action="store_true", help="Regenerate pages that already exist")
+    args = parser.parse_args()
+
+    groq_api_key = os.getenv("GROQ_API_KEY")
+    if not groq_api_key:
+        raise ValueError("GROQ_API_KEY environment variable is required")
+
+    service = RAGService(groq_api_key)
+    service.initialize()
+    if not service.is_ready:
+        raise SystemExit(f"RAG initialization failed: {service.status_error}")
+    # Similar condition names (e.g. hepatitis A/B) must not share a cached page
+    service.response_cache = None
+
+    texts = [text for shard in service.corpora.shards_for("medical_info") for text in shard.contents()[1]]
+    conditions = find_condition_headings(texts)
+    if args.limit:
+        conditions = conditions[:args.limit]
+    print(f"Found {len(conditions)} condition headings")
+
+    concurrency = args.concurrency or service.config.CONDITION_PAGES_CONCURRENCY
+    asyncio.run(precompute(service, conditions, concurrency, args.force))
+
+
+if __name__ == "__main__":
+    main()
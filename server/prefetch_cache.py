@@ -0,0 +1,141 @@
+import asyncio
+import time
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from query_embedding_cache import normalize_query
+
+
+def _query_context(text: str, query: str) -> str:
+    """What the retrieval query adds to the typed text (a fixed template, earlier conversation turns)"""
+    return query.replace(text.strip(), "", 1)
+
+
+class _Prefetch:
+    __slots__ = ("text", "context", "task", "created_at")
+
+    def __init__(self, text: str, context: str, task: asyncio.Task):
+        self.text = text
+        self.context = context
+        self.task = task
+        self.created_at = time.monotonic()
+
+
+class PrefetchCache:
+    """Short-lived retrieval results warmed per session while the user types.
+
+    Each (session, endpoint) holds only its latest prefetch: scheduling a new
+    one cancels the previous task if it is still running, so a burst of
+    keystrokes leaves at most one retrieval in flight per session. ``take``
+    hands the prefetched result to the submitted request when the submitted
+    text is close enough to the prefetched text (identical once normalized,
+    or a ``difflib`` ratio of at least ``min_similarity``) and the rest of
+    the retrieval query is unchanged, waiting for a prefetch that is still
+    running, and says whether the texts matched exactly: on a near match the
+    result's documents fit the submitted text but its query vector is the
+    prefetched text's. An entry is used at most once and expires after
+    ``ttl_seconds``.
+    """
+
+    def __init__(self, ttl_seconds: float = 60.0, max_entries: int = 5000, min_similarity: float = 0.85):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.min_similarity = min_similarity
+        self._entries: "OrderedDict[Tuple[str, str], _Prefetch]" = OrderedDict()
+
+        self.scheduled = 0
+        self.unchanged = 0  # Same text as the prefetch already held
+        self.cancelled = 0  # Superseded, evicted or stale prefetches stopped while still running
+        self.hits = 0
+        self.joined = 0  # Hits that waited for a prefetch still in flight
+        self.near_hits = 0  # Hits on submitted text that differs from the prefetched text
+        self.misses = 0
+        self.stale = 0  # Submitted text too different from the prefetched text, or the conversation moved on
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def schedule(
+        self, session_id: str, endpoint: str, text: str, query: str, retrieve: Callable[[], Awaitable[Any]]
+    ) -> bool:
+        """Start ``retrieve()`` for the text typed so far (``query`` is what it retrieves for); False if already prefetched"""
+        key = (session_id, endpoint)
+        normalized = normalize_query(text)
+        context = _query_context(text, query)
+        previous = self._entries.get(key)
+        if previous is not None and (previous.text, previous.context) == (normalized, context) and not self._expired(previous):
+            self.unchanged += 1
+            return False
+
+        self._discard(self._entries.pop(key, None))
+        self._entries[key] = _Prefetch(normalized, context, asyncio.ensure_future(retrieve()))
+        self.scheduled += 1
+        # Entries are in scheduling order, so expired and excess ones are at the front
+        while self._entries and (len(self._entries) > self.max_entries or self._expired(next(iter(self._entries.values())))):
+            _, evicted = self._entries.popitem(last=False)
+            self._discard(evicted)
+        return True
+
+    async def take(self, session_id: str, endpoint: str, text: str, query: str) -> Tuple[Optional[Any], bool]:
+        """The prefetched result for the submitted ``text`` (None to retrieve normally) and whether the text was identical"""
+        entry = self._entries.pop((session_id, endpoint), None)
+        if entry is None:
+            self.misses += 1
+            return None, False
+        if self._expired(entry):
+            self._discard(entry)
+            self.expired += 1
+            self.misses += 1
+            return None, False
+        submitted = normalize_query(text)
+        if entry.context != _query_context(text, query) or not self._close_enough(entry.text, submitted):
+            self._discard(entry)
+            self.stale += 1
+            self.misses += 1
+            return None, False
+
+        if not entry.task.done():
+            self.joined += 1
+        try:
+            result = await asyncio.shield(entry.task)
+        except Exception:
+            result = None
+        if result is None:
+            self.misses += 1
+            return None, False
+        self.hits += 1
+        exact = entry.text == submitted
+        self.near_hits += not exact
+        return result, exact
+
+    def _close_enough(self, prefetched: str, submitted: str) -> bool:
+        if prefetched == submitted:
+            return True
+        return SequenceMatcher(None, prefetched, submitted).ratio() >= self.min_similarity
+
+    def _expired(self, entry: _Prefetch) -> bool:
+        return time.monotonic() - entry.created_at > self.ttl
+
+    def _discard(self, entry: Optional[_Prefetch]):
+        if entry is not None and not entry.task.done():
+            entry.task.cancel()
+            self.cancelled += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "in_flight": sum(not entry.task.done() for entry in self._entries.values()),
+            "scheduled": self.scheduled,
+            "unchanged": self.unchanged,
+            "cancelled": self.cancelled,
+            "hits": self.hits,
+            "joined": self.joined,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "expired": self.expired,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
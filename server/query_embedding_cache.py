@@ -0,0 +1,137 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Case-folded query with punctuation dropped and whitespace collapsed"""
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", text.casefold())).strip()
+
+
+class QueryEmbeddingCache:
+    """LRU cache of query embeddings held in a preallocated float32 slab.
+
+    Keys are normalized (case-folded, punctuation dropped, whitespace collapsed)
+    so trivially different spellings of a query share one vector. Vectors are
+    rows of a single ``capacity x dim`` array allocated on first use; the LRU
+    order maps keys to rows and an evicted key's row is reused. When ``path``
+    is set the cache can be saved and reloaded, and a saved cache is ignored
+    unless it was written for the same ``model_key``.
+    """
+
+    def __init__(self, capacity: int = 10000, path: Optional[str] = None, model_key: str = ""):
+        self.capacity = capacity
+        self.path = path
+        self.model_key = model_key
+
+        self._rows: "OrderedDict[str, int]" = OrderedDict()
+        self._slab: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def embed(self, texts: List[str], encode: Callable[[List[str]], List[List[float]]]) -> np.ndarray:
+        """Embeddings for ``texts`` as a float32 array; only uncached keys go to ``encode``"""
+        keys = [normalize_query(text) for text in texts]
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                row = self._rows.get(key)
+                if row is None:
+                    missing.setdefault(key, []).append(i)
+                    continue
+                self._rows.move_to_end(key)
+                vectors[i] = self._slab[row].copy()
+            self.hits += len(texts) - sum(len(positions) for positions in missing.values())
+            self.misses += sum(len(positions) for positions in missing.values())
+
+        if missing:
+            # Each distinct key is encoded once, from the first text that produced it
+            pending = list(missing.items())
+            encoded = np.asarray(encode([texts[positions[0]] for _, positions in pending]), dtype=np.float32)
+            with self._lock:
+                for (key, positions), vector in zip(pending, encoded):
+                    self._put(key, vector)
+                    for i in positions:
+                        vectors[i] = vector
+
+        return np.stack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+
+    def _put(self, key: str, vector: np.ndarray):
+        if self.capacity <= 0:
+            return
+        if self._slab is None:
+            self._slab = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+
+        row = self._rows.get(key)
+        if row is None:
+            if len(self._rows) < self.capacity:
+                row = len(self._rows)
+            else:
+                _, row = self._rows.popitem(last=False)
+                self.evictions += 1
+            self._rows[key] = row
+        else:
+            self._rows.move_to_end(key)
+        self._slab[row] = vector
+
+    def save(self):
+        """Write cached keys (least recently used first) and vectors to ``path``"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._rows:
+                return
+            keys = list(self._rows)
+            vectors = self._slab[list(self._rows.values())]
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, keys=np.array(keys), vectors=vectors, model_key=np.array(self.model_key))
+        os.replace(tmp_path, self.path)
+
+    def load(self) -> int:
+        """Load a saved cache for the same model; returns the number of entries loaded"""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if str(data["model_key"]) != self.model_key:
+                    print(f"Ignoring query embedding cache at {self.path}: written for another embedding model")
+                    return 0
+                keys, vectors = data["keys"], data["vectors"].astype(np.float32)
+        except Exception as e:
+            print(f"Error loading query embedding cache: {e}")
+            return 0
+
+        with self._lock:
+            for key, vector in zip(keys[-self.capacity:], vectors[-self.capacity:]):
+                self._put(str(key), vector)
+        return min(len(keys), self.capacity)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._rows),
+            "capacity": self.capacity,
+            "bytes": self._slab.nbytes if self._slab is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "persistent": bool(self.path),
+        }
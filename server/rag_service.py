@@ -1,14 +1,94 @@
+import glob
 import os
-from typing import List, Dict, Any
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_groq import ChatGroq
-from groq import AsyncGroq
+import shutil
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import List, Dict, Any, Tuple, NamedTuple, Optional, AsyncIterator, Callable
+from collections import OrderedDict, deque
+import time
+import asyncio
+import hashlib
+import numpy as np
 from pathlib import Path
 import json
+from langchain_core.documents import Document
 from config import RAGConfig, MedicalPrompts
+from batching import QueryBatcher
+from semantic_cache import SemanticCache
+from query_embedding_cache import QueryEmbeddingCache
+from prefetch_cache import PrefetchCache
+from context_builder import ContextAssembler, TokenCounter
+from single_flight import SingleFlight, normalize_key_text
+from condition_store import ConditionPageStore
+from corpus_registry import CorpusRegistry, CorpusShard
+from emergency_triage import EmergencyMatcher, TriageResult
+from llm_gateway import LLMGateway
+from schemas import coerce_condition, coerce_symptom_analysis, normalize_urgency
+from streaming_json import StreamingJSONParser, parse_json
+from timing import record, stage
+from metrics import CACHE_LOOKUPS
+from conversation_store import ConversationState, ConversationStore, InMemoryConversationBackend, SQLiteConversationBackend
+
+# Heavy dependencies (sentence-transformers, FAISS, LangChain vector stores) are
+# imported inside the methods that need them so the server can start accepting
+# connections before the model and index are loaded.
+
+STARTUP_PHASES = ("pending", "loading_model", "loading_index", "building_index", "ready", "error")
+
+# Corpus name used when RAGConfig.CORPORA is not set
+DEFAULT_CORPUS = "default"
+
+try:
+    import fcntl
+except ImportError:  # Windows: shards are not locked across worker processes
+    fcntl = None
+
+# Endpoints whose retrieval can be prefetched while the user types
+PREFETCH_ENDPOINTS = ("analyze_symptoms", "chat")
+
+# Retrieval queries wrap the user's text in endpoint terms for the dense encoder.
+# BM25 sees only the user's text: the fixed terms appear in nearly every chunk.
+QUERY_TEMPLATES = {
+    "analyze_symptoms": "symptoms {} diagnosis treatment",
+    "medical_info": "{} symptoms causes treatment diagnosis",
+}
+
+
+@contextmanager
+def shard_lock(path: str):
+    """Exclusive lock on a shard directory across worker processes, held while it is checked, built and swapped"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".lock", "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print(f"Waiting for another worker to finish the vector store at {path}...")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def lexical_text(query: str) -> str:
+    """The user's text of a templated retrieval query"""
+    for template in QUERY_TEMPLATES.values():
+        prefix, suffix = template.split("{}")
+        if len(query) >= len(prefix) + len(suffix) and query.startswith(prefix) and query.endswith(suffix):
+            return query[len(prefix):len(query) - len(suffix)]
+    return query
+
+
+class RetrievalResult(NamedTuple):
+    vector: np.ndarray
+    documents: List[Tuple[Document, float]]
+    timings: Optional[Dict[str, float]] = None  # Seconds spent embedding, searching and ranking
+
 
 class RAGService:
     def __init__(self, groq_api_key: str, pdf_path: str = None):
@@ -16,112 +96,891 @@ class RAGService:
         self.config = RAGConfig()
         self.prompts = MedicalPrompts()
         
-        # Initialize embeddings
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=self.config.EMBEDDING_MODEL,
-            model_kwargs={'device': self.config.EMBEDDING_DEVICE}
-        )
+        # Loaded by initialize()
+        self.embeddings = None
+        self.embedding_backend = self.config.EMBEDDING_BACKEND
+        self.query_embedding_cache = None
+        self.reranker = None
         
-        self.vector_store = None
-        self.retriever = None
+        # Startup phase, see STARTUP_PHASES
+        self.status = "pending"
+        self.status_error = None
+        self.startup_timings: Dict[str, float] = {}
+        self._status_since = time.perf_counter()
         
-        # Initialize LLM clients
-        self.llm = ChatGroq(
-            groq_api_key=groq_api_key,
-            model_name=self.config.LLM_MODEL,
-            temperature=self.config.LLM_TEMPERATURE
+        # LLM client with per-endpoint concurrency, rate limiting and retries
+        self.llm = LLMGateway(
+            groq_api_key,
+            self.config.LLM_MODEL,
+            base_url=self.config.LLM_BASE_URL,
+            endpoint_concurrency=self.config.LLM_ENDPOINT_CONCURRENCY,
+            endpoint_deadlines=self.config.LLM_ENDPOINT_DEADLINE_SECONDS,
+            tokens_per_minute=self.config.LLM_TOKENS_PER_MINUTE,
+            max_retries=self.config.LLM_MAX_RETRIES,
+            backoff_base=self.config.LLM_BACKOFF_BASE_SECONDS,
+            backoff_max=self.config.LLM_BACKOFF_MAX_SECONDS,
+            max_connections=self.config.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=self.config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=self.config.LLM_KEEPALIVE_EXPIRY_SECONDS,
+            connect_timeout=self.config.LLM_CONNECT_TIMEOUT_SECONDS,
+            read_timeout=self.config.LLM_READ_TIMEOUT_SECONDS,
         )
-        self.async_client = AsyncGroq(api_key=groq_api_key)
         
         # Set paths
         self.pdf_path = pdf_path or self.config.PDF_PATH
+        self.pdf_paths = [self.pdf_path] + list(self.config.ADDITIONAL_PDF_PATHS)
         self.vector_store_path = self.config.VECTOR_STORE_PATH
         self.documents_cache_path = self.config.DOCUMENTS_CACHE_PATH
         
-        # Initialize RAG system
-        self._initialize_rag()
+        # Corpus shards, searched in parallel and routed per endpoint
+        self.corpus_definitions = self._configured_corpora()
+        self.corpora = CorpusRegistry(
+            routes=self.config.ENDPOINT_CORPORA,
+            merge=self.config.SHARD_MERGE,
+            workers=self.config.SHARD_SEARCH_WORKERS,
+            rrf_k=self.config.HYBRID_RRF_K,
+        )
+        self._corpus_lock = threading.Lock()
+        # (path, size, mtime) -> content hash of source PDFs already hashed
+        self._pdf_hashes: Dict[Tuple[str, int, int], str] = {}
+        
+        # Batched retrieval off the event loop
+        self.batcher = QueryBatcher(
+            self._search_batch,
+            max_batch_size=self.config.RETRIEVAL_BATCH_MAX_SIZE,
+            max_wait_ms=self.config.RETRIEVAL_BATCH_MAX_WAIT_MS,
+            max_workers=self.config.RETRIEVAL_WORKERS,
+        )
+        
+        # Semantic cache for LLM answers
+        self.response_cache = None
+        if self.config.SEMANTIC_CACHE_ENABLED:
+            self.response_cache = SemanticCache(
+                threshold=self.config.SEMANTIC_CACHE_THRESHOLD,
+                ttl_seconds=self.config.SEMANTIC_CACHE_TTL_SECONDS,
+                max_entries=self.config.SEMANTIC_CACHE_MAX_ENTRIES,
+                max_bytes=self.config.SEMANTIC_CACHE_MAX_BYTES,
+                path=self.config.SEMANTIC_CACHE_PATH,
+            )
+        
+        # Token-budgeted prompt context
+        self.context_assembler = ContextAssembler(TokenCounter(), max_overlap_chars=self.config.CHUNK_OVERLAP)
+        self.context_stats = {"requests": 0, "raw_tokens": 0, "context_tokens": 0}
+        
+        # Conversation memory for /chat
+        if self.config.CONVERSATION_BACKEND == "sqlite":
+            conversation_backend = SQLiteConversationBackend(
+                self.config.CONVERSATION_DB_PATH,
+                max_conversations=self.config.CONVERSATION_MAX_ACTIVE,
+                ttl_seconds=self.config.CONVERSATION_TTL_SECONDS,
+            )
+        else:
+            conversation_backend = InMemoryConversationBackend(
+                max_conversations=self.config.CONVERSATION_MAX_ACTIVE,
+                ttl_seconds=self.config.CONVERSATION_TTL_SECONDS,
+            )
+        self.conversations = ConversationStore(
+            conversation_backend,
+            self._summarize_conversation,
+            recent_turns=self.config.CONVERSATION_RECENT_TURNS,
+            max_turn_chars=self.config.CONVERSATION_MAX_TURN_CHARS,
+        )
+        self._background_tasks = set()
+        
+        # Emergency phrase matcher, run before any other work on a symptom analysis
+        self.emergency_matcher = EmergencyMatcher.from_lexicon(
+            self.config.EMERGENCY_LEXICON_PATH,
+            self.prompts.EMERGENCY_KEYWORDS,
+            min_fuzzy_length=self.config.EMERGENCY_MIN_FUZZY_LENGTH,
+            short_circuit_confidence=self.config.EMERGENCY_SHORT_CIRCUIT_CONFIDENCE,
+        )
+        # Full analyses finished in the background after an emergency answer
+        self.background_analyses: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        
+        # Identical concurrent requests share one retrieval and one completion
+        self.single_flight = SingleFlight()
+        
+        # Retrieval warmed from partial text while the user types (POST /prefetch)
+        self.prefetch_cache = None
+        if self.config.PREFETCH_ENABLED:
+            self.prefetch_cache = PrefetchCache(
+                ttl_seconds=self.config.PREFETCH_TTL_SECONDS,
+                max_entries=self.config.PREFETCH_MAX_ENTRIES,
+                min_similarity=self.config.PREFETCH_MIN_SIMILARITY,
+            )
+        
+        # Pre-generated condition pages (see precompute_conditions.py). Their version hashes
+        # the source PDFs, so it is set in initialize() rather than at import time.
+        self.condition_pages = ConditionPageStore(self.config.CONDITION_PAGES_PATH)
+        
+        # Time-to-first-token samples for streamed responses, per endpoint
+        self.ttft_samples = {endpoint: deque(maxlen=1000) for endpoint in ("analyze_symptoms", "chat", "medical_info")}
+        
+    @property
+    def is_ready(self) -> bool:
+        return self.status == "ready"
     
-    def _initialize_rag(self):
-        """Initialize or load the RAG system"""
+    def initialize(self):
+        """Load the embedding model and the vector store (blocking; run it off the event loop).
+        
+        Until this finishes, retrieval returns no context and the endpoints fall
+        back to context-free prompts.
+        """
         try:
-            # Try to load existing vector store
-            if os.path.exists(self.vector_store_path):
-                print("Loading existing vector store...")
-                self.vector_store = FAISS.load_local(
-                    self.vector_store_path, 
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
+            self._set_status("loading_model")
+            from embedding_backends import create_embeddings
+            self.embeddings, self.embedding_backend = create_embeddings(
+                self.config.EMBEDDING_BACKEND,
+                self.config.EMBEDDING_MODEL,
+                device=self.config.EMBEDDING_DEVICE,
+                threads=self.config.EMBEDDING_THREADS,
+                batch_size=self.config.EMBEDDING_BATCH_SIZE,
+                max_seq_length=self.config.EMBEDDING_MAX_SEQ_LENGTH,
+                onnx_dir=self.config.EMBEDDING_ONNX_PATH,
+            )
+            if self.config.QUERY_EMBEDDING_CACHE_ENABLED:
+                cache = QueryEmbeddingCache(
+                    capacity=self.config.QUERY_EMBEDDING_CACHE_SIZE,
+                    path=self.config.QUERY_EMBEDDING_CACHE_PATH,
+                    model_key=self._embedding_key(),
                 )
-                self.retriever = self.vector_store.as_retriever(
-                    search_kwargs={"k": self.config.RETRIEVAL_K}
+                loaded = cache.load()
+                if loaded:
+                    print(f"Loaded {loaded} cached query embeddings")
+                self.query_embedding_cache = cache
+            if self.config.RERANK_ENABLED:
+                from reranker import CrossEncoderReranker
+                reranker = CrossEncoderReranker(
+                    model_name=self.config.RERANK_MODEL,
+                    max_candidates=self.config.RERANK_CANDIDATES,
+                    min_candidates=self.config.RERANK_MIN_CANDIDATES,
+                    score_margin=self.config.RERANK_SCORE_MARGIN,
+                    latency_budget_ms=self.config.RERANK_LATENCY_BUDGET_MS,
+                    min_score=self.config.RERANK_MIN_SCORE,
+                    batch_size=self.config.RERANK_BATCH_SIZE,
+                    max_length=self.config.RERANK_MAX_LENGTH,
+                    cache_size=self.config.RERANK_CACHE_SIZE,
                 )
-                print("Vector store loaded successfully!")
+                reranker.load()
+                self.reranker = reranker
+            
+            self._initialize_rag()
+            self.condition_pages = ConditionPageStore(self.config.CONDITION_PAGES_PATH, self._condition_pages_version())
+            # Load the tokenizer now rather than on the first request
+            self.context_assembler.token_counter.count("warm up")
+            self._set_status("ready")
+        except Exception as e:
+            print(f"RAG initialization failed: {e}")
+            self.status_error = str(e)
+            self._set_status("error")
+    
+    def _set_status(self, status: str):
+        now = time.perf_counter()
+        if self.status in ("loading_model", "loading_index", "building_index"):
+            self.startup_timings[self.status] = now - self._status_since
+        self.status = status
+        self._status_since = now
+        print(f"RAG status: {status}")
+    
+    def get_index_type(self) -> Optional[str]:
+        """Index type of the loaded shards ("mixed" if they differ)"""
+        index_types = {shard.index_type() for shard in self.corpora.shards()}
+        if not index_types:
+            return None
+        return index_types.pop() if len(index_types) == 1 else "mixed"
+    
+    @property
+    def build_stats(self) -> Optional[Dict[str, Any]]:
+        """Build statistics of the shards built by this process, per corpus"""
+        stats = {shard.name: shard.build_stats for shard in self.corpora.shards() if shard.build_stats}
+        return stats or None
+    
+    def _configured_corpora(self) -> Dict[str, Dict[str, Any]]:
+        """Corpus name -> source PDFs and shard directory"""
+        if self.config.CORPORA is None:
+            # A single shard in the original store location, so existing stores stay valid
+            return {DEFAULT_CORPUS: {"pdf_paths": self.pdf_paths, "path": self.vector_store_path}}
+        return {
+            name: {"pdf_paths": list(pdf_paths), "path": os.path.join(self.config.CORPUS_SHARDS_PATH, name)}
+            for name, pdf_paths in self.config.CORPORA.items()
+        }
+    
+    def _initialize_rag(self):
+        """Load or build every configured corpus shard"""
+        for name, corpus in self.corpus_definitions.items():
+            self.corpora.swap(self._open_shard(name, corpus["pdf_paths"], corpus["path"]))
+    
+    def reload_corpus(self, name: str, pdf_paths: Optional[List[str]] = None, force: bool = False) -> CorpusShard:
+        """Rebuild a corpus if its inputs changed (or ``force``) and swap it in (blocking).
+        
+        The new shard is built beside the live one and replaces it atomically;
+        requests already searching finish on the shard they started with. An
+        unknown ``name`` with ``pdf_paths`` adds a new corpus.
+        """
+        corpus = self.corpus_definitions.get(name)
+        if corpus is None and not pdf_paths:
+            raise KeyError(f"Unknown corpus {name!r}")
+        path = corpus["path"] if corpus else os.path.join(self.config.CORPUS_SHARDS_PATH, name)
+        pdf_paths = list(pdf_paths or corpus["pdf_paths"])
+        
+        with self._corpus_lock:
+            if force:
+                with shard_lock(path):
+                    shard = self._build_shard(name, pdf_paths, path)
             else:
-                print("Creating new vector store...")
-                self._create_vector_store()
+                shard = self._open_shard(name, pdf_paths, path)
+            previous = self.corpora.swap(shard)
+            self.corpus_definitions[name] = {"pdf_paths": pdf_paths, "path": path}
+            self.condition_pages = ConditionPageStore(self.config.CONDITION_PAGES_PATH, self._condition_pages_version())
+        print(f"Corpus {name} now serving version {shard.version}"
+              + (f" (was {previous.version})" if previous else ""))
+        return shard
+    
+    def _open_shard(self, name: str, pdf_paths: List[str], path: str) -> CorpusShard:
+        """Load a shard whose stored settings are current, converting or building it otherwise.
+        
+        Runs under the shard's lock: of several workers starting without a
+        current store, one builds it and the others wait and then load it.
+        """
+        with shard_lock(path):
+            return self._open_shard_locked(name, pdf_paths, path)
+    
+    def _open_shard_locked(self, name: str, pdf_paths: List[str], path: str) -> CorpusShard:
+        settings = self._store_settings(pdf_paths)
+        try:
+            stored_settings = self._stored_settings(path)
+            if stored_settings == settings:
+                self._set_loading_status("loading_index")
+                print(f"Loading existing vector store for corpus {name}...")
+                shard = self._load_shard(name, pdf_paths, path)
+                print("Vector store loaded successfully!")
+                return shard
+            if stored_settings is None and self._is_unversioned_store(path):
+                self._set_loading_status("building_index")
+                print("Converting existing vector store...")
+                from langchain_community.vectorstores import FAISS
+                legacy = CorpusShard(name, pdf_paths, path, FAISS.load_local(
+                    path, 
+                    self.embeddings,
+                    allow_dangerous_deserialization=True
+                ))
+                self._save_shard(path, settings, *legacy.contents())
+                shard = self._load_shard(name, pdf_paths, path)
+                print("Vector store converted successfully!")
+                return shard
         except Exception as e:
-            print(f"Error initializing RAG: {e}")
-            print("Creating new vector store...")
-            self._create_vector_store()
+            print(f"Error loading vector store for corpus {name}: {e}")
+        
+        print(f"Creating new vector store for corpus {name}...")
+        return self._build_shard(name, pdf_paths, path)
     
-    def _create_vector_store(self):
-        """Create vector store from PDF documents"""
+    def _set_loading_status(self, status: str):
+        """Report startup progress; shard reloads while serving leave the status alone"""
+        if not self.is_ready:
+            self._set_status(status)
+    
+    def _condition_pages_version(self) -> str:
+        """Version of precomputed condition pages: changes with anything that shapes a page"""
+        inputs = [
+            self.prompts.PROMPT_VERSIONS["medical_info"],
+            self.config.LLM_MODEL,
+            self.config.MEDICAL_INFO_TEMPERATURE,
+            self.config.MEDICAL_INFO_MAX_TOKENS,
+            self.config.ENDPOINT_RETRIEVAL_K["medical_info"],
+            self.config.CONTEXT_TOKEN_BUDGETS["medical_info"],
+            self._corpus_settings("medical_info"),
+        ]
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    
+    def _corpus_settings(self, endpoint: str) -> Any:
+        """Store settings of the corpora an endpoint searches"""
+        routed = self.config.ENDPOINT_CORPORA.get(endpoint) or list(self.corpus_definitions)
+        corpora = {name: self.corpus_definitions[name] for name in routed if name in self.corpus_definitions}
+        if list(corpora) == [DEFAULT_CORPUS]:
+            return self._store_settings(corpora[DEFAULT_CORPUS]["pdf_paths"])
+        return {name: self._store_settings(corpus["pdf_paths"]) for name, corpus in sorted(corpora.items())}
+    
+    def _store_settings(self, pdf_paths: List[str]) -> Dict[str, Any]:
+        """Settings that require a rebuild of a shard when they change"""
+        return {
+            "pdf_paths": list(pdf_paths),
+            "pdf_hashes": [self._pdf_hash(pdf_path) for pdf_path in pdf_paths],
+            "embedding_model": self._embedding_key(),
+            "chunk_size": self.config.CHUNK_SIZE,
+            "chunk_overlap": self.config.CHUNK_OVERLAP,
+            "index": self._index_build_params(),
+            "format": self.config.VECTOR_STORE_FORMAT,
+        }
+    
+    def _pdf_hash(self, pdf_path: str) -> Optional[str]:
+        """Content hash of a source PDF, so an edited file changes the settings (None if it is missing)"""
+        from index_builder import file_hash
         try:
-            # Load documents
-            if not os.path.exists(self.pdf_path):
-                raise FileNotFoundError(f"PDF file not found at {self.pdf_path}")
-            
-            print("Loading PDF documents...")
-            loader = PyPDFLoader(self.pdf_path)
-            documents = loader.load()
-            
-            print(f"Loaded {len(documents)} pages from PDF")
-            
-            # Split documents into chunks
-            text_splitter = RecursiveCharacterTextSplitter(
+            stat = os.stat(pdf_path)
+        except OSError:
+            return None
+        key = (pdf_path, stat.st_size, stat.st_mtime_ns)
+        if key not in self._pdf_hashes:
+            self._pdf_hashes[key] = file_hash(pdf_path)
+        return self._pdf_hashes[key]
+    
+    def _embedding_key(self) -> str:
+        """Identifies the encoder that produced the stored vectors.
+        
+        Quantized and ONNX encoders give slightly different vectors, so each
+        backend gets its own index and chunk-cache entries; the torch backend
+        keeps the bare model name so existing stores stay valid.
+        """
+        if self.embedding_backend == "torch":
+            return self.config.EMBEDDING_MODEL
+        return f"{self.config.EMBEDDING_MODEL}#{self.embedding_backend}"
+    
+    def _index_build_params(self) -> Dict[str, Any]:
+        return {
+            "index_type": self.config.INDEX_TYPE,
+            "nlist": self.config.INDEX_NLIST,
+            "pq_m": self.config.INDEX_PQ_M,
+            "pq_nbits": self.config.INDEX_PQ_NBITS,
+            "hnsw_m": self.config.INDEX_HNSW_M,
+            "ef_construction": self.config.INDEX_HNSW_EF_CONSTRUCTION,
+            "training_size": self.config.INDEX_TRAINING_SIZE,
+        }
+    
+    def _configure_index_search(self, index):
+        from index_factory import configure_search
+        configure_search(
+            index,
+            nprobe=self.config.INDEX_NPROBE,
+            ef_search=self.config.INDEX_HNSW_EF_SEARCH,
+        )
+    
+    @staticmethod
+    def _stored_settings(path: str) -> Optional[Dict[str, Any]]:
+        settings_path = os.path.join(path, "settings.json")
+        if not os.path.exists(settings_path):
+            return None
+        with open(settings_path) as f:
+            return json.load(f)
+    
+    def _is_unversioned_store(self, path: str) -> bool:
+        """A store saved by FAISS.save_local before settings were recorded (flat, default chunking)"""
+        return self.config.INDEX_TYPE == "flat" and os.path.exists(os.path.join(path, "index.pkl"))
+    
+    def _load_shard(self, name: str, pdf_paths: List[str], path: str, build_stats: Dict[str, Any] = None) -> CorpusShard:
+        from langchain_community.vectorstores import FAISS
+        from mmap_store import load_mmap_store
+        
+        if self.config.VECTOR_STORE_FORMAT == "mmap":
+            vector_store = load_mmap_store(path, self.embeddings)
+        else:
+            vector_store = FAISS.load_local(
+                path, 
+                self.embeddings,
+                allow_dangerous_deserialization=True
+            )
+        self._configure_index_search(vector_store.index)
+        shard = CorpusShard(name, pdf_paths, path, vector_store, settings=self._stored_settings(path), build_stats=build_stats)
+        
+        if self.config.HYBRID_RETRIEVAL_ENABLED:
+            from lexical_index import BM25Index
+            if not BM25Index.exists(path):
+                print(f"Building BM25 index for existing vector store of corpus {name}...")
+                _, texts, _ = shard.contents()
+                BM25Index.build(texts, k1=self.config.BM25_K1, b=self.config.BM25_B).save(path)
+            shard.lexical_index = BM25Index.load(path)
+        return shard
+    
+    def _save_shard(self, path: str, settings: Dict[str, Any], index, texts: List[str], metadatas: List[Dict[str, Any]]):
+        """Write a shard beside ``path`` and then move it into place (call under ``shard_lock``)"""
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores import FAISS
+        from mmap_store import save_mmap_store
+        
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        if fcntl is not None:
+            # Holding the lock, so these are left over from a worker that died mid-build
+            for stale in glob.glob(path + ".staging-*"):
+                shutil.rmtree(stale, ignore_errors=True)
+        # Per-process directories, so unlocked workers (no fcntl) never write into each other's output
+        staging_path = tempfile.mkdtemp(dir=parent, prefix=os.path.basename(path) + ".staging-")
+        os.chmod(staging_path, 0o755)  # mkdtemp creates it private to this user
+        
+        if self.config.VECTOR_STORE_FORMAT == "mmap":
+            save_mmap_store(staging_path, index, texts, metadatas)
+        else:
+            docstore_ids = [str(i) for i in range(len(texts))]
+            FAISS(
+                embedding_function=self.embeddings,
+                index=index,
+                docstore=InMemoryDocstore({
+                    docstore_id: Document(page_content=text, metadata=metadata)
+                    for docstore_id, text, metadata in zip(docstore_ids, texts, metadatas)
+                }),
+                index_to_docstore_id=dict(enumerate(docstore_ids)),
+            ).save_local(staging_path)
+        
+        if self.config.HYBRID_RETRIEVAL_ENABLED:
+            from lexical_index import BM25Index
+            print("Building BM25 index...")
+            BM25Index.build(texts, k1=self.config.BM25_K1, b=self.config.BM25_B).save(staging_path)
+        
+        # Written last: a store without current settings is rebuilt on the next start
+        with open(os.path.join(staging_path, "settings.json"), "w") as f:
+            json.dump(settings, f, indent=2)
+        
+        # The shard being replaced may still be serving from its mapped files;
+        # unlinking them leaves its mappings valid until it is released
+        retired_path = staging_path + ".retired"
+        if os.path.exists(path):
+            os.rename(path, retired_path)
+        os.rename(staging_path, path)
+        shutil.rmtree(retired_path, ignore_errors=True)
+    
+    def _build_shard(self, name: str, pdf_paths: List[str], path: str) -> CorpusShard:
+        """Create a corpus shard from its PDF documents"""
+        from index_builder import VectorStoreBuilder
+        from index_factory import build_index
+        
+        self._set_loading_status("building_index")
+        try:
+            builder = VectorStoreBuilder(
+                self.embeddings,
+                embedding_model=self._embedding_key(),
+                cache_dir=self.documents_cache_path,
                 chunk_size=self.config.CHUNK_SIZE,
                 chunk_overlap=self.config.CHUNK_OVERLAP,
-                length_function=len,
+                workers=self.config.BUILD_WORKERS,
+                page_batch_size=self.config.BUILD_PAGE_BATCH_SIZE,
+                embed_batch_size=self.config.BUILD_EMBED_BATCH_SIZE,
             )
-            
-            print("Splitting documents into chunks...")
-            texts = text_splitter.split_documents(documents)
-            print(f"Created {len(texts)} text chunks")
+            try:
+                output = builder.build(pdf_paths)
+            finally:
+                builder.close()
             
             # Create vector store
-            print("Creating embeddings and vector store...")
-            self.vector_store = FAISS.from_documents(texts, self.embeddings)
+            print(f"Creating {self.config.INDEX_TYPE} vector index for corpus {name}...")
+            index = build_index(output.vectors, **self._index_build_params())
             
-            # Save vector store
-            self.vector_store.save_local(self.vector_store_path)
+            # Save vector store, then serve it from disk like any other worker
+            self._save_shard(path, self._store_settings(pdf_paths), index, output.texts, output.metadatas)
+            shard = self._load_shard(name, pdf_paths, path, build_stats=output.stats)
             print("Vector store created and saved successfully!")
-            
-            # Create retriever
-            self.retriever = self.vector_store.as_retriever(
-                search_kwargs={"k": self.config.RETRIEVAL_K}
-            )
+            return shard
             
         except Exception as e:
-            print(f"Error creating vector store: {e}")
+            print(f"Error creating vector store for corpus {name}: {e}")
             raise
     
     def get_relevant_context(self, query: str, k: int = 5) -> List[str]:
         """Retrieve relevant context for a query"""
-        if not self.retriever:
+        if not self.is_ready:
             return []
         
         try:
-            docs = self.retriever.get_relevant_documents(query)
-            return [doc.page_content for doc in docs[:k]]
+            result = self._search_batch([query], k)[0]
+            return [doc.page_content for doc, _ in result.documents]
         except Exception as e:
             print(f"Error retrieving context: {e}")
             return []
     
-    async def analyze_symptoms_with_rag(self, symptoms: str, age: int = None, gender: str = None, medical_history: str = None) -> Dict[str, Any]:
+    async def aget_relevant_context(self, query: str, k: int = 5) -> List[str]:
+        """Retrieve relevant context without blocking the event loop"""
+        result = await self._aretrieve(query, k)
+        if result is None:
+            return []
+        return [doc.page_content for doc, _ in result.documents]
+    
+    async def retrieve(
+        self, query: str, endpoint: str, session_id: Optional[str] = None, text: Optional[str] = None
+    ) -> Optional[RetrievalResult]:
+        """Retrieve scored documents for an endpoint.
+        
+        Fetches only as many documents as the endpoint uses, from the corpora it
+        is routed to, and keeps those that clear the score thresholds; the
+        result may hold no documents, in which case the prompt is built
+        without reference context. With a ``session_id``, a retrieval
+        prefetched for that session is reused when the submitted ``text``
+        (what the user typed) is close enough to the prefetched text; if it
+        is not identical, the query is embedded again for the result's vector.
+        """
+        if session_id and self.prefetch_cache is not None:
+            prefetched, exact = await self.prefetch_cache.take(session_id, endpoint, text or query, query)
+            CACHE_LOOKUPS.inc(cache="prefetch", endpoint=endpoint, result="miss" if prefetched is None else "hit")
+            if prefetched is not None and exact:
+                return prefetched
+            if prefetched is not None:
+                # The vector keys the semantic cache, so it must be the submitted query's, not the partial text's
+                try:
+                    loop = asyncio.get_running_loop()
+                    vectors = await loop.run_in_executor(self.batcher.executor, self._embed_queries, [query])
+                    return prefetched._replace(vector=vectors[0])
+                except Exception as e:
+                    print(f"Error embedding prefetched query: {e}")
+        return await self._aretrieve(query, self.config.ENDPOINT_RETRIEVAL_K[endpoint], endpoint)
+    
+    def prefetch(self, session_id: str, endpoint: str, text: str, conversation_id: Optional[str] = None) -> bool:
+        """Start retrieving for text the user is still typing; False if nothing was scheduled"""
+        if self.prefetch_cache is None or not self.is_ready or len(text.strip()) < self.config.PREFETCH_MIN_CHARS:
+            return False
+        if endpoint == "chat":
+            query = self.conversations.retrieval_query(self.conversations.get(conversation_id), text)
+        else:
+            query = self.symptom_query(text)
+        return self.prefetch_cache.schedule(session_id, endpoint, text, query, lambda: self.retrieve(query, endpoint))
+    
+    async def _aretrieve(self, query: str, k: int, endpoint: str = None) -> Optional[RetrievalResult]:
+        """Retrieve documents and the query embedding through the batched executor"""
+        if not self.is_ready:
+            return None
+        
+        try:
+            with stage("retrieval"):
+                result = await self.batcher.submit(query, k, endpoint)
+            for name, seconds in (result.timings or {}).items():
+                record(name, seconds)
+            return RetrievalResult(result.vector, result.documents[:k])
+        except Exception as e:
+            print(f"Error retrieving context: {e}")
+            return None
+    
+    async def retrieve_batch(self, queries: List[str], endpoint: str) -> List[Optional[RetrievalResult]]:
+        """Retrieve for many queries with one embedding pass and one search per shard"""
+        if not self.is_ready or not queries:
+            return [None] * len(queries)
+        
+        k = self.config.ENDPOINT_RETRIEVAL_K[endpoint]
+        try:
+            loop = asyncio.get_running_loop()
+            with stage("retrieval"):
+                results = await loop.run_in_executor(
+                    self.batcher.executor, self._search_batch, queries, k, [endpoint] * len(queries)
+                )
+            # Embedding, search and reranking are shared by the batch; ranking is per query
+            record("embedding", results[0].timings["embedding"])
+            record("search", results[0].timings["search"])
+            record("rank", sum(result.timings["rank"] for result in results))
+            if "rerank" in results[0].timings:
+                record("rerank", results[0].timings["rerank"])
+            return [RetrievalResult(result.vector, result.documents[:k]) for result in results]
+        except Exception as e:
+            print(f"Error retrieving batch context: {e}")
+            return [None] * len(queries)
+    
+    def _search_batch(self, queries: List[str], k: int, routes: List[Optional[str]] = None) -> List[RetrievalResult]:
+        """Embed a batch of queries once and search their shards in parallel (runs in a worker thread).
+        
+        ``routes`` gives the endpoint each query is retrieved for, which picks
+        the corpora it searches; None searches every shard.
+        """
+        start = time.perf_counter()
+        vectors = self._embed_queries(queries)
+        embedded = time.perf_counter()
+        reranker = self.reranker
+        # With reranking, a wider candidate set is ranked here and cut to k by the cross-encoder
+        candidate_k = max(k, reranker.max_candidates) if reranker is not None else k
+        
+        shard_timings: Dict[str, Tuple[float, Dict[int, float]]] = {}
+        
+        def search_shard(shard: CorpusShard, positions: List[int]) -> List[List[Tuple[Document, float]]]:
+            rankings, search_seconds, rank_seconds = self._search_shard(
+                shard, [queries[i] for i in positions], vectors[positions], candidate_k
+            )
+            shard_timings[shard.name] = (search_seconds, dict(zip(positions, rank_seconds)))
+            return rankings
+        
+        candidates = self.corpora.search(routes or [None] * len(queries), search_shard, candidate_k)
+        # Shards are searched concurrently: search time is the slowest shard's,
+        # ranking time is each query's ranking summed over its shards
+        search_seconds = max((seconds for seconds, _ in shard_timings.values()), default=0.0)
+        rank_seconds = [
+            sum(ranks.get(i, 0.0) for _, ranks in shard_timings.values()) for i in range(len(queries))
+        ]
+        
+        timings = {"embedding": embedded - start, "search": search_seconds}
+        if reranker is not None:
+            rerank_start = time.perf_counter()
+            candidates = reranker.rerank_batch(queries, candidates, k)
+            timings["rerank"] = time.perf_counter() - rerank_start
+        
+        return [
+            RetrievalResult(vector, docs_and_scores, {**timings, "rank": seconds})
+            for vector, docs_and_scores, seconds in zip(vectors, candidates, rank_seconds)
+        ]
+    
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Query embeddings, through the query embedding cache when it is enabled (blocking)"""
+        if self.query_embedding_cache is not None:
+            return self.query_embedding_cache.embed(queries, self.embeddings.embed_documents)
+        return np.asarray(self.embeddings.embed_documents(queries), dtype=np.float32)
+    
+    def _search_shard(self, shard: CorpusShard, queries: List[str], vectors: np.ndarray, k: int):
+        """Ranked candidates of each query within one shard, plus search and per-query ranking seconds"""
+        start = time.perf_counter()
+        lexical_index = shard.lexical_index
+        fetch_k = max(k, self.config.HYBRID_CANDIDATES) if lexical_index is not None else k
+        distances, indices = shard.vector_store.index.search(vectors, fetch_k)
+        search_seconds = time.perf_counter() - start
+        
+        rankings, rank_seconds = [], []
+        for query, row_distances, row_indices in zip(queries, distances, indices):
+            rank_start = time.perf_counter()
+            # MiniLM embeddings are unit length, so squared L2 maps directly to cosine
+            dense = [
+                (int(i), score) for i, score in zip(row_indices, 1.0 - row_distances / 2.0)
+                if i != -1 and score >= self.config.RETRIEVAL_SCORE_THRESHOLD
+            ]
+            if lexical_index is not None:
+                lexical = lexical_index.search(lexical_text(query), fetch_k)
+                # An absolute floor drops weak matches when nothing matches well; the relative
+                # one drops documents far behind the best match once something does
+                floor = max(
+                    self.config.LEXICAL_SCORE_THRESHOLD,
+                    lexical[0][1] * self.config.LEXICAL_RELATIVE_THRESHOLD if lexical else 0.0,
+                )
+                lexical = [(position, score) for position, score in lexical if score >= floor]
+                ranked = self._fuse_rankings(dense, lexical)[:k]
+            else:
+                ranked = dense[:k]
+            
+            rankings.append([(shard.document(position), float(score)) for position, score in ranked])
+            rank_seconds.append(time.perf_counter() - rank_start)
+        return rankings, search_seconds, rank_seconds
+    
+    def _fuse_rankings(self, dense: List[Tuple[int, float]], lexical: List[Tuple[int, float]]) -> List[Tuple[int, float]]:
+        """Weighted reciprocal rank fusion of thresholded dense and BM25 rankings.
+        
+        Cosine and BM25 scores are on different scales, so neither is kept:
+        each result's score is its fused score divided by the best possible
+        one (first in both rankings), in (0, 1].
+        """
+        rrf_k = self.config.HYBRID_RRF_K
+        weights = ((self.config.HYBRID_DENSE_WEIGHT, dense), (self.config.HYBRID_LEXICAL_WEIGHT, lexical))
+        best = sum(weight for weight, _ in weights) / (rrf_k + 1)
+        fused: Dict[int, float] = {}
+        for weight, ranking in weights:
+            for rank, (position, _) in enumerate(ranking):
+                fused[position] = fused.get(position, 0.0) + weight / (rrf_k + rank + 1)
+        
+        order = sorted(fused, key=fused.get, reverse=True)
+        return [(position, fused[position] / best) for position in order]
+    
+    def _cache_lookup(
+        self, endpoint: str, retrieval: Optional[RetrievalResult], params: Dict[str, Any] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Look up a cached answer whose query vector is close enough to this retrieval's"""
+        if self.response_cache is None or retrieval is None:
+            return None
+        cached = self.response_cache.lookup(self._cache_namespace(endpoint, params), retrieval.vector)
+        CACHE_LOOKUPS.inc(cache="semantic", endpoint=endpoint, result="miss" if cached is None else "hit")
+        return cached
+    
+    def _cache_store(
+        self, endpoint: str, retrieval: Optional[RetrievalResult], response: Dict[str, Any], params: Dict[str, Any] = None
+    ):
+        """Store an LLM answer in the semantic cache"""
+        if self.response_cache is None or retrieval is None:
+            return
+        self.response_cache.store(self._cache_namespace(endpoint, params), retrieval.vector, response)
+    
+    def _cache_namespace(self, endpoint: str, params: Dict[str, Any] = None) -> str:
+        version = self.prompts.PROMPT_VERSIONS[endpoint]
+        # Only what changes the answer for a given query goes in the namespace; whether two
+        # queries are the same question is left to the vector threshold. Swapping in a new
+        # corpus version starts a fresh namespace.
+        key = json.dumps(params or {}, sort_keys=True)
+        return f"{endpoint}:v{version}:c{self.corpora.version(endpoint)}:{key}"
+    
+    async def analyze_symptoms_with_rag(
+        self, symptoms: str, age: int = None, gender: str = None, medical_history: str = None, session_id: str = None
+    ) -> Dict[str, Any]:
         """Analyze symptoms using RAG-enhanced prompts"""
+        with stage("triage"):
+            triage = self.emergency_matcher.match(symptoms)
+        if triage.short_circuit and self.config.EMERGENCY_SHORT_CIRCUIT:
+            return self._emergency_response(triage, symptoms, age, gender, medical_history)
+        
+        key = json.dumps(["analyze_symptoms", normalize_key_text(symptoms), age, normalize_key_text(gender), normalize_key_text(medical_history)])
+        return await self.single_flight.do(
+            key, lambda: self._analyze_symptoms_with_rag(symptoms, age, gender, medical_history, triage, session_id)
+        )
+    
+    async def _analyze_symptoms_with_rag(
+        self,
+        symptoms: str,
+        age: int = None,
+        gender: str = None,
+        medical_history: str = None,
+        triage: TriageResult = None,
+        session_id: str = None,
+    ) -> Dict[str, Any]:
         # Get relevant medical context
-        context_docs = self.get_relevant_context(f"symptoms {symptoms} diagnosis treatment")
-        context_text = "\n\n".join(context_docs[:3])  # Use top 3 most relevant documents
+        retrieval = await self.retrieve(self.symptom_query(symptoms), "analyze_symptoms", session_id, symptoms)
+        
+        try:
+            return await self.complete_symptom_analysis(symptoms, age, gender, medical_history, retrieval, triage=triage)
+        except ValueError:
+            return self._get_fallback_response("Analysis completed but formatting issue occurred")
+        except Exception as e:
+            print(f"Error in symptom analysis: {e}")
+            return self._get_fallback_response("Analysis unavailable due to technical issue")
+    
+    @staticmethod
+    def symptom_query(symptoms: str) -> str:
+        """Retrieval query for a symptom analysis"""
+        return QUERY_TEMPLATES["analyze_symptoms"].format(symptoms)
+    
+    @staticmethod
+    def condition_query(condition: str) -> str:
+        """Retrieval query for condition information"""
+        return QUERY_TEMPLATES["medical_info"].format(condition)
+    
+    async def complete_symptom_analysis(
+        self,
+        symptoms: str,
+        age: int = None,
+        gender: str = None,
+        medical_history: str = None,
+        retrieval: Optional[RetrievalResult] = None,
+        llm_endpoint: str = "analyze_symptoms",
+        triage: Optional[TriageResult] = None,
+    ) -> Dict[str, Any]:
+        """Analyze symptoms given an existing retrieval result.
+        
+        Raises on LLM errors and on answers that cannot be repaired into a JSON
+        object (ValueError), so callers decide how to report a failed analysis.
+        """
+        documents, prompt, cache_params = self._symptom_analysis_request(symptoms, age, gender, medical_history, retrieval, triage)
+        cached = self._cache_lookup("analyze_symptoms", retrieval, cache_params)
+        if cached is not None:
+            return cached
+        
+        response = await self.llm.complete(
+            llm_endpoint,
+            [
+                {"role": "system", "content": self.prompts.SYMPTOM_ANALYSIS_SYSTEM},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=self.config.LLM_MAX_TOKENS,
+            temperature=self.config.LLM_TEMPERATURE
+        )
+        
+        choice = response.choices[0]
+        with stage("json_parse"):
+            parsed, repaired = parse_json(choice.message.content)
+            result = coerce_symptom_analysis(parsed)
+        result = self._finish_symptom_analysis(result, cache_params["emergency"], documents)
+        # A repaired answer (cut off by the token limit or malformed) is served once but not cached
+        if choice.finish_reason == "stop" and not repaired:
+            self._cache_store("analyze_symptoms", retrieval, result, cache_params)
+        return result
+    
+    async def stream_symptom_analysis(
+        self, symptoms: str, age: int = None, gender: str = None, medical_history: str = None, session_id: str = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Stream a symptom analysis as (event, data) pairs.
+        
+        Sends sources first, then each top-level field ("field") and each
+        possible condition ("condition") as soon as the model has generated
+        it, then "done" with the full validated result. The prompt asks for
+        urgency_level first, so it arrives within the first few tokens.
+        Output cut short by the token limit or a dropped stream is repaired
+        rather than discarded.
+        """
+        start = time.perf_counter()
+        with stage("triage"):
+            triage = self.emergency_matcher.match(symptoms)
+        if triage.short_circuit and self.config.EMERGENCY_SHORT_CIRCUIT:
+            result = self._emergency_response(triage, symptoms, age, gender, medical_history)
+            yield "sources", {"sources": [], "sources_used": False}
+            yield "field", {"name": "urgency_level", "value": result["urgency_level"]}
+            yield "done", {"result": result, "cached": False, "ttft_ms": None, "total_ms": (time.perf_counter() - start) * 1000}
+            return
+        
+        retrieval = await self.retrieve(self.symptom_query(symptoms), "analyze_symptoms", session_id, symptoms)
+        documents, prompt, cache_params = self._symptom_analysis_request(symptoms, age, gender, medical_history, retrieval, triage)
+        emergency_detected = cache_params["emergency"]
+        yield "sources", {"sources": self._source_metadata(documents), "sources_used": len(documents) > 0}
+        
+        cached = self._cache_lookup("analyze_symptoms", retrieval, cache_params)
+        if cached is not None:
+            yield "field", {"name": "urgency_level", "value": cached["urgency_level"]}
+            yield "done", {"result": cached, "cached": True, "ttft_ms": None, "total_ms": (time.perf_counter() - start) * 1000}
+            return
+        
+        parser = StreamingJSONParser(stream_arrays=("possible_conditions",))
+        conditions = 0
+        truncated = False
+        ttft_ms = None
+        llm_start = first_token_at = time.perf_counter()
+        try:
+            stream = self.llm.stream(
+                "analyze_symptoms",
+                [
+                    {"role": "system", "content": self.prompts.SYMPTOM_ANALYSIS_SYSTEM},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=self.config.LLM_MAX_TOKENS,
+                temperature=self.config.LLM_TEMPERATURE
+            )
+            async for text in stream:
+                if ttft_ms is None:
+                    first_token_at = time.perf_counter()
+                    ttft_ms = (first_token_at - start) * 1000
+                    self.ttft_samples["analyze_symptoms"].append(ttft_ms)
+                    record("llm_ttft", first_token_at - llm_start)
+                for kind, key, value in parser.feed(text):
+                    if kind == "item":
+                        condition = coerce_condition(value)
+                        if condition is not None:
+                            yield "condition", {"index": conditions, "condition": condition}
+                            conditions += 1
+                    else:
+                        if key == "urgency_level":
+                            value = self._escalate_urgency(normalize_urgency(value), emergency_detected)
+                        yield "field", {"name": key, "value": value}
+        except Exception as e:
+            print(f"Error streaming analyze_symptoms: {e}")
+            if ttft_ms is None:
+                yield "error", {"detail": f"Streaming failed: {str(e)}"}
+                return
+            # Keep what was generated; the repair below closes the truncated answer
+            truncated = True
+        
+        if ttft_ms is not None:
+            record("llm_generation", time.perf_counter() - first_token_at)
+        try:
+            with stage("json_parse"):
+                result = coerce_symptom_analysis(parser.close())
+        except ValueError as e:
+            print(f"Unrepairable symptom analysis output: {e}")
+            yield "error", {"detail": "Analysis completed but formatting issue occurred"}
+            return
+        
+        result = self._finish_symptom_analysis(result, emergency_detected, documents)
+        if not truncated and not parser.repaired:
+            self._cache_store("analyze_symptoms", retrieval, result, cache_params)
+        yield "done", {
+            "result": result,
+            "cached": False,
+            "truncated": truncated,
+            "ttft_ms": ttft_ms,
+            "total_ms": (time.perf_counter() - start) * 1000,
+        }
+    
+    def _symptom_analysis_request(
+        self,
+        symptoms: str,
+        age: Optional[int],
+        gender: Optional[str],
+        medical_history: Optional[str],
+        retrieval: Optional[RetrievalResult],
+        triage: Optional[TriageResult],
+    ) -> Tuple[List[Tuple[Document, float]], str, Dict[str, Any]]:
+        """Documents, prompt and cache parameters of a symptom analysis"""
+        documents = retrieval.documents if retrieval else []
+        context_text = self._build_context("analyze_symptoms", documents)
         
         # Build patient context
         patient_context = []
@@ -134,60 +993,139 @@ class RAGService:
         
         patient_context_str = ", ".join(patient_context) if patient_context else "No additional context"
         
-        # Check for emergency keywords
-        emergency_detected = any(keyword in symptoms.lower() for keyword in self.prompts.EMERGENCY_KEYWORDS)
+        # Check for emergency phrases (unless the caller already did)
+        if triage is None:
+            triage = self.emergency_matcher.match(symptoms)
         
+        cache_params = {"patient_context": patient_context_str, "emergency": triage.emergency}
         prompt = self.prompts.get_symptom_analysis_prompt(context_text, patient_context_str, symptoms)
-
-        try:
-            response = await self.async_client.chat.completions.create(
-                model=self.config.LLM_MODEL,
-                messages=[
-                    {"role": "system", "content": self.prompts.SYMPTOM_ANALYSIS_SYSTEM},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=self.config.LLM_MAX_TOKENS,
-                temperature=self.config.LLM_TEMPERATURE
+        return documents, prompt, cache_params
+    
+    @staticmethod
+    def _escalate_urgency(urgency: str, emergency_detected: bool) -> str:
+        if emergency_detected and urgency != "emergency":
+            return "high"
+        return urgency
+    
+    def _finish_symptom_analysis(
+        self, result: Dict[str, Any], emergency_detected: bool, documents: List[Tuple[Document, float]]
+    ) -> Dict[str, Any]:
+        """Add the emergency flag and sources to a validated analysis"""
+        if emergency_detected:
+            result["emergency_detected"] = True
+            result["urgency_level"] = self._escalate_urgency(result["urgency_level"], True)
+        result["sources"] = self._source_metadata(documents)
+        return result
+    
+    def _emergency_response(
+        self, triage: TriageResult, symptoms: str, age: int = None, gender: str = None, medical_history: str = None
+    ) -> Dict[str, Any]:
+        """Immediate answer for a confident emergency match, without retrieval or the LLM.
+        
+        With EMERGENCY_BACKGROUND_ANALYSIS the full analysis still runs in the
+        background; its id is returned for /analyze-symptoms/result/{id}.
+        """
+        critical = [
+            match for match in triage.positive
+            if match.severity == "critical" and match.confidence >= self.emergency_matcher.short_circuit_confidence
+        ]
+        concepts: Dict[str, List[str]] = {}
+        for match in critical:
+            concepts.setdefault(match.concept, []).append(match.text)
+        labels = [self.emergency_matcher.concepts[concept]["label"] for concept in concepts]
+        
+        result = {
+            "analysis_summary": f"Your symptoms may indicate a medical emergency ({', '.join(labels).lower()}). Seek emergency care now.",
+            "possible_conditions": [
+                {
+                    "name": self.emergency_matcher.concepts[concept]["label"],
+                    "probability": "Unknown",
+                    "description": self.emergency_matcher.concepts[concept].get("advice", "This symptom needs urgent medical assessment."),
+                    "common_symptoms": list(dict.fromkeys(texts)),
+                    "reference_match": "Emergency symptom screening",
+                }
+                for concept, texts in concepts.items()
+            ],
+            "treatment_recommendations": [{
+                "type": "Emergency",
+                "description": "Call your local emergency number or go to the nearest emergency department now. Do not wait for an online analysis.",
+                "urgency": "emergency",
+                "source": "Emergency symptom screening",
+            }],
+            "urgency_level": "emergency",
+            "medical_evidence": "Emergency symptoms were detected before any analysis was run.",
+            "disclaimer": self.prompts.DISCLAIMER,
+            "follow_up_questions": [],
+            "emergency_detected": True,
+            "emergency_triage": {
+                "confidence": triage.confidence,
+                "matches": [match._asdict() for match in triage.positive],
+            },
+            "sources": [],
+        }
+        
+        if self.config.EMERGENCY_BACKGROUND_ANALYSIS:
+            analysis_id = uuid.uuid4().hex
+            self._put_background_analysis(analysis_id, {"status": "pending"})
+            task = asyncio.create_task(
+                self._run_background_analysis(analysis_id, symptoms, age, gender, medical_history, triage)
             )
-            
-            content = response.choices[0].message.content.strip()
-            # Clean up response
-            if content.startswith("```json"):
-                content = content[7:]
-            if content.startswith("```"):
-                content = content[3:]
-            if content.endswith("```"):
-                content = content[:-3]
-            
-            content = content.strip()
-            
-            try:
-                result = json.loads(content)
-                # Add emergency flag if detected
-                if emergency_detected:
-                    result["emergency_detected"] = True
-                    if result.get("urgency_level") != "emergency":
-                        result["urgency_level"] = "high"  # Escalate urgency
-                return result
-            except json.JSONDecodeError:
-                return self._get_fallback_response("Analysis completed but formatting issue occurred")
-                
-        except Exception as e:
-            print(f"Error in symptom analysis: {e}")
-            return self._get_fallback_response("Analysis unavailable due to technical issue")
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+            result["analysis_id"] = analysis_id
+            result["analysis_status"] = "pending"
+        return result
     
-    async def chat_with_rag(self, message: str, conversation_id: str = None) -> Dict[str, Any]:
+    async def _run_background_analysis(
+        self, analysis_id: str, symptoms: str, age: int, gender: str, medical_history: str, triage: TriageResult
+    ):
+        result = await self._analyze_symptoms_with_rag(symptoms, age, gender, medical_history, triage)
+        self._put_background_analysis(analysis_id, {"status": "complete", "result": result})
+    
+    def _put_background_analysis(self, analysis_id: str, entry: Dict[str, Any]):
+        self.background_analyses[analysis_id] = {**entry, "updated_at": time.time()}
+        self.background_analyses.move_to_end(analysis_id)
+        cutoff = time.time() - self.config.EMERGENCY_RESULT_TTL_SECONDS
+        while self.background_analyses and (
+            len(self.background_analyses) > self.config.EMERGENCY_RESULT_MAX_ENTRIES
+            or next(iter(self.background_analyses.values()))["updated_at"] < cutoff
+        ):
+            self.background_analyses.popitem(last=False)
+    
+    def get_background_analysis(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        """Status (and, once complete, result) of a background analysis"""
+        entry = self.background_analyses.get(analysis_id)
+        if entry is None or entry["updated_at"] < time.time() - self.config.EMERGENCY_RESULT_TTL_SECONDS:
+            return None
+        return entry
+    
+    async def chat_with_rag(self, message: str, conversation_id: str = None, session_id: str = None) -> Dict[str, Any]:
         """Chat with RAG-enhanced responses"""
+        key = json.dumps(["chat", conversation_id, normalize_key_text(message)])
+        return await self.single_flight.do(key, lambda: self._chat_with_rag(message, conversation_id, session_id))
+    
+    async def _chat_with_rag(self, message: str, conversation_id: str = None, session_id: str = None) -> Dict[str, Any]:
+        conversation = self.conversations.get(conversation_id)
+        history_text = self.conversations.format_history(conversation)
+        
         # Get relevant medical context
-        context_docs = self.get_relevant_context(message)
-        context_text = "\n\n".join(context_docs[:2])  # Use top 2 most relevant documents
+        retrieval = await self.retrieve(self.conversations.retrieval_query(conversation, message), "chat", session_id, message)
+        documents = retrieval.documents if retrieval else []
+        context_text = self._build_context("chat", documents)
+        
+        # Answers that depend on earlier turns are not reusable across conversations
+        cache_retrieval = None if history_text else retrieval
+        cached = self._cache_lookup("chat", cache_retrieval)
+        if cached is not None:
+            self._record_turn(conversation_id, message, cached["response"])
+            return {**cached, "conversation_id": conversation_id}
         
-        prompt = self.prompts.get_chat_prompt(context_text, message)
+        prompt = self.prompts.get_chat_prompt(context_text, message, history_text)
 
         try:
-            response = await self.async_client.chat.completions.create(
-                model=self.config.LLM_MODEL,
-                messages=[
+            response = await self.llm.complete(
+                "chat",
+                [
                     {"role": "system", "content": self.prompts.CHAT_SYSTEM},
                     {"role": "user", "content": prompt}
                 ],
@@ -195,11 +1133,15 @@ class RAGService:
                 temperature=self.config.CHAT_TEMPERATURE
             )
             
-            return {
+            # Cached without the conversation id, which belongs to the request
+            answer = {
                 "response": response.choices[0].message.content.strip(),
-                "conversation_id": conversation_id,
-                "sources_used": len(context_docs) > 0
+                "sources_used": len(documents) > 0,
+                "sources": self._source_metadata(documents)
             }
+            self._cache_store("chat", cache_retrieval, answer)
+            self._record_turn(conversation_id, message, answer["response"])
+            return {**answer, "conversation_id": conversation_id}
             
         except Exception as e:
             print(f"Error in chat: {e}")
@@ -207,16 +1149,25 @@ class RAGService:
     
     async def get_condition_info_with_rag(self, condition: str) -> Dict[str, Any]:
         """Get condition information enhanced with RAG"""
+        key = json.dumps(["medical_info", normalize_key_text(condition)])
+        return await self.single_flight.do(key, lambda: self._get_condition_info_with_rag(condition))
+    
+    async def _get_condition_info_with_rag(self, condition: str) -> Dict[str, Any]:
         # Get relevant medical context
-        context_docs = self.get_relevant_context(f"{condition} symptoms causes treatment diagnosis")
-        context_text = "\n\n".join(context_docs[:3])  # Use top 3 most relevant documents
+        retrieval = await self.retrieve(self.condition_query(condition), "medical_info")
+        documents = retrieval.documents if retrieval else []
+        context_text = self._build_context("medical_info", documents)
+        
+        cached = self._cache_lookup("medical_info", retrieval)
+        if cached is not None:
+            return cached
         
         prompt = self.prompts.get_medical_info_prompt(context_text, condition)
         
         try:
-            response = await self.async_client.chat.completions.create(
-                model=self.config.LLM_MODEL,
-                messages=[
+            response = await self.llm.complete(
+                "medical_info",
+                [
                     {"role": "system", "content": self.prompts.MEDICAL_INFO_SYSTEM},
                     {"role": "user", "content": prompt}
                 ],
@@ -224,17 +1175,189 @@ class RAGService:
                 temperature=self.config.MEDICAL_INFO_TEMPERATURE
             )
             
-            return {
+            result = {
                 "condition": condition,
                 "information": response.choices[0].message.content.strip(),
-                "sources_used": len(context_docs) > 0,
-                "reference_count": len(context_docs)
+                "sources_used": len(documents) > 0,
+                "reference_count": len(documents),
+                "sources": self._source_metadata(documents)
             }
+            self._cache_store("medical_info", retrieval, result)
+            return result
             
         except Exception as e:
             print(f"Error getting condition info: {e}")
             raise Exception(f"Information retrieval failed: {str(e)}")
     
+    async def stream_chat_with_rag(
+        self, message: str, conversation_id: str = None, session_id: str = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Stream a chat answer as (event, data) pairs: sources, tokens, then done"""
+        start = time.perf_counter()
+        conversation = self.conversations.get(conversation_id)
+        history_text = self.conversations.format_history(conversation)
+        retrieval = await self.retrieve(self.conversations.retrieval_query(conversation, message), "chat", session_id, message)
+        documents = retrieval.documents if retrieval else []
+        context_text = self._build_context("chat", documents)
+        prompt = self.prompts.get_chat_prompt(context_text, message, history_text)
+        
+        def build_result(text: str) -> Dict[str, Any]:
+            return {
+                "response": text,
+                "sources_used": len(documents) > 0,
+                "sources": self._source_metadata(documents)
+            }
+        
+        parts = []
+        async for event in self._stream_completion(
+            "chat", start, None if history_text else retrieval, documents, self.prompts.CHAT_SYSTEM, prompt,
+            self.config.CHAT_MAX_TOKENS, self.config.CHAT_TEMPERATURE, "response", build_result
+        ):
+            name, data = event
+            if name == "token":
+                parts.append(data["text"])
+            elif name == "done":
+                self._record_turn(conversation_id, message, "".join(parts).strip())
+            yield event
+    
+    async def stream_condition_info_with_rag(self, condition: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Stream condition information as (event, data) pairs: sources, tokens, then done"""
+        start = time.perf_counter()
+        retrieval = await self.retrieve(self.condition_query(condition), "medical_info")
+        documents = retrieval.documents if retrieval else []
+        context_text = self._build_context("medical_info", documents)
+        prompt = self.prompts.get_medical_info_prompt(context_text, condition)
+        
+        def build_result(text: str) -> Dict[str, Any]:
+            return {
+                "condition": condition,
+                "information": text,
+                "sources_used": len(documents) > 0,
+                "reference_count": len(documents),
+                "sources": self._source_metadata(documents)
+            }
+        
+        async for event in self._stream_completion(
+            "medical_info", start, retrieval, documents, self.prompts.MEDICAL_INFO_SYSTEM, prompt,
+            self.config.MEDICAL_INFO_MAX_TOKENS, self.config.MEDICAL_INFO_TEMPERATURE, "information", build_result
+        ):
+            yield event
+    
+    async def _stream_completion(
+        self,
+        endpoint: str,
+        start: float,
+        retrieval: Optional[RetrievalResult],
+        documents: List[Tuple[Document, float]],
+        system_prompt: str,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        text_key: str,
+        build_result: Callable[[str], Dict[str, Any]],
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Stream an LLM completion, sending source metadata first and timing the first token"""
+        yield "sources", {"sources": self._source_metadata(documents), "sources_used": len(documents) > 0}
+        
+        cached = self._cache_lookup(endpoint, retrieval)
+        if cached is not None:
+            yield "token", {"text": cached[text_key]}
+            yield "done", {"cached": True, "ttft_ms": None, "total_ms": (time.perf_counter() - start) * 1000}
+            return
+        
+        parts = []
+        ttft_ms = None
+        llm_start = first_token_at = time.perf_counter()
+        try:
+            stream = self.llm.stream(
+                endpoint,
+                [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+            async for text in stream:
+                if ttft_ms is None:
+                    first_token_at = time.perf_counter()
+                    ttft_ms = (first_token_at - start) * 1000
+                    self.ttft_samples[endpoint].append(ttft_ms)
+                    record("llm_ttft", first_token_at - llm_start)
+                parts.append(text)
+                yield "token", {"text": text}
+        except Exception as e:
+            print(f"Error streaming {endpoint}: {e}")
+            yield "error", {"detail": f"Streaming failed: {str(e)}"}
+            return
+        
+        if ttft_ms is not None:
+            record("llm_generation", time.perf_counter() - first_token_at)
+        self._cache_store(endpoint, retrieval, build_result("".join(parts).strip()))
+        yield "done", {"cached": False, "ttft_ms": ttft_ms, "total_ms": (time.perf_counter() - start) * 1000}
+    
+    def _record_turn(self, conversation_id: Optional[str], message: str, response: str):
+        """Save an exchange in the background; compaction may call the LLM"""
+        if not conversation_id:
+            return
+        task = asyncio.create_task(self.conversations.record_turn(conversation_id, message, response))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    async def _summarize_conversation(self, summary: str, turns: List[Dict[str, str]]) -> str:
+        """Fold older conversation turns into the running summary"""
+        history_text = self.conversations.format_history(ConversationState(turns=turns))
+        try:
+            response = await self.llm.complete(
+                "conversation_summary",
+                [
+                    {"role": "system", "content": self.prompts.CONVERSATION_SUMMARY_SYSTEM},
+                    {"role": "user", "content": self.prompts.get_conversation_summary_prompt(summary, history_text)}
+                ],
+                max_tokens=self.config.CONVERSATION_SUMMARY_MAX_TOKENS,
+                temperature=0.0
+            )
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            print(f"Error summarizing conversation: {e}")
+            # Keep the user's side of the dropped turns, truncated
+            dropped = " ".join(turn["content"] for turn in turns if turn["role"] == "user")
+            return f"{summary} {dropped}".strip()[-self.config.CONVERSATION_MAX_TURN_CHARS:]
+    
+    def _build_context(self, endpoint: str, documents: List[Tuple[Document, float]]) -> str:
+        """Assemble retrieved documents into the endpoint's context token budget"""
+        with stage("context"):
+            assembled = self.context_assembler.assemble(documents, self.config.CONTEXT_TOKEN_BUDGETS[endpoint])
+        self.context_stats["requests"] += 1
+        self.context_stats["raw_tokens"] += assembled.raw_tokens
+        self.context_stats["context_tokens"] += assembled.tokens
+        return assembled.text
+    
+    def get_context_stats(self) -> Dict[str, Any]:
+        """Get prompt context token statistics"""
+        stats = dict(self.context_stats)
+        stats["tokens_saved"] = stats["raw_tokens"] - stats["context_tokens"]
+        return stats
+    
+    def _source_metadata(self, documents: List[Tuple[Document, float]]) -> List[Dict[str, Any]]:
+        """Describe retrieved documents for the client"""
+        return [
+            {"source": doc.metadata.get("source"), "page": doc.metadata.get("page"), "score": round(score, 4)}
+            for doc, score in documents
+        ]
+    
+    def get_streaming_stats(self) -> Dict[str, Any]:
+        """Get time-to-first-token statistics for streamed responses"""
+        stats = {}
+        for endpoint, samples in self.ttft_samples.items():
+            ordered = sorted(samples)
+            stats[endpoint] = {
+                "samples": len(ordered),
+                "ttft_p50_ms": ordered[len(ordered) // 2] if ordered else None,
+                "ttft_p95_ms": ordered[int(len(ordered) * 0.95)] if ordered else None,
+            }
+        return stats
+    
     def _get_fallback_response(self, message: str) -> Dict[str, Any]:
         """Get fallback response for errors"""
         return {
@@ -0,0 +1,157 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from query_embedding_cache import normalize_query
+
+ScoredDocuments = List[Tuple[Document, float]]
+
+
+class CrossEncoderReranker:
+    """Reorders retrieved candidates with a small cross-encoder.
+
+    Candidates arrive in bi-encoder (or fused) order with their retrieval
+    scores. How many of them are scored adapts per query: candidates more
+    than ``score_margin`` below the best retrieval score are dropped when the
+    head of the ranking is clear, and the depth is capped so the expected
+    scoring time (from a running per-pair cost) fits ``latency_budget_ms``.
+    Pairs from all queries in a batch are scored together in batches of
+    ``batch_size``. Scores are cached per (normalized query, chunk hash) and
+    returned as sigmoid probabilities; results under ``min_score`` are dropped
+    so weak passages never reach the prompt.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        max_candidates: int = 20,
+        min_candidates: int = 5,
+        score_margin: float = 0.2,
+        latency_budget_ms: float = 60.0,
+        min_score: float = 0.05,
+        batch_size: int = 32,
+        max_length: int = 256,
+        cache_size: int = 20000,
+    ):
+        self.model_name = model_name
+        self.max_candidates = max_candidates
+        self.min_candidates = min_candidates
+        self.score_margin = score_margin
+        self.latency_budget = latency_budget_ms / 1000.0
+        self.min_score = min_score
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.cache_size = cache_size
+
+        self.model = None
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Running estimate of model time per scored pair, seeded conservatively
+        self._pair_seconds = 0.004
+
+        self.queries = 0
+        self.pairs_scored = 0
+        self.cache_hits = 0
+        self.candidates_considered = 0
+        self.candidates_returned = 0
+
+    def load(self):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+
+    def depth(self, candidates: ScoredDocuments, k: int) -> int:
+        """Number of leading candidates worth scoring for one query"""
+        if not candidates:
+            return 0
+        window = [score for _, score in candidates[:self.max_candidates]]
+        top_score = max(window)
+        # Up to the last candidate still within the margin of the best retrieval score
+        depth = max(i + 1 for i, score in enumerate(window) if score >= top_score - self.score_margin)
+        depth = max(depth, min(self.min_candidates, len(candidates)), min(k, len(candidates)))
+        budget_depth = int(self.latency_budget / self._pair_seconds) if self._pair_seconds > 0 else depth
+        return min(depth, max(budget_depth, k), self.max_candidates, len(candidates))
+
+    def rerank_batch(self, queries: List[str], candidate_lists: List[ScoredDocuments], k: int) -> List[ScoredDocuments]:
+        """Rerank each query's candidates and keep its best ``k`` (runs in a worker thread)"""
+        if self.model is None:
+            self.load()
+
+        keys = [normalize_query(query) for query in queries]
+        depths = [self.depth(candidates, k) for candidates in candidate_lists]
+        scores: List[List[Optional[float]]] = []
+        pending: Dict[Tuple[str, str], Any] = {}  # cache key -> (query, passage), then its new score
+
+        with self._lock:
+            for query, key, candidates, depth in zip(queries, keys, candidate_lists, depths):
+                row = []
+                for doc, _ in candidates[:depth]:
+                    cache_key = (key, self._chunk_key(doc))
+                    score = self._cache.get(cache_key)
+                    if score is None:
+                        pending.setdefault(cache_key, (query, doc.page_content))
+                    else:
+                        self._cache.move_to_end(cache_key)
+                        self.cache_hits += 1
+                    row.append(score)
+                scores.append(row)
+
+        if pending:
+            items = list(pending.items())
+            pending.clear()
+            start = time.perf_counter()
+            logits = self.model.predict([pair for _, pair in items], batch_size=self.batch_size, show_progress_bar=False)
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._pair_seconds = 0.8 * self._pair_seconds + 0.2 * (elapsed / len(items))
+                self.pairs_scored += len(items)
+                for (cache_key, _), logit in zip(items, logits):
+                    pending[cache_key] = self._sigmoid(float(logit))
+                    self._cache[cache_key] = pending[cache_key]
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        results = []
+        for key, candidates, depth, row in zip(keys, candidate_lists, depths, scores):
+            scored = [
+                (doc, score if score is not None else pending[(key, self._chunk_key(doc))])
+                for (doc, _), score in zip(candidates[:depth], row)
+            ]
+            scored.sort(key=lambda item: item[1], reverse=True)
+            kept = [(doc, score) for doc, score in scored if score >= self.min_score][:k]
+            results.append(kept)
+            self.queries += 1
+            self.candidates_considered += depth
+            self.candidates_returned += len(kept)
+        return results
+
+    @staticmethod
+    def _chunk_key(doc: Document) -> str:
+        chunk_hash = doc.metadata.get("chunk_hash")
+        if chunk_hash:
+            return chunk_hash
+        return hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _sigmoid(value: float) -> float:
+        if value < -60:
+            return 0.0
+        return 1.0 / (1.0 + math.exp(-value))
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.cache_hits + self.pairs_scored
+        return {
+            "model": self.model_name,
+            "loaded": self.model is not None,
+            "queries": self.queries,
+            "avg_depth": self.candidates_considered / self.queries if self.queries else 0.0,
+            "pairs_scored": self.pairs_scored,
+            "cache_entries": len(self._cache),
+            "cache_hit_rate": self.cache_hits / lookups if lookups else 0.0,
+            "avg_returned": self.candidates_returned / self.queries if self.queries else 0.0,
+            "pair_ms_estimate": self._pair_seconds * 1000,
+        }
@@ -0,0 +1,83 @@
+from pydantic import BaseModel, ValidationError
+from typing import Any, Dict, List, Optional, Type
+
+class SymptomRequest(BaseModel):
+    symptoms: str
+    age: Optional[int] = None
+    gender: Optional[str] = None
+    medical_history: Optional[str] = None
+    session_id: Optional[str] = None  # Reuses retrieval prefetched for this session
+
+class ChatRequest(BaseModel):
+    message: str
+    conversation_id: Optional[str] = None
+    session_id: Optional[str] = None
+
+class PrefetchRequest(BaseModel):
+    session_id: str
+    endpoint: str  # "analyze_symptoms" or "chat"
+    text: str  # What the user has typed so far
+    conversation_id: Optional[str] = None
+
+class CorpusReloadRequest(BaseModel):
+    pdf_paths: Optional[List[str]] = None  # Replaces the corpus's sources, or defines a new corpus
+    force: bool = False  # Rebuild even if the sources and settings are unchanged
+
+# Shape of a symptom analysis returned by the LLM. Missing or mistyped fields
+# fall back to defaults so a repaired or partial answer still validates.
+URGENCY_LEVELS = ("low", "moderate", "high", "emergency")
+
+class PossibleCondition(BaseModel):
+    name: str = "Unknown condition"
+    probability: str = "Unknown"
+    description: str = ""
+    common_symptoms: List[str] = []
+    reference_match: str = ""
+
+class TreatmentRecommendation(BaseModel):
+    type: str = "Medical consultation"
+    description: str = ""
+    urgency: str = "moderate"
+    source: str = ""
+
+class SymptomAnalysis(BaseModel):
+    analysis_summary: str = ""
+    possible_conditions: List[PossibleCondition] = []
+    treatment_recommendations: List[TreatmentRecommendation] = []
+    urgency_level: str = "moderate"
+    medical_evidence: str = ""
+    disclaimer: str = ""
+    follow_up_questions: List[str] = []
+
+def _coerce(model: Type[BaseModel], data: Any) -> Optional[Dict[str, Any]]:
+    """Validate ``data`` as ``model``, dropping fields that fail; None if it is not an object"""
+    if not isinstance(data, dict):
+        return None
+    try:
+        return model.model_validate(data).model_dump()
+    except ValidationError as e:
+        invalid = {error["loc"][0] for error in e.errors() if error["loc"]}
+        return model.model_validate({key: value for key, value in data.items() if key not in invalid}).model_dump()
+
+def normalize_urgency(value: Any) -> str:
+    urgency = str(value or "").strip().lower()
+    return urgency if urgency in URGENCY_LEVELS else "moderate"
+
+def coerce_condition(data: Any) -> Optional[Dict[str, Any]]:
+    return _coerce(PossibleCondition, data)
+
+def coerce_symptom_analysis(data: Any) -> Dict[str, Any]:
+    """Validate an LLM symptom analysis, keeping every list item that validates.
+
+    Raises ValueError if the answer is not a JSON object at all.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Symptom analysis is not a JSON object")
+    data = dict(data)
+    for key, model in (("possible_conditions", PossibleCondition), ("treatment_recommendations", TreatmentRecommendation)):
+        items = data.get(key) if isinstance(data.get(key), list) else []
+        data[key] = [item for item in (_coerce(model, item) for item in items) if item is not None]
+    if isinstance(data.get("follow_up_questions"), list):
+        data["follow_up_questions"] = [question for question in data["follow_up_questions"] if isinstance(question, str)]
+    data["urgency_level"] = normalize_urgency(data.get("urgency_level"))
+    return _coerce(SymptomAnalysis, data)
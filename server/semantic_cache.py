@@ -0,0 +1,210 @@
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+class _CacheEntry:
+    __slots__ = ("namespace", "vector", "payload", "created_at", "size")
+
+    def __init__(self, namespace: str, vector: np.ndarray, payload: str, created_at: float):
+        self.namespace = namespace
+        self.vector = vector
+        self.payload = payload
+        self.created_at = created_at
+        self.size = vector.nbytes + len(payload)
+
+
+class SemanticCache:
+    """LLM response cache keyed by query-embedding similarity.
+
+    Entries live in namespaces (endpoint, prompt template version and any
+    request parameters that change the answer). A lookup returns the most
+    similar cached response in the namespace if its cosine similarity clears
+    ``threshold``. Eviction is LRU, bounded by entry count and approximate
+    memory size, and entries expire after ``ttl_seconds``. Storing a response
+    that a lookup would already have matched replaces the older entry. When
+    ``path`` is set entries are written through to SQLite so a warm cache
+    survives restarts; the writes run on a single background thread so
+    callers on the event loop never wait for a commit.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        ttl_seconds: float = 3600,
+        max_entries: int = 2000,
+        max_bytes: int = 64 * 1024 * 1024,
+        path: Optional[str] = None,
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._entries: "OrderedDict[int, _CacheEntry]" = OrderedDict()
+        self._namespaces: Dict[str, set] = {}
+        self._next_id = 0
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        self._writer = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS semantic_cache ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, namespace TEXT NOT NULL, "
+                "vector BLOB NOT NULL, payload TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+            self._load()
+            # After loading, the connection is only used from this thread
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="semantic-cache")
+
+    def lookup(self, namespace: str, vector: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Return a cached response similar enough to ``vector``, if any"""
+        ids = self._namespaces.get(namespace)
+        if not ids:
+            self.misses += 1
+            return None
+
+        entry_id = self._nearest(namespace, self._normalize(vector))
+        if entry_id is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(entry_id)
+        self.hits += 1
+        return json.loads(self._entries[entry_id].payload)
+
+    def store(self, namespace: str, vector: np.ndarray, response: Dict[str, Any]):
+        """Cache a response under the query vector that produced it"""
+        vector = self._normalize(vector)
+        payload = json.dumps(response)
+        created_at = time.time()
+
+        # Concurrent misses for the same question each store an answer; keep only the newest
+        duplicate_id = self._nearest(namespace, vector)
+        if duplicate_id is not None:
+            self._remove(duplicate_id)
+
+        entry_id = self._add(_CacheEntry(namespace, vector, payload, created_at))
+        if entry_id in self._entries:
+            self._write(
+                "INSERT INTO semantic_cache (id, namespace, vector, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (entry_id, namespace, vector.tobytes(), payload, created_at),
+            )
+
+    def close(self):
+        """Finish pending writes and close the SQLite file"""
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "persistent": self._db is not None,
+        }
+
+    def _nearest(self, namespace: str, vector: np.ndarray) -> Optional[int]:
+        """Id of the most similar live entry in ``namespace`` if it clears the threshold"""
+        ids = self._namespaces.get(namespace)
+        if not ids:
+            return None
+
+        now = time.time()
+        for entry_id in [i for i in ids if now - self._entries[i].created_at > self.ttl_seconds]:
+            self._remove(entry_id)
+
+        candidates = list(self._namespaces.get(namespace, ()))
+        if not candidates:
+            return None
+
+        matrix = np.stack([self._entries[i].vector for i in candidates])
+        similarities = matrix @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+        return candidates[best]
+
+    def _add(self, entry: _CacheEntry, entry_id: Optional[int] = None) -> int:
+        if entry_id is None:
+            entry_id = self._next_id
+        self._next_id = max(self._next_id, entry_id + 1)
+        self._entries[entry_id] = entry
+        self._namespaces.setdefault(entry.namespace, set()).add(entry_id)
+        self._bytes += entry.size
+
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest_id = next(iter(self._entries))
+            self._remove(oldest_id)
+            self.evictions += 1
+        return entry_id
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        ids = self._namespaces[entry.namespace]
+        ids.discard(entry_id)
+        if not ids:
+            del self._namespaces[entry.namespace]
+        self._bytes -= entry.size
+        self._write("DELETE FROM semantic_cache WHERE id = ?", (entry_id,))
+
+    def _write(self, sql: str, params: tuple):
+        if self._writer is not None:
+            self._writer.submit(self._execute, sql, params)
+
+    def _execute(self, sql: str, params: tuple):
+        try:
+            self._db.execute(sql, params)
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"Semantic cache write failed: {e}")
+
+    def _load(self):
+        cutoff = time.time() - self.ttl_seconds
+        self._db.execute("DELETE FROM semantic_cache WHERE created_at < ?", (cutoff,))
+        self._db.execute(
+            "DELETE FROM semantic_cache WHERE id NOT IN "
+            "(SELECT id FROM semantic_cache ORDER BY created_at DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+        self._db.commit()
+
+        rows = self._db.execute(
+            "SELECT id, namespace, vector, payload, created_at FROM semantic_cache ORDER BY created_at"
+        ).fetchall()
+        for row_id, namespace, blob, payload, created_at in rows:
+            vector = np.frombuffer(blob, dtype=np.float32)
+            self._add(_CacheEntry(namespace, vector, payload, created_at), row_id)
+
+        # Rows evicted above (over max_bytes) had no writer to delete them yet
+        loaded = set(self._entries)
+        stale = [(row_id,) for row_id, *_ in rows if row_id not in loaded]
+        self._db.executemany("DELETE FROM semantic_cache WHERE id = ?", stale)
+        self._db.commit()
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
@@ -0,0 +1,50 @@
+import asyncio
+import copy
+import re
+from typing import Any, Awaitable, Callable, Dict
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_key_text(text: str) -> str:
+    """Case- and whitespace-insensitive form of request text for coalescing keys"""
+    return WHITESPACE_RE.sub(" ", (text or "").casefold()).strip().rstrip("?!. ")
+
+
+class SingleFlight:
+    """Collapses concurrent calls that share a key into one in-flight call.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running await the same task and receive a copy of its result (or
+    its exception). A caller that is cancelled does not cancel the shared
+    work for the others.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.collapsed = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.collapsed += 1
+            return copy.deepcopy(await asyncio.shield(task))
+
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+
+        def forget(_):
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+
+        task.add_done_callback(forget)
+        return await asyncio.shield(task)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "collapsed": self.collapsed,
+            "in_flight": len(self._inflight),
+        }
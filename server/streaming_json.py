@@ -0,0 +1,225 @@
+import json
+import re
+from typing import Any, Iterable, List, Optional, Tuple
+
+# Models emit raw newlines and tabs inside strings, which strict JSON forbids
+_DECODER = json.JSONDecoder(strict=False)
+_KEY_RE = re.compile(r'\s*"((?:[^"\\]|\\.)*)"\s*:\s*$', re.S)
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class StreamingJSONParser:
+    """Incremental parser for one JSON object arriving in text chunks.
+
+    ``feed`` returns events as soon as the text completing them arrives:
+    ``("field", key, value)`` for each top-level member and
+    ``("item", key, value)`` for each element of the top-level arrays named
+    in ``stream_arrays`` (those arrays get no "field" event of their own).
+    Markdown fences and any preamble before the first ``{`` are skipped, as
+    is anything after the object closes. ``close`` returns the whole object,
+    repaired with ``repair_json`` when the text was truncated or malformed
+    (``repaired`` then becomes True).
+    """
+
+    def __init__(self, stream_arrays: Iterable[str] = ()):
+        self.stream_arrays = frozenset(stream_arrays)
+        self.text = ""
+        self._pos = 0
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._member_start = 0
+        self._array_key: Optional[str] = None
+        self._item_start = 0
+        self.fields: List[str] = []
+        self.items = 0
+        self.errors = 0
+        self.repaired = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, str, Any]]:
+        self.text += chunk
+        events = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            if self._finished:
+                break
+            char = text[i]
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                    self._depth = 1
+                    self._member_start = i + 1
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 2 and char == "[":
+                    key = _KEY_RE.match(text[self._member_start:i])
+                    if key and key.group(1) in self.stream_arrays:
+                        self._array_key = key.group(1)
+                        self._item_start = i + 1
+            elif char in "}]":
+                if self._depth == 2 and self._array_key is not None:
+                    self._emit_item(events, text[self._item_start:i])
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit_member(events, text[self._member_start:i])
+                    self._finished = True
+            elif char == ",":
+                if self._depth == 1:
+                    self._emit_member(events, text[self._member_start:i])
+                    self._member_start = i + 1
+                elif self._depth == 2 and self._array_key is not None:
+                    self._emit_item(events, text[self._item_start:i])
+                    self._item_start = i + 1
+        self._pos = len(text)
+        return events
+
+    def _emit_member(self, events: List[Tuple[str, str, Any]], member: str):
+        if not member.strip():
+            return
+        array_key, self._array_key = self._array_key, None
+        if array_key is not None:
+            return
+        try:
+            (key, value), = _decode("{" + member + "}").items()
+        except ValueError:
+            # Left for repair_json to deal with when the stream closes
+            self.errors += 1
+            return
+        self.fields.append(key)
+        events.append(("field", key, value))
+
+    def _emit_item(self, events: List[Tuple[str, str, Any]], item: str):
+        if not item.strip():
+            return
+        try:
+            value = _decode(item)
+        except ValueError:
+            self.errors += 1
+            return
+        self.items += 1
+        events.append(("item", self._array_key, value))
+
+    def close(self) -> Any:
+        """The complete object; raises ValueError if there is nothing to repair"""
+        value, self.repaired = parse_json(self.text)
+        return value
+
+
+def _decode(text: str) -> Any:
+    """Decode one complete value, repairing trailing commas inside it"""
+    try:
+        return _DECODER.decode(text)
+    except ValueError:
+        return repair_json(text)
+
+
+def _object_text(text: str) -> str:
+    """Text from the first ``{`` or ``[``, without Markdown fences or preamble"""
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise ValueError("No JSON object in model output")
+    return text[min(starts):]
+
+
+def repair_json(text: str) -> Any:
+    """Parse model output as JSON, repairing the usual ways it goes wrong.
+
+    Handles Markdown fences and preamble, trailing text after the value,
+    raw newlines and tabs inside strings, trailing commas, and truncation:
+    an unterminated string is closed, a dangling key or partial literal is
+    dropped back to the last complete value, and open containers are closed.
+    """
+    return parse_json(text)[0]
+
+
+def parse_json(text: str) -> Tuple[Any, bool]:
+    """``repair_json``, plus whether the value was truncated or malformed and needed repair"""
+    text = _object_text(text)
+    try:
+        return _DECODER.raw_decode(text)[0], False
+    except ValueError:
+        pass
+    return _repair(text), True
+
+
+def _repair(text: str) -> Any:
+    """Close truncated or malformed object text (already past any preamble) into JSON"""
+    out: List[str] = []
+    stack: List[str] = []
+    # (output length, open containers) after each complete value or container opening
+    safe: List[Tuple[int, Tuple[str, ...]]] = []
+    in_string = escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            out.append(char)
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append(char)
+            out.append(char)
+            safe.append((len(out), tuple(stack)))
+            continue
+        elif char in "}]":
+            if not stack:
+                break
+            _drop_trailing_comma(out)
+            out.append(_CLOSERS[stack.pop()])
+            safe.append((len(out), tuple(stack)))
+            if not stack:
+                break
+            continue
+        elif char == ",":
+            safe.append((len(out), tuple(stack)))
+        out.append(char)
+
+    if in_string:
+        if escaped:
+            out.pop()
+        out.append('"')
+    candidate = "".join(out).rstrip()
+    try:
+        return _DECODER.decode(_close(candidate, stack))
+    except ValueError:
+        pass
+
+    # The tail is a dangling key, a colon or a partial literal: cut back to the last complete value
+    for length, open_stack in reversed(safe):
+        prefix = "".join(out[:length]).rstrip()
+        try:
+            return _DECODER.decode(_close(prefix, list(open_stack)))
+        except ValueError:
+            continue
+    raise ValueError("Model output could not be repaired into JSON")
+
+
+def _drop_trailing_comma(out: List[str]):
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    if i >= 0 and out[i] == ",":
+        del out[i]
+
+
+def _close(text: str, stack: List[str]) -> str:
+    text = text.rstrip().rstrip(",").rstrip()
+    return text + "".join(_CLOSERS[opener] for opener in reversed(stack))
@@ -0,0 +1,51 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from metrics import STAGE_DURATION
+
+
+class RequestTrace:
+    """Stage durations of one request, plus the route and trace id they are reported under"""
+
+    __slots__ = ("route", "trace_id", "stages")
+
+    def __init__(self, route: str, trace_id: Optional[str] = None):
+        self.route = route
+        self.trace_id = trace_id
+        self.stages: Dict[str, float] = {}
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def start_request(route: str, trace_id: Optional[str] = None) -> RequestTrace:
+    """Begin collecting stage timings for the current request"""
+    trace = RequestTrace(route, trace_id)
+    _current_trace.set(trace)
+    return trace
+
+
+def record(stage: str, seconds: float):
+    """Add time spent in a stage to the current request and the stage histogram"""
+    trace = _current_trace.get()
+    if trace is None:
+        STAGE_DURATION.observe(seconds, route="background", stage=stage)
+        return
+    trace.stages[stage] = trace.stages.get(stage, 0.0) + seconds
+    STAGE_DURATION.observe(seconds, route=trace.route, stage=stage)
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def format_server_timing(timings: Dict[str, float]) -> str:
+    """Render timings as a Server-Timing header value (durations in milliseconds)"""
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())